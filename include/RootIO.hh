@@ -18,8 +18,8 @@ public:
     void CloseFile();
     void Write();
 
-    void SaveHit(G4double edep, const G4ThreeVector& pos);
-    void FillEvent();
+    void SaveHit(G4double edep, const G4ThreeVector& pos, G4int layer);
+    void FillEvent(G4int eventID);
     void ClearEvent();
 
     void SetNumLayers(G4int n);
@@ -41,6 +41,7 @@ private:
     std::vector<G4double> fLayerEdep;
     std::vector<G4double> fEdep;
     std::vector<G4ThreeVector> fPos;
+    std::vector<G4int> fHitLayer;
 
     G4int hTotalID, hRadialID, hLongID, hXYID;
     std::vector<G4int> hLayerIDs;
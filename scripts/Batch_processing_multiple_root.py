@@ -1,35 +1,9 @@
-import uproot
-import numpy as np
-import matplotlib.pyplot as plt
-import os
-import glob
+# Batch_processing_multiple_root.py
+# Same as `python -m calosim batch`: profile plots and layer_summary.npz for every *.root in a directory
 
-root_files = glob.glob("*.root")
-os.makedirs("batch_plots", exist_ok=True)
+import sys
 
-for fpath in root_files:
-    fname = os.path.basename(fpath).replace(".root", "")
-    print(f"📂 Processing {fname}.root ...")
-    file = uproot.open(fpath)
-    
-    means = []
-    i = 0
-    while f"hLayer{i}" in file:
-        hist = file[f"hLayer{i}"].to_numpy()[0]
-        bins = file[f"hLayer{i}"].to_numpy()[1]
-        centers = 0.5 * (bins[:-1] + bins[1:])
-        mean = np.average(centers, weights=hist) if hist.sum() > 0 else 0
-        means.append(mean)
-        i += 1
-    
-    plt.figure(figsize=(8,5))
-    plt.plot(range(len(means)), means, marker='o')
-    plt.title(f"Shower Profile: {fname}")
-    plt.xlabel("Layer")
-    plt.ylabel("Mean Energy Deposition (MeV)")
-    plt.grid(True)
-    plt.savefig(f"batch_plots/{fname}_profile.png")
-    plt.close()
-
-print("✅ Batch processing complete. Results saved to ./batch_plots/")
+from calosim.cli import main
 
+if __name__ == "__main__":
+    sys.exit(main(["batch", *sys.argv[1:]]))
@@ -3,6 +3,10 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os
 
+from calosim.hits import stream_hits
+from calosim.loader import load_layers
+from calosim.moments import histogram_moments
+
 # Create output directory
 os.makedirs("plots", exist_ok=True)
 
@@ -56,38 +60,17 @@ plt.tight_layout()
 plt.savefig("plots/hXY.png")
 
 # --- Layer-wise Energy Analysis ---
-layer_means = []
-layer_stddevs = []
-layer_numbers = []
 colors = plt.cm.tab10.colors
 
-for i in range(100):  # Try up to 100 layers
-    name = f"hLayer{i}"
-    if name not in file:
-        break
-    hist = file[name]
-    x_edges = hist.axis().edges()
-    y_vals = hist.values()
-
-    if np.sum(y_vals) == 0:
-        mean, std = 0, 0
-    else:
-        bin_centers = 0.5 * (x_edges[1:] + x_edges[:-1])
-        mean = np.average(bin_centers, weights=y_vals)
-        std = np.sqrt(np.average((bin_centers - mean) ** 2, weights=y_vals))
-
-    layer_means.append(mean)
-    layer_stddevs.append(std)
-    layer_numbers.append(i)
+layer_values, layer_edges = load_layers(file)
+layer_moments = histogram_moments(layer_values, layer_edges)
+layer_means = layer_moments.mean
+layer_stddevs = layer_moments.rms
 
 # Overlay all layer histograms (for visual)
 plt.figure(figsize=(10, 7))
-for i in range(len(layer_numbers)):
-    name = f"hLayer{i}"
-    hist = file[name]
-    x = hist.axis().edges()
-    y = hist.values()
-    plt.step(x[:-1], y, where="mid", label=f"Layer {i}", color=colors[i % len(colors)])
+for i, y in enumerate(layer_values):
+    plt.step(layer_edges[:-1], y, where="mid", label=f"Layer {i}", color=colors[i % len(colors)])
 plt.yscale("log")
 plt.xlabel("E_dep (MeV)")
 plt.ylabel("Counts")
@@ -113,11 +96,12 @@ for i, (mean, std) in enumerate(zip(layer_means, layer_stddevs)):
 
 # --- Ntuple (Optional) ---
 if "hits" in file:
-    hits_tree = file["hits"]
-    edep = hits_tree["edep"].array(library="np")
+    # Stream the ntuple in chunks instead of loading every hit at once
+    hits = stream_hits("../build/output.root")
+    n_edep, low, high = hits.edep_bins
 
     plt.figure()
-    plt.hist(edep, bins=100, range=(0, 20), color='gray', histtype='stepfilled', alpha=0.8)
+    plt.stairs(hits.edep, np.linspace(low, high, n_edep + 1), color='gray', fill=True, alpha=0.8)
     plt.xlabel("E_dep (MeV)")
     plt.ylabel("Counts")
     plt.title("Energy Deposition from Ntuple")
@@ -1,16 +1,22 @@
 import uproot
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # batch-safe: figures are only saved, never shown
 import matplotlib.pyplot as plt
 import re
 import os
 from scipy.special import gamma
 
+from calosim.geometry import geometry_for
+
 # Settings
 E0 = 10.0  # Incident energy in MeV (match /gun/energy)
-X0 = 5.6  # Pb radiation length in mm (approximate)
-Ec = 8.9   # Critical energy in MeV for Pb
 b = 0.5    # Shape parameter (constant)
 
+# Radiation length and critical energy of the sampling stack (absorber + scintillator)
+geometry = geometry_for("output.root")
+Ec = geometry.critical_energy  # MeV
+
 # Compute a parameter
 a = 1.0 + 0.5 * np.log(E0 / Ec)
 
@@ -24,23 +30,20 @@ layer_histos = dict(sorted(layer_histos.items(), key=lambda kv: int(re.findall(r
 
 # Sum energy per layer
 total_energy_per_layer = []
-layer_z = []
 
 for i, (name, hist) in enumerate(layer_histos.items()):
     counts = hist.values()
     bins = hist.axis().edges()
     energy = np.sum(counts * np.diff(bins))  # Approximate total energy in this layer
     total_energy_per_layer.append(energy)
-    z = i * (1.5 + 4.0)  # mm: assuming absorber=1.5mm Pb + 4mm scint
-    layer_z.append(z)
 
 # Normalize
 total_energy_per_layer = np.array(total_energy_per_layer)
-layer_z = np.array(layer_z)
+layer_z = geometry.layer_depth(n_layers=len(total_energy_per_layer))  # mm
 norm_energy = total_energy_per_layer / np.sum(total_energy_per_layer)
 
 # Compute Bethe-Heitler shape
-t_vals = layer_z / X0
+t_vals = geometry.to_x0(layer_z)  # depth in radiation lengths
 expected_shape = (b * (b * t_vals) ** (a - 1) * np.exp(-b * t_vals)) / gamma(a)
 expected_shape /= np.sum(expected_shape)  # Normalize to unit area
 
@@ -56,5 +59,5 @@ plt.legend()
 plt.grid(True)
 plt.tight_layout()
 plt.savefig("plots/longitudinal_overlay.png")
-plt.show()
+plt.close()
 
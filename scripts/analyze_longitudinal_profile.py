@@ -1,50 +1,32 @@
-import uproot
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # batch-safe: figures are only saved, never shown
 import matplotlib.pyplot as plt
 from scipy.special import gamma
-from scipy.optimize import curve_fit
-import re
+
+from calosim.gammafit import fit_profile
+from calosim.geometry import geometry_for
+from calosim.summary import load_summary
 
 # --- Gamma Fit Function ---
 def gamma_profile(z, a, b, scale):
     return scale * (b*z)**(a-1) * np.exp(-b*z) * b / gamma(a)
 
-# --- Load ROOT file ---
-file = uproot.open("../build/output.root")  # or path to your file
-layer_histos = {k: v for k, v in file.items() if re.match(r"hLayer\d+", k)}
-
-# --- Sort histograms by layer index ---
-sorted_layers = sorted(layer_histos.items(), key=lambda kv: int(re.search(r"\d+", kv[0]).group()))
+# --- Load layer summary (cached in .calosim_cache/) ---
+input_file = "../build/output.root"  # or path to your file
+summary = load_summary(input_file)
 
 # --- Extract average energy and errors ---
-z_values = []
-mean_energy = []
-std_energy = []
-
-for i, (name, hist) in enumerate(sorted_layers):
-    bin_edges = hist.axis().edges()
-    bin_centers = 0.5 * (bin_edges[1:] + bin_edges[:-1])
-    values = hist.values()
-    entries = hist.to_numpy()[0]  # numpy histogram values
-    counts = np.sum(entries)
-
-    # Mean and std for the histogram
-    mean = np.sum(bin_centers * values) / np.sum(values) if np.sum(values) > 0 else 0
-    std = np.sqrt(np.sum((bin_centers - mean) ** 2 * values) / np.sum(values)) if np.sum(values) > 0 else 0
-
-    z_values.append(i * 5.5)  # mm: 1.5 mm (Pb) + 4 mm (Scint)
-    mean_energy.append(mean)
-    std_energy.append(std)
-
-z_values = np.array(z_values)
-mean_energy = np.array(mean_energy)
-std_energy = np.array(std_energy)
+mean_energy = summary["layer_mean"]
+std_energy = summary["layer_rms"]
+geometry = geometry_for(input_file)
+z_values = geometry.layer_depth(n_layers=len(mean_energy))  # mm, scintillator of each layer
 
 # --- Normalize ---
 normalized_energy = mean_energy / np.max(mean_energy)
 
 # --- Fit to Gamma Distribution ---
-popt, _ = curve_fit(gamma_profile, z_values, normalized_energy, p0=[5, 0.1, 1.0], maxfev=10000)
+popt, _ = fit_profile(z_values, normalized_energy)  # seeded from the profile moments
 a_fit, b_fit, scale_fit = popt
 
 # --- Extract shower shape observables ---
@@ -71,11 +53,11 @@ plt.legend()
 plt.grid(True)
 plt.tight_layout()
 plt.savefig("longitudinal_profile.png", dpi=300)
-plt.show()
+plt.close()
 
 # --- Summary Output ---
 print("\n--- Shower Shape Observables ---")
 print(f"Gamma Fit Parameters: a = {a_fit:.2f}, b = {b_fit:.4f}, scale = {scale_fit:.3f}")
-print(f"Shower Maximum (z_max): {z_max:.2f} mm")
+print(f"Shower Maximum (z_max): {z_max:.2f} mm ({geometry.to_x0(z_max):.2f} X0)")
 print(f"Shower Width (σ):       {shower_width:.2f} mm")
 
@@ -0,0 +1,5 @@
+"""Shared analysis helpers for CalorimeterSim output files.
+
+Modules are imported individually (``from calosim.loader import load_layers``)
+so that quick scripts only pay for the dependencies they actually use.
+"""
@@ -0,0 +1,293 @@
+"""Mergeable streaming accumulators: histograms and running moments.
+
+Every accumulator is filled chunk by chunk, can be merged with another
+one of the same configuration (``a.merge(b)`` or ``a += b``), and
+serializes to a compact little-endian binary blob (``to_bytes`` /
+``from_bytes``), so partial results from worker processes or from the
+shards of a split run can be combined exactly.
+
+``Hist1D`` and ``Hist2D`` use uniform binning with ROOT-style
+under/overflow bins and keep the sum of weights squared. ``RunningMoments``
+keeps the weighted count, mean and second central moment (Welford updates,
+combined with Chan's formula), a Kahan-compensated sum and the min/max.
+"""
+
+import struct
+
+import numpy as np
+
+_MAGIC = b"CSA"
+_HEADER = struct.Struct("<3sB")
+
+
+def _bin_index(values, n, low, high):
+    """Bin index with 0 = underflow and n + 1 = overflow (NaN goes to overflow, like ROOT)."""
+    with np.errstate(invalid="ignore"):
+        idx = np.floor((values - low) * (n / (high - low)))
+    idx = np.nan_to_num(idx, nan=n, posinf=n, neginf=-1)
+    return np.clip(idx, -1, n).astype(np.int64) + 1
+
+
+def _kahan_add(total, compensation, value):
+    y = value - compensation
+    t = total + y
+    return t, (t - total) - y
+
+
+class RunningMoments:
+    """Weighted count, mean, variance, sum and range of a stream of values."""
+
+    _code = 1
+    _layout = struct.Struct("<7d")
+
+    def __init__(self):
+        self.n = 0.0  # number of values
+        self.sumw = 0.0
+        self.sumw2 = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of w * (x - mean)**2
+        self.min = np.inf
+        self.max = -np.inf
+        self._sum = 0.0
+        self._compensation = 0.0
+
+    def fill(self, values, weights=None):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.size == 0:
+            return self
+        weights = np.ones_like(values) if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+        sumw = float(weights.sum())
+        chunk = RunningMoments()
+        chunk.n = float(values.size)
+        chunk.sumw = sumw
+        chunk.sumw2 = float(np.dot(weights, weights))
+        if sumw != 0.0:
+            chunk.mean = float(np.dot(weights, values) / sumw)
+            chunk.m2 = float(np.dot(weights, (values - chunk.mean) ** 2))
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        chunk._sum = float(np.dot(weights, values))
+        return self.merge(chunk)
+
+    def merge(self, other):
+        """Combine with ``other`` in place (Chan et al. parallel update)."""
+        total = self.sumw + other.sumw
+        if total != 0.0:
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.sumw * other.sumw / total
+            self.mean += delta * other.sumw / total
+        self.n += other.n
+        self.sumw = total
+        self.sumw2 += other.sumw2
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._sum, self._compensation = _kahan_add(self._sum, self._compensation, other._sum)
+        self._sum, self._compensation = _kahan_add(self._sum, self._compensation, -other._compensation)
+        return self
+
+    __iadd__ = merge
+
+    @property
+    def sum(self):
+        """Kahan-compensated sum of ``w * x``."""
+        return self._sum - self._compensation
+
+    @property
+    def variance(self):
+        return self.m2 / self.sumw if self.sumw else 0.0
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.variance))
+
+    @property
+    def mean_error(self):
+        """Standard error of the mean using the effective number of entries."""
+        n_eff = self.sumw * self.sumw / self.sumw2 if self.sumw2 else 0.0
+        return self.std / np.sqrt(n_eff) if n_eff else 0.0
+
+    def _pack(self):
+        state = self._layout.pack(self.n, self.sumw, self.sumw2, self.mean, self.m2, self.min, self.max)
+        return state + struct.pack("<2d", self._sum, self._compensation)
+
+    @classmethod
+    def _unpack(cls, buffer):
+        acc = cls()
+        (acc.n, acc.sumw, acc.sumw2, acc.mean, acc.m2, acc.min, acc.max) = cls._layout.unpack_from(buffer)
+        acc._sum, acc._compensation = struct.unpack_from("<2d", buffer, cls._layout.size)
+        return acc
+
+    def to_bytes(self):
+        return _HEADER.pack(_MAGIC, self._code) + self._pack()
+
+    @classmethod
+    def from_bytes(cls, data):
+        return from_bytes(data)
+
+
+class Hist1D:
+    """Uniformly binned 1D histogram with flow bins, sumw2 and moments of the filled values."""
+
+    _code = 2
+    _layout = struct.Struct("<q2d")
+
+    def __init__(self, bins, low, high):
+        if bins <= 0 or not high > low:
+            raise ValueError(f"invalid binning ({bins}, {low}, {high})")
+        self.bins = int(bins)
+        self.low = float(low)
+        self.high = float(high)
+        self.counts = np.zeros(self.bins + 2)
+        self.sumw2 = np.zeros(self.bins + 2)
+        self.moments = RunningMoments()
+
+    @property
+    def binning(self):
+        return (self.bins, self.low, self.high)
+
+    @property
+    def edges(self):
+        return np.linspace(self.low, self.high, self.bins + 1)
+
+    @property
+    def values(self):
+        """Bin contents without under/overflow."""
+        return self.counts[1:-1]
+
+    @property
+    def variances(self):
+        return self.sumw2[1:-1]
+
+    def fill(self, values, weights=None):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        idx = _bin_index(values, *self.binning)
+        if weights is None:
+            filled = np.bincount(idx, minlength=self.bins + 2)
+            self.counts += filled
+            self.sumw2 += filled
+        else:
+            weights = np.asarray(weights, dtype=np.float64).ravel()
+            self.counts += np.bincount(idx, weights=weights, minlength=self.bins + 2)
+            self.sumw2 += np.bincount(idx, weights=weights * weights, minlength=self.bins + 2)
+        inside = (idx > 0) & (idx <= self.bins)
+        self.moments.fill(values[inside], None if weights is None else weights[inside])
+        return self
+
+    def merge(self, other):
+        if other.binning != self.binning:
+            raise ValueError(f"cannot merge binning {other.binning} into {self.binning}")
+        self.counts += other.counts
+        self.sumw2 += other.sumw2
+        self.moments.merge(other.moments)
+        return self
+
+    __iadd__ = merge
+
+    def _pack(self):
+        return (self._layout.pack(*self.binning) + self.moments._pack()
+                + self.counts.astype("<f8").tobytes() + self.sumw2.astype("<f8").tobytes())
+
+    @classmethod
+    def _unpack(cls, buffer):
+        hist = cls(*cls._layout.unpack_from(buffer))
+        offset = cls._layout.size
+        hist.moments = RunningMoments._unpack(buffer[offset:])
+        offset += RunningMoments._layout.size + 16
+        size = hist.counts.size
+        hist.counts = np.frombuffer(buffer, "<f8", size, offset).astype(np.float64)
+        hist.sumw2 = np.frombuffer(buffer, "<f8", size, offset + 8 * size).astype(np.float64)
+        return hist
+
+    def to_bytes(self):
+        return _HEADER.pack(_MAGIC, self._code) + self._pack()
+
+    @classmethod
+    def from_bytes(cls, data):
+        return from_bytes(data)
+
+
+class Hist2D:
+    """Uniformly binned 2D histogram with flow bins and sumw2; ``counts[ix, iy]``."""
+
+    _code = 3
+    _layout = struct.Struct("<q2dq2d")
+
+    def __init__(self, xbins, xlow, xhigh, ybins, ylow, yhigh):
+        self.x = Hist1D(xbins, xlow, xhigh).binning
+        self.y = Hist1D(ybins, ylow, yhigh).binning
+        shape = (self.x[0] + 2, self.y[0] + 2)
+        self.counts = np.zeros(shape)
+        self.sumw2 = np.zeros(shape)
+
+    @property
+    def binning(self):
+        return self.x + self.y
+
+    @property
+    def edges(self):
+        return (np.linspace(self.x[1], self.x[2], self.x[0] + 1),
+                np.linspace(self.y[1], self.y[2], self.y[0] + 1))
+
+    @property
+    def values(self):
+        return self.counts[1:-1, 1:-1]
+
+    @property
+    def variances(self):
+        return self.sumw2[1:-1, 1:-1]
+
+    def fill(self, x, y, weights=None):
+        ix = _bin_index(np.asarray(x, dtype=np.float64).ravel(), *self.x)
+        iy = _bin_index(np.asarray(y, dtype=np.float64).ravel(), *self.y)
+        flat = ix * self.counts.shape[1] + iy
+        size = self.counts.size
+        if weights is None:
+            filled = np.bincount(flat, minlength=size).reshape(self.counts.shape)
+            self.counts += filled
+            self.sumw2 += filled
+        else:
+            weights = np.asarray(weights, dtype=np.float64).ravel()
+            self.counts += np.bincount(flat, weights=weights, minlength=size).reshape(self.counts.shape)
+            self.sumw2 += np.bincount(flat, weights=weights * weights, minlength=size).reshape(self.counts.shape)
+        return self
+
+    def merge(self, other):
+        if other.binning != self.binning:
+            raise ValueError(f"cannot merge binning {other.binning} into {self.binning}")
+        self.counts += other.counts
+        self.sumw2 += other.sumw2
+        return self
+
+    __iadd__ = merge
+
+    def _pack(self):
+        return (self._layout.pack(*self.binning)
+                + self.counts.astype("<f8").tobytes() + self.sumw2.astype("<f8").tobytes())
+
+    @classmethod
+    def _unpack(cls, buffer):
+        hist = cls(*cls._layout.unpack_from(buffer))
+        offset = cls._layout.size
+        size = hist.counts.size
+        hist.counts = np.frombuffer(buffer, "<f8", size, offset).astype(np.float64).reshape(hist.counts.shape)
+        hist.sumw2 = np.frombuffer(buffer, "<f8", size, offset + 8 * size).astype(np.float64).reshape(hist.counts.shape)
+        return hist
+
+    def to_bytes(self):
+        return _HEADER.pack(_MAGIC, self._code) + self._pack()
+
+    @classmethod
+    def from_bytes(cls, data):
+        return from_bytes(data)
+
+
+_KINDS = {cls._code: cls for cls in (RunningMoments, Hist1D, Hist2D)}
+
+
+def from_bytes(data):
+    """Rebuild any accumulator from ``to_bytes`` output."""
+    data = memoryview(data)
+    magic, code = _HEADER.unpack_from(data)
+    if magic != _MAGIC or code not in _KINDS:
+        raise ValueError("not a serialized calosim accumulator")
+    return _KINDS[code]._unpack(data[_HEADER.size:])
@@ -0,0 +1,123 @@
+"""Layer-by-layer animations written straight from stacked arrays.
+
+XY maps are turned into frames by a colormap lookup on the raw bin
+contents (no Matplotlib figure per frame); line and 3D animations come
+from ``calosim.render`` templates. Frames are produced in worker
+processes and handed in order to one encoder: Pillow for ``.gif``, an
+``ffmpeg`` pipe for ``.mp4`` and other video formats. XY frames are
+streamed to the encoder in chunks as they are rasterized, so only a few
+chunks of RGB frames are held at a time.
+"""
+
+import itertools
+import shutil
+import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib import colormaps
+from matplotlib.colors import LogNorm, Normalize
+from PIL import Image, ImageDraw
+
+FRAME_CHUNK = 16  # layers rasterized per task
+
+
+def color_norm(stack, log=True):
+    """Shared colour scale for all layers (log of the positive range when possible)."""
+    positive = stack[stack > 0]
+    if log and positive.size:
+        return LogNorm(vmin=positive.min(), vmax=positive.max())
+    return Normalize(vmin=0, vmax=max(float(stack.max()), 1e-12))
+
+
+def rasterize(maps, norm, cmap="viridis", scale=4, labels=None):
+    """Colour ``(n, nx, ny)`` maps into ``(n, ny*scale, nx*scale, 3)`` uint8 frames.
+
+    Bins are drawn as ``scale x scale`` pixel blocks with y increasing
+    upwards, matching ``pcolormesh(x_edges, y_edges, values.T)``. Bins
+    outside a log norm's range are drawn with the colormap's low colour.
+    """
+    lut = (colormaps[cmap](np.linspace(0, 1, 256))[:, :3] * 255).astype(np.uint8)
+    maps = np.asarray(maps, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        level = np.ma.filled(norm(maps.ravel()), 0.0).reshape(maps.shape)
+    idx = np.clip(np.nan_to_num(level) * 255, 0, 255).astype(np.uint8)
+    images = lut[idx.transpose(0, 2, 1)[:, ::-1, :]]
+    images = np.repeat(np.repeat(images, scale, axis=1), scale, axis=2)
+    if labels is not None:
+        for image, label in zip(images, labels):
+            canvas = Image.fromarray(image)
+            ImageDraw.Draw(canvas).text((4, 4), label, fill=(255, 255, 255))
+            image[...] = np.asarray(canvas)
+    return images
+
+
+def _rasterize_chunk(args):
+    return rasterize(*args)
+
+
+def xy_frames(stack, norm=None, cmap="viridis", scale=4, labels=None, jobs=1):
+    """Yield the frame of every layer of ``stack`` in order.
+
+    Layers are rasterized ``FRAME_CHUNK`` at a time, in ``jobs`` worker
+    processes with at most ``2 * jobs`` chunks in flight.
+    """
+    if norm is None:
+        norm = color_norm(stack)
+    size = max(1, min(FRAME_CHUNK, -(-len(stack) // max(jobs, 1))))
+    chunks = ((stack[a:a + size], norm, cmap, scale, None if labels is None else labels[a:a + size])
+              for a in range(0, len(stack), size))
+    if jobs <= 1 or len(stack) <= size:
+        for chunk in chunks:
+            yield from _rasterize_chunk(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_rasterize_chunk, chunk))
+            if len(pending) >= 2 * jobs:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def write_animation(frames, path, fps=5):
+    """Encode RGB(A) frames to ``path``: GIF through Pillow, anything else through ffmpeg.
+
+    ``frames`` may be any iterable (e.g. the ``xy_frames`` generator); it
+    is consumed once, frame by frame.
+    """
+    frames = (np.asarray(f)[..., :3] for f in frames)
+    first = next(frames, None)
+    if first is None:
+        raise ValueError("no frames to encode")
+    path = str(path)
+    if path.lower().endswith(".gif"):
+        Image.fromarray(first).save(path, save_all=True, append_images=(Image.fromarray(f) for f in frames),
+                                    duration=int(1000 / fps), loop=0)
+        return path
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("the ffmpeg executable is required to write video files")
+    height, width = first.shape[:2]
+    cmd = [ffmpeg, "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+           "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+           "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p", path]
+    with subprocess.Popen(cmd, stdin=subprocess.PIPE) as proc:
+        for frame in itertools.chain([first], frames):
+            proc.stdin.write(np.ascontiguousarray(frame).tobytes())
+        proc.stdin.close()
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed writing {path}")
+    return path
+
+
+def animate_xy_layers(stack, path, fps=3, layers=None, log=True, cmap="viridis", scale=4, jobs=1):
+    """Animate the ``(n_layers, nx, ny)`` XY maps in the given layer order."""
+    if layers is None:
+        layers = list(range(len(stack)))
+    labels = [f"Layer {layer}" for layer in layers]
+    frames = xy_frames(stack[layers], color_norm(stack, log), cmap, scale, labels, jobs)
+    return write_animation(frames, path, fps)
@@ -0,0 +1,35 @@
+"""Process-pool helpers for running one reduction per ROOT file."""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .summary import load_summary
+
+
+def default_jobs():
+    return os.cpu_count() or 1
+
+
+def map_files(func, paths, jobs=1, chunksize=1):
+    """Apply ``func`` to every path and return the results in input order.
+
+    ``func`` must be a module-level function so it can be sent to worker
+    processes. With ``jobs <= 1`` everything runs in the calling process,
+    which keeps tracebacks simple when debugging a single file.
+    """
+    paths = list(paths)
+    if jobs <= 1 or len(paths) <= 1:
+        return [func(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as pool:
+        return list(pool.map(func, paths, chunksize=chunksize))
+
+
+def summarize_layers(path):
+    """Per-layer moments of one file, reduced to a few small arrays."""
+    summary = load_summary(path)
+    return {
+        "path": str(path),
+        "mean": summary["layer_mean"],
+        "rms": summary["layer_rms"],
+        "integral": summary["layer_integral"],
+    }
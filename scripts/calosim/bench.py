@@ -0,0 +1,267 @@
+"""Benchmarks of the analysis hot paths on synthetic fixtures.
+
+``make_fixtures`` writes synthetic outputs (``calosim.synthetic``) at a
+given scale once; ``run_benchmarks`` then times every selected benchmark
+in ``BENCHMARKS``:
+
+    loader      hLayer histograms into one array (uncached)
+    summary     layer and hTotal moments of a file (uncached)
+    matrix      Layer branches into the (events, layers) matrix
+    hits        streamed reduction of the hits ntuple
+    fit         batched gamma fits of per-event profiles
+    bootstrap   bootstrap replicas of the mean profile
+    batch       map_files over the sweep with a cold summary cache
+    plotting    profile plots through the reusable figure templates
+    lateral     lateral shapes of stacked hXY_layer* maps (files x layers)
+
+Each benchmark runs in a fresh spawned process, so its peak RSS (the
+process's high-water mark, or ``resource.getrusage`` for it and its
+workers) is its own.
+It runs ``repeat`` times and reports the best time and the throughput in
+its natural unit. ``compare`` checks a run against a baseline JSON and
+flags slowdowns and memory growth beyond the given tolerances.
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+
+class Scale(NamedTuple):
+    events: int = 10000
+    layers: int = 20
+    hits_per_event: int = 50
+    files: int = 6  # sweep files for the batch benchmark
+    replicas: int = 200
+    jobs: int = 1
+
+
+class Result(NamedTuple):
+    name: str
+    seconds: float  # best of the repeats
+    median: float
+    units: float    # work done per repeat
+    unit: str
+    peak_rss_mb: float
+
+    @property
+    def throughput(self):
+        return self.units / self.seconds if self.seconds > 0 else float("inf")
+
+
+def make_fixtures(directory, scale=Scale(), seed=0):
+    """Write (or reuse) the fixtures for ``scale``; returns ``{"single": path, "sweep": [paths]}``."""
+    from .geometry import DEFAULT_GEOMETRY
+    from .synthetic import make_output, make_sweep
+
+    directory = Path(directory) / f"{scale.events}evt_{scale.layers}layers_{scale.hits_per_event}hits"
+    geometry = DEFAULT_GEOMETRY.with_layers(scale.layers)
+    single = directory / "output.root"
+    if not single.exists():
+        directory.mkdir(parents=True, exist_ok=True)
+        make_output(single.with_suffix(".tmp"), scale.events, geometry, hits_per_event=scale.hits_per_event, seed=seed)
+        os.replace(single.with_suffix(".tmp"), single)
+    sweep_dir = directory / "sweep"
+    energies = np.geomspace(1, 100, scale.files).round(1)
+    sweep = sorted(sweep_dir.glob("*.root"))
+    if len(sweep) != scale.files:
+        shutil.rmtree(sweep_dir, ignore_errors=True)
+        sweep = make_sweep(sweep_dir, energies, max(scale.events // 10, 100), geometry, seed=seed)
+    return {"single": single, "sweep": [Path(p) for p in sweep]}
+
+
+def _peak_rss_mb():
+    """Peak RSS of this process or its largest finished child, in MB."""
+    factor = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KiB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * factor
+    try:
+        # Linux keeps ru_maxrss across exec, so a spawned process would report its
+        # parent's peak; the high-water mark of the process's own memory is exact
+        with open("/proc/self/status") as f:
+            own = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmHWM:"))
+    except (OSError, StopIteration):
+        pass
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * factor
+    return max(own, children) / 2**20
+
+
+# --- Benchmarks: setup(fixtures, scale, scratch) -> (run, units, unit) ---
+
+def _loader(fixtures, scale, scratch):
+    from .loader import load_layers
+    return (lambda: load_layers(str(fixtures["single"]))), scale.layers, "layers"
+
+
+def _summary(fixtures, scale, scratch):
+    from .summary import summarize_file
+    return (lambda: summarize_file(str(fixtures["single"]))), 1, "files"
+
+
+def _matrix(fixtures, scale, scratch):
+    from .layermatrix import convert_layer_matrix
+    out = Path(scratch) / "matrix.npy"
+    return (lambda: convert_layer_matrix(str(fixtures["single"]), out)), scale.events, "events"
+
+
+def _hits(fixtures, scale, scratch):
+    from .hits import stream_hits
+    return (lambda: stream_hits(str(fixtures["single"]), progress=False)), scale.events * scale.hits_per_event, "hits"
+
+
+def _fit(fixtures, scale, scratch):
+    from .gammafit import fit_profiles
+    from .geometry import DEFAULT_GEOMETRY
+    from .layermatrix import open_layer_matrix
+
+    matrix, _ = open_layer_matrix(str(fixtures["single"]), Path(scratch) / "matrix.npy")
+    profiles = np.asarray(matrix[:10000], dtype=np.float64)
+    depth = DEFAULT_GEOMETRY.with_layers(scale.layers).layer_depth()
+    return (lambda: fit_profiles(depth, profiles)), len(profiles), "fits"
+
+
+def _bootstrap(fixtures, scale, scratch):
+    from .layermatrix import open_layer_matrix
+    from .resample import bootstrap_profiles
+
+    matrix, _ = open_layer_matrix(str(fixtures["single"]), Path(scratch) / "matrix.npy")
+    return (lambda: bootstrap_profiles(matrix, scale.replicas, jobs=scale.jobs)), scale.replicas, "replicas"
+
+
+def _batch(fixtures, scale, scratch):
+    from .batch import map_files, summarize_layers
+
+    def run():
+        # Cold cache every repeat: the benchmark measures reading, not cache hits
+        shutil.rmtree(os.environ["CALOSIM_CACHE"], ignore_errors=True)
+        return map_files(summarize_layers, fixtures["sweep"], jobs=scale.jobs)
+
+    os.environ["CALOSIM_CACHE"] = str(Path(scratch) / "cache")
+    return run, len(fixtures["sweep"]), "files"
+
+
+def _plotting(fixtures, scale, scratch):
+    from .render import ProfileTemplate, render_many
+    from .summary import summarize_file
+
+    profile = summarize_file(str(fixtures["single"]))["layer_mean"]
+    items = [{"y": profile * (1 + 0.01 * i), "title": f"Profile {i}", "path": str(Path(scratch) / f"p{i}.png")}
+             for i in range(20)]
+    return (lambda: render_many(ProfileTemplate, items, jobs=scale.jobs)), len(items), "plots"
+
+
+def _lateral(fixtures, scale, scratch):
+    from .lateral import lateral_shapes
+    from .loader import load_xy_layers
+
+    maps, x_edges, y_edges = load_xy_layers(str(fixtures["single"]))
+    # The same maps as many files: one (files, layers, nx, ny) stack, as a sweep would give
+    stack = np.broadcast_to(maps, (scale.files,) + maps.shape)
+    return (lambda: lateral_shapes(stack, x_edges, y_edges)), scale.files * scale.layers, "layers"
+
+
+BENCHMARKS = {
+    "loader": _loader,
+    "summary": _summary,
+    "matrix": _matrix,
+    "hits": _hits,
+    "fit": _fit,
+    "bootstrap": _bootstrap,
+    "batch": _batch,
+    "plotting": _plotting,
+    "lateral": _lateral,
+}
+
+
+def _run_one(task):
+    name, fixtures, scale, repeat = task
+    with tempfile.TemporaryDirectory(prefix=f"calosim-bench-{name}-") as scratch:
+        run, units, unit = BENCHMARKS[name](fixtures, scale, scratch)
+        run()  # warm-up: imports, file system cache, lazy initialisation
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+    return Result(name, min(times), float(np.median(times)), units, unit, _peak_rss_mb())
+
+
+def _child(conn, task):
+    try:
+        conn.send(_run_one(task))
+    except BaseException as exc:
+        conn.send(RuntimeError(f"benchmark {task[0]} failed: {exc!r}"))
+    finally:
+        conn.close()
+
+
+def run_benchmarks(fixtures, scale=Scale(), names=None, repeat=3):
+    """Time the benchmarks ``names`` (all by default), each in its own process; yields ``Result``s."""
+    names = list(BENCHMARKS) if names is None else list(names)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"unknown benchmarks: {sorted(unknown)}")
+    # A plain (non-daemonic) process, so benchmarks can start their own worker pools
+    context = multiprocessing.get_context("spawn")
+    for name in names:
+        receive, send = context.Pipe(duplex=False)
+        process = context.Process(target=_child, args=(send, (name, fixtures, scale, repeat)))
+        process.start()
+        send.close()
+        try:
+            result = receive.recv()
+        except EOFError:
+            process.join()
+            result = RuntimeError(f"benchmark {name} died with exit code {process.exitcode}")
+        process.join()
+        if isinstance(result, Exception):
+            raise result
+        yield result
+
+
+def to_json(results, scale):
+    return {
+        "scale": scale._asdict(),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "results": {r.name: dict(r._asdict(), throughput=r.throughput) for r in results},
+    }
+
+
+def compare(current, baseline, time_tolerance=0.25, rss_tolerance=0.25):
+    """Regressions of ``current`` against ``baseline`` (both ``to_json`` dicts).
+
+    A benchmark regresses when its best time grows by more than
+    ``time_tolerance`` or its peak RSS by more than ``rss_tolerance``
+    (fractions). Results at a different scale are not comparable and
+    raise ``ValueError``. Returns a list of messages (empty if none).
+    """
+    if current["scale"] != baseline["scale"]:
+        raise ValueError(f"baseline scale {baseline['scale']} differs from {current['scale']}")
+    messages = []
+    for name, result in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            continue
+        slower = result["seconds"] / reference["seconds"] - 1
+        if slower > time_tolerance:
+            messages.append(f"{name}: {result['seconds']:.3f} s vs {reference['seconds']:.3f} s (+{100 * slower:.0f}%)")
+        grown = result["peak_rss_mb"] / reference["peak_rss_mb"] - 1
+        if grown > rss_tolerance:
+            messages.append(f"{name}: peak RSS {result['peak_rss_mb']:.0f} MB vs "
+                            f"{reference['peak_rss_mb']:.0f} MB (+{100 * grown:.0f}%)")
+    return messages
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,91 @@
+"""On-disk cache of per-file results, invalidated when the ROOT file changes.
+
+Entries live in ``.calosim_cache/`` next to the ROOT file (or in
+``$CALOSIM_CACHE`` if set) as one ``.npz`` per file and namespace. An entry
+is reused when the file's size and mtime still match; if only the mtime
+changed, the xxhash of the contents decides.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import xxhash
+
+CACHE_DIRNAME = ".calosim_cache"
+_CHUNK = 8 * 1024 * 1024
+
+
+def content_hash(path):
+    """xxh64 hex digest of the file contents, read in chunks."""
+    digest = xxhash.xxh64()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(path, digest=True):
+    """Size, mtime and (optionally) content hash identifying one version of a file."""
+    st = os.stat(path)
+    info = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if digest:
+        info["xxh64"] = content_hash(path)
+    return info
+
+
+def cache_dir_for(path, cache_dir=None):
+    if cache_dir is None:
+        cache_dir = os.environ.get("CALOSIM_CACHE") or Path(path).resolve().parent / CACHE_DIRNAME
+    return Path(cache_dir)
+
+
+def entry_path(path, namespace, cache_dir=None, suffix=".npz"):
+    key = xxhash.xxh64(str(Path(path).resolve()).encode()).hexdigest()
+    return cache_dir_for(path, cache_dir) / f"{key}.{namespace}{suffix}"
+
+
+def _read_entry(entry):
+    try:
+        with np.load(entry, allow_pickle=False) as data:
+            meta = json.loads(str(data["__meta__"]))
+            arrays = {k: data[k] for k in data.files if k != "__meta__"}
+    except (OSError, ValueError, KeyError):
+        return None, None
+    return meta, arrays
+
+
+def _write_entry(entry, meta, arrays):
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    tmp = entry.with_name(entry.name + f".{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, __meta__=json.dumps(meta), **arrays)
+    os.replace(tmp, entry)
+
+
+def cached(path, namespace, compute, version=1, cache_dir=None):
+    """Return ``compute(path)`` from the cache, recomputing only when needed.
+
+    ``compute`` must return a dict of NumPy arrays (or scalars). Bump
+    ``version`` whenever ``compute`` changes what it stores.
+    """
+    entry = entry_path(path, namespace, cache_dir)
+    meta, arrays = _read_entry(entry) if entry.exists() else (None, None)
+    current = fingerprint(path, digest=False)
+
+    if meta is not None and meta.get("version") == version:
+        if meta["size"] == current["size"] and meta["mtime_ns"] == current["mtime_ns"]:
+            return arrays
+        if meta["size"] == current["size"]:
+            current["xxh64"] = content_hash(path)
+            if current["xxh64"] == meta["xxh64"]:
+                # Touched but unchanged: refresh the stat part of the key
+                _write_entry(entry, dict(meta, **current), arrays)
+                return arrays
+
+    arrays = {k: np.asarray(v) for k, v in compute(path).items()}
+    if "xxh64" not in current:
+        current["xxh64"] = content_hash(path)
+    _write_entry(entry, dict(current, path=str(path), version=version), arrays)
+    return arrays
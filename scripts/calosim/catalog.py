@@ -0,0 +1,253 @@
+"""SQLite index of sweep outputs, keyed on the output filename convention.
+
+Run outputs are named like ``e-_5GeV_10000evt_8mm_G4_Pb_4mm.root``
+(particle, beam energy, events, absorber thickness and material,
+scintillator thickness). ``Catalog.scan`` walks a directory tree once and
+stores the parsed fields together with file size, mtime and layer count;
+later scans only touch files that are new or changed. Queries then run
+against the index instead of globbing and re-parsing::
+
+    catalog = Catalog("Output")
+    catalog.scan()
+    runs = catalog.query(particle="e-", material="G4_Pb", energy=(5, 50))
+
+The database lives in ``.calosim_cache/catalog.sqlite`` under the scanned
+root unless a path is given.
+"""
+
+import os
+import re
+import sqlite3
+import warnings
+from pathlib import Path
+from typing import NamedTuple
+
+from .cache import CACHE_DIRNAME
+
+FILENAME_PATTERN = re.compile(
+    r"(?P<particle>\w+-?)_(?P<energy>\d+(?:\.\d+)?)GeV_(?P<events>\d+)evt_"
+    r"(?P<abs_thick>\d+(?:\.\d+)?)mm_(?P<abs_mat>G4_\w+?)_(?P<scin_thick>\d+(?:\.\d+)?)mm"
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    particle TEXT,
+    energy REAL,
+    events INTEGER,
+    abs_material TEXT,
+    abs_thickness REAL,
+    scint_thickness REAL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    n_layers INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_config ON runs (abs_material, particle, energy);
+"""
+
+_COLUMNS = ("path", "name", "particle", "energy", "events", "abs_material",
+            "abs_thickness", "scint_thickness", "size", "mtime_ns", "n_layers")
+
+
+class Run(NamedTuple):
+    path: str
+    name: str
+    particle: str
+    energy: float
+    events: int
+    abs_material: str
+    abs_thickness: float
+    scint_thickness: float
+    size: int
+    mtime_ns: int
+    n_layers: int
+
+    @property
+    def label(self):
+        if self.particle is None:
+            return self.name
+        material = self.abs_material[3:] if self.abs_material.startswith("G4_") else self.abs_material
+        return f"{self.particle} {self.energy:g} GeV ({material})"
+
+
+def parse_filename(filename):
+    """Parsed run configuration as strings (empty dict if the name does not match)."""
+    match = FILENAME_PATTERN.search(str(filename))
+    return match.groupdict() if match else {}
+
+
+def count_layers(path):
+    """Number of ``hLayer{i}`` histograms (up to the first gap), or 0 if unreadable."""
+    from .loader import find_layer_keys, open_file
+
+    try:
+        with open_file(path) as file:
+            keys = find_layer_keys(file)
+    except (OSError, ValueError):
+        return 0
+    return len(keys)
+
+
+def _walk(root, suffix):
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    # Skips .calosim_cache/ and the sweep scratch directories
+                    if not entry.name.startswith("."):
+                        stack.append(entry.path)
+                elif entry.name.endswith(suffix):
+                    yield entry
+
+
+class Catalog:
+    """SQLite catalog of the sweep outputs below ``root``."""
+
+    def __init__(self, root, db_path=None):
+        self.root = Path(root).resolve()
+        if db_path is None:
+            db_path = self.root / CACHE_DIRNAME / "catalog.sqlite"
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = Path(db_path)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def scan(self, suffix=".root", layers=True):
+        """Index new or changed files, drop vanished ones; returns the number (re)indexed.
+
+        Unchanged files (same size and mtime) are skipped without being
+        opened. With ``layers=False`` the layer count is not read and stored
+        as ``NULL``.
+        """
+        known = {path: (size, mtime) for path, size, mtime
+                 in self.conn.execute("SELECT path, size, mtime_ns FROM runs")}
+        seen = set()
+        rows = []
+        for entry in _walk(self.root, suffix):
+            st = entry.stat()
+            seen.add(entry.path)
+            if known.get(entry.path) == (st.st_size, st.st_mtime_ns):
+                continue
+            info = parse_filename(entry.name)
+            rows.append((
+                entry.path, entry.name,
+                info.get("particle"),
+                float(info["energy"]) if info else None,
+                int(info["events"]) if info else None,
+                info.get("abs_mat"),
+                float(info["abs_thick"]) if info else None,
+                float(info["scin_thick"]) if info else None,
+                st.st_size, st.st_mtime_ns,
+                count_layers(entry.path) if layers else None,
+            ))
+        gone = [(path,) for path in known if path not in seen]
+        with self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO runs VALUES ({', '.join('?' * len(_COLUMNS))})", rows)
+            self.conn.executemany("DELETE FROM runs WHERE path = ?", gone)
+        return len(rows)
+
+    def query(self, particle=None, material=None, energy=None, abs_thickness=None,
+              scint_thickness=None, events=None, name=None):
+        """Runs matching every given field, ordered by material, particle and energy.
+
+        ``energy`` is either one value or an inclusive ``(low, high)`` range
+        in GeV (use ``None`` for an open end). Files whose names do not follow
+        the convention only match a query by ``name``.
+        """
+        clauses = []
+        params = []
+        for column, value in (("particle", particle), ("abs_material", material),
+                              ("abs_thickness", abs_thickness), ("scint_thickness", scint_thickness),
+                              ("events", events), ("name", name)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if isinstance(energy, (tuple, list)):
+            low, high = energy
+            if low is not None:
+                clauses.append("energy >= ?")
+                params.append(low)
+            if high is not None:
+                clauses.append("energy <= ?")
+                params.append(high)
+        elif energy is not None:
+            clauses.append("energy = ?")
+            params.append(energy)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM runs {where} "
+            "ORDER BY abs_material, particle, energy, path", params)
+        return [Run(*row) for row in cursor]
+
+    def find(self, name):
+        """Path of the file called ``name``; ``KeyError`` if it is missing or ambiguous."""
+        runs = self.query(name=name)
+        if len(runs) != 1:
+            raise KeyError(f"{name}: {len(runs)} matches in catalog of {self.root}")
+        return Path(runs[0].path)
+
+
+# Fields that tell runs with the same Run.label apart, in the order they are added
+_LABEL_EXTRAS = (("{:g} mm abs", "abs_thickness"), ("{:g} mm scint", "scint_thickness"), ("{} evt", "events"))
+
+
+def unique_labels(runs):
+    """Plot labels for ``runs``, one per run and all distinct.
+
+    Runs sharing ``Run.label`` get the fields that tell them apart
+    (absorber and scintillator thickness, event count); runs that are still
+    indistinguishable (copies of one configuration) get their file name,
+    or their path if the names match too, with a warning.
+    """
+    labels = [run.label for run in runs]
+    groups = {}
+    for i, label in enumerate(labels):
+        groups.setdefault(label, []).append(i)
+    for label, members in groups.items():
+        if len(members) < 2:
+            continue
+        group = [runs[i] for i in members]
+        varying = [(fmt, field) for fmt, field in _LABEL_EXTRAS if len({getattr(r, field) for r in group}) > 1]
+        for i, run in zip(members, group):
+            parts = [fmt.format(getattr(run, field)) for fmt, field in varying]
+            labels[i] = f"{label}, {', '.join(parts)}" if parts else label
+        seen = {}
+        for i in members:
+            seen.setdefault(labels[i], []).append(i)
+        for same in seen.values():
+            if len(same) > 1:
+                warnings.warn(f"{len(same)} runs share the label {labels[same[0]]!r}; "
+                              "adding the file names (or paths) to tell them apart", stacklevel=2)
+                # Same file name in several directories: only the path is unique
+                field = "name" if len({runs[i].name for i in same}) == len(same) else "path"
+                for i in same:
+                    labels[i] = f"{labels[i]} [{getattr(runs[i], field)}]"
+    return labels
+
+
+def select_runs(root, files=None, **filters):
+    """Refresh the catalog of ``root`` and return ``{label: path}`` for plotting.
+
+    With query ``filters`` (see ``Catalog.query``) every matching run is
+    returned, under labels made unique by ``unique_labels``; otherwise
+    ``files`` maps labels to file names, which are looked up anywhere
+    below ``root``.
+    """
+    filters = {k: v for k, v in filters.items() if v is not None}
+    with Catalog(root) as catalog:
+        catalog.scan()
+        if filters or not files:
+            runs = catalog.query(**filters)
+            return {label: Path(run.path) for label, run in zip(unique_labels(runs), runs)}
+        return {label: catalog.find(name) for label, name in files.items()}
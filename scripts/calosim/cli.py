@@ -0,0 +1,470 @@
+"""``python -m calosim``: command-line entry point for the common analyses.
+
+Run from ``scripts/`` (like the scripts themselves)::
+
+    python -m calosim layers ../build/output.root
+    python -m calosim lateral ../build/output.root --plot containment.png
+    python -m calosim profile-fit ../build/output.root --bootstrap 1000 --plot profile.png
+    python -m calosim compare ../Output --particle e- --material G4_Pb
+    python -m calosim batch ../Output --incremental
+    python -m calosim animate ../build/output.root --mode xy --out shower.gif
+    python -m calosim resolution ../Output --model crystalball
+
+Only argparse is imported up front. uproot, SciPy and Matplotlib are
+imported inside the subcommands that use them, so ``layers`` on a file
+with a cached summary starts in a fraction of a second.
+"""
+
+import argparse
+import os
+from pathlib import Path
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")  # batch-safe: figures are only saved, never shown
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _add_selection(parser, particle=None, material=None):
+    parser.add_argument("data_dir", nargs="?", type=Path, default=Path("../Output"), help="Directory tree with sweep outputs")
+    parser.add_argument("--particle", default=particle, help="e.g. e-, gamma, pi-")
+    parser.add_argument("--material", default=material, help="Absorber material, e.g. G4_Pb")
+    parser.add_argument("--abs-thickness", type=float, help="Absorber thickness [mm]")
+    parser.add_argument("--scint-thickness", type=float, help="Scintillator thickness [mm]")
+    parser.add_argument("--emin", type=float, help="Lowest beam energy [GeV]")
+    parser.add_argument("--emax", type=float, help="Highest beam energy [GeV]")
+
+
+def _query_runs(args):
+    from .catalog import Catalog
+
+    with Catalog(args.data_dir) as catalog:
+        catalog.scan()
+        return catalog.query(particle=args.particle, material=args.material,
+                             abs_thickness=args.abs_thickness, scint_thickness=args.scint_thickness,
+                             energy=(args.emin, args.emax))
+
+
+def cmd_layers(args):
+    """Per-layer statistics from the cached file summary."""
+    from .geometry import geometry_for
+    from .summary import load_summary
+
+    summary = load_summary(args.path, use_cache=not args.no_cache)
+    mean, rms, entries = summary["layer_mean"], summary["layer_rms"], summary["layer_integral"]
+    geometry = geometry_for(args.path, args.macro, n_layers=len(mean))
+    depth = geometry.layer_depth()
+    print(f"📂 {args.path}: {len(mean)} layers of {geometry.abs_thickness:g} mm {geometry.abs_material} "
+          f"+ {geometry.scint_thickness:g} mm scint (X0 = {geometry.radiation_length:.2f} mm)")
+    print(f"{'layer':>5} {'z [mm]':>8} {'z [X0]':>7} {'mean [MeV]':>11} {'rms [MeV]':>10} {'entries':>9}")
+    for i, (z, t) in enumerate(zip(depth, geometry.to_x0(depth))):
+        print(f"{i:5d} {z:8.1f} {t:7.2f} {mean[i]:11.3f} {rms[i]:10.3f} {entries[i]:9.0f}")
+    if "total_mean" in summary:
+        print(f"hTotal: mean = {float(summary['total_mean']):.3f} MeV, rms = {float(summary['total_rms']):.3f} MeV")
+    return 0
+
+
+def cmd_lateral(args):
+    """Per-layer centroid, lateral RMS and containment radii from the hXY_layer* maps."""
+    from .geometry import geometry_for
+    from .lateral import file_lateral_shapes
+
+    shapes = {}
+    for path in args.paths:
+        # The ring matrix is built once and shared by every file with the same XY binning
+        shape = shapes[path] = file_lateral_shapes(path)
+        geometry = geometry_for(path, args.macro, n_layers=len(shape.energy))
+        print(f"📂 {path}: {len(shape.energy)} layers, R_M estimate (R90 of all layers) = "
+              f"{shape.moliere_estimate:.1f} mm (geometry R_M = {geometry.moliere_radius:.1f} mm)")
+        print(f"{'layer':>5} {'E [MeV]':>10} {'x0 [mm]':>8} {'y0 [mm]':>8} {'rms [mm]':>9} {'R90 [mm]':>9} {'R95 [mm]':>9}")
+        for i in range(len(shape.energy)):
+            print(f"{i:5d} {shape.energy[i]:10.2f} {shape.centroid_x[i]:8.2f} {shape.centroid_y[i]:8.2f} "
+                  f"{shape.rms[i]:9.2f} {shape.r90[i]:9.2f} {shape.r95[i]:9.2f}")
+
+    if args.plot:
+        plt = _pyplot()
+        fig, (ax_curve, ax_radius) = plt.subplots(1, 2, figsize=(11, 4.5))
+        for path, shape in shapes.items():
+            label = Path(path).name
+            line, = ax_curve.plot(shape.r_edges[1:], shape.shower_containment, label=label)
+            ax_radius.plot(shape.r90, "o-", color=line.get_color(), label=f"{label} R90")
+            ax_radius.plot(shape.r95, "s--", color=line.get_color(), label=f"{label} R95")
+        ax_curve.axhline(0.9, color="gray", linestyle=":")
+        ax_curve.set(xlabel="Radius [mm]", ylabel="Contained fraction", title="Radial containment (all layers)")
+        ax_radius.set(xlabel="Layer", ylabel="Radius [mm]", title="Containment radius per layer")
+        for ax in (ax_curve, ax_radius):
+            ax.grid(True)
+            ax.legend(fontsize="small")
+        fig.tight_layout()
+        fig.savefig(args.plot)
+        plt.close(fig)
+        print(f"📈 Containment plot saved to {args.plot}")
+    return 0
+
+
+def cmd_profile_fit(args):
+    """Gamma fit of the mean longitudinal profile, with optional bootstrap errors."""
+    import numpy as np
+
+    from .gammafit import WarmStartCache, fit_profiles, gamma_profile
+    from .geometry import geometry_for
+    from .summary import load_summary
+
+    profile = load_summary(args.path)["layer_mean"]
+    geometry = geometry_for(args.path, args.macro, n_layers=len(profile))
+    depth = geometry.layer_depth()
+    # Start from the fit of the nearest energy of the same configuration, if any
+    seeds = None if args.no_warm_start else WarmStartCache(args.path.resolve().parent)
+    p0 = seeds.get_file(args.path) if seeds is not None else None
+    fit = fit_profiles(depth, profile, p0="moments" if p0 is None else p0)
+    if not fit.converged[0]:
+        print("❌ Fit did not converge")
+        return 1
+    if seeds is not None:
+        seeds.put_file(args.path, fit.params[0])
+        seeds.save()
+    (a, b, scale), t_max, width = fit.params[0], fit.t_max[0], fit.width[0]
+    t_max_err, width_err = fit.t_max_error[0], fit.width_error[0]
+    if args.bootstrap:
+        from .layermatrix import open_layer_matrix
+        from .resample import profile_uncertainties
+
+        matrix, _ = open_layer_matrix(args.path)
+        estimates = profile_uncertainties(matrix, depth, n_replicas=args.bootstrap, jobs=args.jobs,
+                                          p0=fit.params)
+        t_max_err, width_err = estimates["t_max"].error, estimates["width"].error
+
+    print(f"Gamma Fit Parameters: a = {a:.2f}, b = {b:.4f}, scale = {scale:.3f}")
+    print(f"Shower Maximum (z_max): {t_max:.2f} ± {t_max_err:.2f} mm ({geometry.to_x0(t_max):.2f} X0)")
+    print(f"Shower Width (σ):       {width:.2f} ± {width_err:.2f} mm")
+
+    if args.plot:
+        plt = _pyplot()
+        z_fine = np.linspace(0, depth.max() + geometry.pitch, 300)
+        plt.figure(figsize=(10, 6))
+        plt.plot(depth, profile, "o", label="Simulated Data", color="blue")
+        plt.plot(z_fine, gamma_profile(z_fine, a, b, scale), "r-", label="Gamma Fit")
+        plt.axvline(t_max, color="gray", linestyle="--", label=f"z_max ≈ {t_max:.1f} ± {t_max_err:.1f} mm")
+        plt.xlabel("Depth in Calorimeter (mm)")
+        plt.ylabel("⟨E_dep⟩ (MeV)")
+        plt.title("Longitudinal Shower Profile (Gamma Fit)")
+        plt.legend()
+        plt.grid(True)
+        plt.tight_layout()
+        plt.savefig(args.plot, dpi=300)
+        plt.close()
+        print(f"✅ Saved {args.plot}")
+    return 0
+
+
+def cmd_compare(args):
+    """Overlay the mean profiles and layer RMS of a catalog selection against depth in X0."""
+    from .batch import map_files, summarize_layers
+    from .catalog import unique_labels
+    from .geometry import geometry_for
+
+    runs = _query_runs(args)
+    if not runs:
+        print("❌ No runs match the selection")
+        return 1
+    summaries = map_files(summarize_layers, [run.path for run in runs], jobs=args.jobs)
+
+    plt = _pyplot()
+    figures = {name: plt.figure(figsize=(10, 6)) for name in ("profiles", "rms")}
+    for run, label, summary in zip(runs, unique_labels(runs), summaries):
+        geometry = geometry_for(run.path, n_layers=len(summary["mean"]))
+        depth = geometry.layer_depth_x0() if not args.layers else range(len(summary["mean"]))
+        figures["profiles"].gca().plot(depth, summary["mean"], "o-", label=label)
+        figures["rms"].gca().plot(depth, summary["rms"], "o-", label=label)
+        print(f"   {label}: {run.name}")
+    xlabel = "Layer Number" if args.layers else "Depth (X0)"
+    for name, ylabel in (("profiles", "Mean Energy (MeV)"), ("rms", "Energy Std Dev (MeV)")):
+        ax = figures[name].gca()
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.grid(True)
+        ax.legend()
+        figures[name].tight_layout()
+        figures[name].savefig(f"{args.out}_{name}.png")
+        plt.close(figures[name])
+    print(f"✅ Comparison plots saved: {args.out}_profiles.png, {args.out}_rms.png")
+    return 0
+
+
+def cmd_batch(args):
+    """Profile plots and the layer summary table of every file in a directory."""
+    import glob
+
+    from .batch import map_files, summarize_layers
+    from .manifest import Manifest, merge_summary
+    from .render import ProfileTemplate, render_many
+
+    root_files = sorted(glob.glob(os.path.join(args.directory, "*.root")))
+    os.makedirs(args.outdir, exist_ok=True)
+
+    # The manifest records what was processed; the summary table holds one row per file
+    manifest = Manifest(os.path.join(args.outdir, "manifest.json"))
+    table_path = os.path.join(args.outdir, "layer_summary.npz")
+    removed = manifest.removed(root_files)
+    todo = manifest.changed(root_files) if args.incremental else root_files
+    if args.incremental:
+        print(f"🔁 {len(todo)} new or changed, {len(root_files) - len(todo)} up to date, {len(removed)} removed")
+
+    # Read and reduce files in parallel; results come back in file order
+    print(f"📂 Processing {len(todo)} files with {args.jobs} workers ...")
+    summaries = map_files(summarize_layers, todo, jobs=args.jobs)
+
+    # Render all profile plots from one reusable figure per worker
+    items = []
+    for summary in summaries:
+        fname = os.path.basename(summary["path"]).replace(".root", "")
+        items.append({
+            "y": summary["mean"],
+            "title": f"Shower Profile: {fname}",
+            "path": f"{args.outdir}/{fname}_profile.png",
+        })
+    render_many(ProfileTemplate, items, jobs=args.jobs)
+
+    # Merge the new rows into the summary table, then record them as done
+    if args.incremental:
+        merged = merge_summary(table_path, summaries, drop=removed)
+    else:
+        if os.path.exists(table_path):
+            os.remove(table_path)
+        merged = merge_summary(table_path, summaries)
+        manifest.files = {}
+    if args.export:
+        from functools import partial
+
+        from .export import append, summarize_for_export
+        from .gammafit import WarmStartCache
+
+        # Workers only read the seeds; the converged fits are stored afterwards
+        seeds = WarmStartCache(args.directory)
+        rows = map_files(partial(summarize_for_export, seeds=seeds), todo, jobs=args.jobs)
+        for row in rows:
+            if row["files"].get("fit_converged"):
+                seeds.put_file(row["files"]["path"], [row["files"][k] for k in ("gamma_a", "gamma_b", "gamma_scale")])
+        seeds.save()
+        part = append(args.export, rows, drop=removed, format=args.format)
+        if part is None:
+            print(f"🗂️ Export {args.export} is up to date")
+        else:
+            print(f"🗂️ Exported {len(rows)} files to {args.export} ({part})")
+    manifest.forget(removed)
+    manifest.update(todo)
+    manifest.save()
+
+    print(f"📊 Summary table with {len(merged)} files: {table_path}")
+    print(f"✅ Batch processing complete. Results saved to ./{args.outdir}/")
+    return 0
+
+
+def cmd_animate(args):
+    """Animate a file layer by layer: energy spectra or XY maps."""
+    from .animate import animate_xy_layers, write_animation
+
+    if args.mode == "xy":
+        from .loader import load_xy_layers
+
+        stack, _, _ = load_xy_layers(args.path)
+        animate_xy_layers(stack, args.out, fps=args.fps, log=not args.linear, jobs=args.jobs)
+    else:
+        from .loader import load_layers
+        from .render import SpectrumTemplate, render_frames
+
+        layers, edges = load_layers(args.path)
+        items = [{"values": counts, "title": f"Shower Energy Deposition - Layer {i}"}
+                 for i, counts in enumerate(layers)]
+        frames = render_frames(SpectrumTemplate, items, jobs=args.jobs, edges=edges, ymax=layers.max() * 1.2)
+        write_animation(frames, args.out, fps=args.fps)
+    print(f"✅ Animation saved to {args.out}")
+    return 0
+
+
+def cmd_resolution(args):
+    """Energy-resolution scan over a catalog selection (plot and CSV)."""
+    import csv
+
+    import numpy as np
+
+    from .resolution import resolution_model, resolution_scan
+
+    runs = _query_runs(args)
+    if not runs:
+        print("❌ No runs match the selection")
+        return 1
+    energies = sorted({run.energy for run in runs})
+    if len(energies) < 3:
+        print(f"❌ The resolution fit needs at least 3 beam energies, the selection has {len(energies)}")
+        return 1
+    if len(runs) != len(energies):
+        print("❌ Several geometries per energy selected; add --abs-thickness/--scint-thickness")
+        return 1
+    print(f"📂 {len(runs)} runs: {', '.join(f'{e:g}' for e in energies)} GeV")
+
+    try:
+        scan = resolution_scan(runs, model=args.model, n_boot=args.bootstrap, jobs=args.jobs, seed=args.seed)
+    except ValueError as exc:
+        print(f"❌ {exc}")
+        return 1
+    failed = [f"{peak_energy:g}" for peak_energy, peak in zip(scan.energies, scan.peaks) if not peak.converged]
+    if failed:
+        print(f"⚠️ Peak fits failed at {', '.join(failed)} GeV; these points are left out of the model fit")
+    (a, b, c), (da, db, dc) = scan.params, scan.errors
+    print(f"📈 σ/E = {100 * a:.2f}%/√E ⊕ {100 * b:.2f}% ⊕ {c:.3f}/E")
+    print(f"   (±{100 * da:.2f}%, ±{100 * db:.2f}%, ±{dc:.3f}; {args.bootstrap} bootstrap replicas)")
+
+    # 🔷 Resolution vs. energy with the fitted model
+    plt = _pyplot()
+    e_fine = np.geomspace(scan.energies.min(), scan.energies.max(), 200)
+    plt.figure(figsize=(8, 5))
+    plt.errorbar(scan.energies, 100 * scan.resolutions, yerr=100 * scan.resolution_errors, fmt="o", capsize=3,
+                 label=f"{args.particle}, {args.material}")
+    plt.plot(e_fine, 100 * resolution_model(e_fine, *scan.params), "r-",
+             label=f"{100 * a:.1f}%/√E ⊕ {100 * b:.1f}% ⊕ {c:.2f}/E")
+    plt.xscale("log")
+    plt.xlabel("Beam Energy (GeV)")
+    plt.ylabel("σ_E / E (%)")
+    plt.title("Energy Resolution")
+    plt.grid(True, which="both", alpha=0.4)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(f"{args.out}.png")
+    plt.close()
+
+    with open(f"{args.out}.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Energy (GeV)", "Mean", "Sigma", "Resolution", "Resolution Error", "Converged", "File"])
+        for energy, peak, error, path in zip(scan.energies, scan.peaks, scan.resolution_errors, scan.paths):
+            writer.writerow([f"{energy:g}", f"{peak.mean:.4f}", f"{peak.sigma:.4f}", f"{peak.resolution:.6f}",
+                             f"{error:.6f}", peak.converged, Path(path).name])
+
+    print(f"✅ Saved {args.out}.png and {args.out}.csv")
+    return 0
+
+
+def cmd_bench(args):
+    """Benchmarks on synthetic fixtures, optionally checked against a baseline."""
+    import json
+    import tempfile
+
+    from .bench import Scale, compare, load_baseline, make_fixtures, run_benchmarks, to_json
+
+    scale = Scale(args.events, args.layers, args.hits, args.files, args.replicas, args.jobs)
+    fixture_dir = args.fixtures or Path(tempfile.gettempdir()) / "calosim-bench"
+    print(f"🧪 Fixtures in {fixture_dir} ({scale.events} events, {scale.layers} layers, "
+          f"{scale.hits_per_event} hits/event, {scale.files} sweep files)")
+    fixtures = make_fixtures(fixture_dir, scale)
+
+    results = []
+    print(f"{'benchmark':<10} {'best [s]':>9} {'median [s]':>10} {'throughput':>20} {'peak RSS':>10}")
+    for result in run_benchmarks(fixtures, scale, args.only, args.repeat):
+        results.append(result)
+        print(f"{result.name:<10} {result.seconds:9.3f} {result.median:10.3f} "
+              f"{result.throughput:12.4g} {result.unit + '/s':<7} {result.peak_rss_mb:7.0f} MB")
+
+    current = to_json(results, scale)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=1)
+        print(f"✅ Results saved to {args.output}")
+    if args.baseline:
+        regressions = compare(current, load_baseline(args.baseline), args.time_tolerance, args.rss_tolerance)
+        for message in regressions:
+            print(f"❌ {message}")
+        if regressions:
+            return 1
+        print(f"✅ No regressions against {args.baseline}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="calosim", description="CalorimeterSim output analysis")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    p = commands.add_parser("layers", help="print per-layer statistics of one file")
+    p.add_argument("path", type=Path)
+    p.add_argument("--macro", type=Path, help="Macro the file was produced with (geometry)")
+    p.add_argument("--no-cache", action="store_true", help="Re-read the file instead of using .calosim_cache/")
+    p.set_defaults(func=cmd_layers)
+
+    p = commands.add_parser("lateral", help="lateral shower shapes from the per-layer XY maps")
+    p.add_argument("paths", nargs="+", type=Path)
+    p.add_argument("--macro", type=Path, help="Macro the files were produced with (geometry)")
+    p.add_argument("--plot", help="Save the containment curves and radii to this image")
+    p.set_defaults(func=cmd_lateral)
+
+    p = commands.add_parser("profile-fit", help="gamma fit of the longitudinal profile")
+    p.add_argument("path", type=Path)
+    p.add_argument("--macro", type=Path, help="Macro the file was produced with (geometry)")
+    p.add_argument("--bootstrap", type=int, default=0, metavar="N",
+                   help="Bootstrap replicas for the z_max / width errors (default: fit covariance)")
+    p.add_argument("--plot", help="Save the profile and fit to this image")
+    p.add_argument("--no-warm-start", action="store_true",
+                   help="Start from profile moments instead of the fit seeds of similar runs")
+    p.add_argument("--jobs", "-j", type=int, help="Number of worker processes (default: all CPUs)")
+    p.set_defaults(func=cmd_profile_fit)
+
+    p = commands.add_parser("compare", help="overlay the profiles of a catalog selection")
+    _add_selection(p)
+    p.add_argument("--layers", action="store_true", help="Plot against layer number instead of depth in X0")
+    p.add_argument("--out", default="compare", help="Output prefix for the plots")
+    p.add_argument("--jobs", "-j", type=int, help="Number of worker processes (default: all CPUs)")
+    p.set_defaults(func=cmd_compare)
+
+    p = commands.add_parser("batch", help="profile plots and summary table of a directory")
+    p.add_argument("directory", nargs="?", default=".", help="Directory containing *.root files")
+    p.add_argument("--jobs", "-j", type=int, help="Number of worker processes (default: all CPUs)")
+    p.add_argument("--outdir", default="batch_plots", help="Directory for the profile plots")
+    p.add_argument("--incremental", "-i", action="store_true",
+                   help="Only process files that are new or changed since the last run")
+    p.add_argument("--export", metavar="DIR", help="Append per-file and per-layer summaries to this export")
+    p.add_argument("--format", choices=["npz", "parquet"], default="npz", help="Format of the export parts")
+    p.set_defaults(func=cmd_batch)
+
+    p = commands.add_parser("animate", help="layer-by-layer animation of one file")
+    p.add_argument("path", type=Path)
+    p.add_argument("--mode", choices=["spectra", "xy"], default="spectra",
+                   help="Energy spectrum per layer or XY map per layer (hXY_layer*)")
+    p.add_argument("--out", default="shower_evolution.gif", help="Output .gif (or .mp4 with ffmpeg)")
+    p.add_argument("--fps", type=int, default=5)
+    p.add_argument("--linear", action="store_true", help="Linear instead of log colour scale (xy)")
+    p.add_argument("--jobs", "-j", type=int, help="Number of worker processes (default: all CPUs)")
+    p.set_defaults(func=cmd_animate)
+
+    p = commands.add_parser("resolution", help="energy-resolution scan over a catalog selection")
+    _add_selection(p, particle="e-", material="G4_Pb")
+    p.add_argument("--model", choices=["gauss", "crystalball"], default="gauss", help="Peak shape")
+    p.add_argument("--bootstrap", type=int, default=200, help="Bootstrap replicas")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--jobs", "-j", type=int, help="Number of worker processes (default: all CPUs)")
+    p.add_argument("--out", default="resolution", help="Output prefix for the plot and CSV")
+    p.set_defaults(func=cmd_resolution)
+
+    p = commands.add_parser("bench", help="time the analysis hot paths on synthetic fixtures")
+    p.add_argument("--events", type=int, default=10000, help="Events in the single-file fixture")
+    p.add_argument("--layers", type=int, default=20)
+    p.add_argument("--hits", type=int, default=50, help="Hits per event in the hits ntuple")
+    p.add_argument("--files", type=int, default=6, help="Files in the sweep fixture (batch benchmark)")
+    p.add_argument("--replicas", type=int, default=200, help="Bootstrap replicas")
+    p.add_argument("--jobs", "-j", type=int, default=1, help="Worker processes for the parallel paths")
+    p.add_argument("--repeat", type=int, default=3, help="Timed repeats per benchmark (best is kept)")
+    p.add_argument("--only", nargs="+", metavar="NAME", help="Run only these benchmarks")
+    p.add_argument("--fixtures", type=Path, help="Directory for the generated fixtures (reused across runs)")
+    p.add_argument("--output", help="Write the results as JSON")
+    p.add_argument("--baseline", help="Results JSON to check for regressions (exit code 1 if any)")
+    p.add_argument("--time-tolerance", type=float, default=0.25, help="Allowed slowdown as a fraction")
+    p.add_argument("--rss-tolerance", type=float, default=0.25, help="Allowed peak-RSS growth as a fraction")
+    p.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, "jobs", 1) is None:
+        from .batch import default_jobs
+        args.jobs = default_jobs()
+    return args.func(args)
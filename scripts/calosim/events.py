@@ -0,0 +1,115 @@
+"""Event-indexed access to the ``hits`` ntuple.
+
+RootIO writes the hits of one event as a contiguous block of rows tagged
+with an ``event`` column, so a small index (event -> row range) turns
+event lookups into direct entry-range reads instead of full scans.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import uproot
+
+from .cache import cached
+
+INDEX_VERSION = 1
+HIT_COLUMNS = ["edep", "x", "y", "z", "event", "layer"]
+
+
+class EventIndex(NamedTuple):
+    event_ids: np.ndarray  # sorted event IDs, shape (n_events,)
+    starts: np.ndarray     # first ntuple row of each event
+    stops: np.ndarray      # one past the last row of each event
+
+    @property
+    def counts(self):
+        return self.stops - self.starts
+
+    def rows(self, event_ids):
+        """``(starts, stops)`` of the given events; ``KeyError`` if one has no hits."""
+        event_ids = np.atleast_1d(np.asarray(event_ids, dtype=np.int64))
+        pos = np.searchsorted(self.event_ids, event_ids)
+        pos = np.minimum(pos, self.event_ids.size - 1)
+        missing = self.event_ids[pos] != event_ids if self.event_ids.size else np.ones(event_ids.size, bool)
+        if np.any(missing):
+            raise KeyError(f"events without hits: {event_ids[missing][:10].tolist()}")
+        return self.starts[pos], self.stops[pos]
+
+
+def scan_event_index(path, tree="hits", step_size="50 MB"):
+    """Build the index by streaming only the ``event`` column."""
+    ids, starts = [], []
+    previous = None
+    n_rows = 0
+    with uproot.open(path) as file:
+        for chunk in file[tree].iterate(["event"], step_size=step_size, library="np"):
+            event = chunk["event"].astype(np.int64)
+            if event.size == 0:
+                continue
+            before = event[0] - 1 if previous is None else previous
+            change = np.flatnonzero(np.diff(event, prepend=before))
+            ids.append(event[change])
+            starts.append(change + n_rows)
+            previous = event[-1]
+            n_rows += event.size
+
+    event_ids = np.concatenate(ids) if ids else np.zeros(0, np.int64)
+    starts = np.concatenate(starts) if starts else np.zeros(0, np.int64)
+    stops = np.append(starts[1:], n_rows).astype(np.int64)
+
+    order = np.argsort(event_ids, kind="stable")
+    event_ids = event_ids[order]
+    if np.any(np.diff(event_ids) == 0):
+        raise ValueError(f"hits of an event are not contiguous in {path}")
+    return {"event_ids": event_ids, "starts": starts[order], "stops": stops[order]}
+
+
+def load_event_index(path, tree="hits", use_cache=True):
+    """Event index of ``path``, cached in ``.calosim_cache/`` like the summaries."""
+    if use_cache:
+        data = cached(path, f"events_{tree}", lambda p: scan_event_index(p, tree), version=INDEX_VERSION)
+    else:
+        data = scan_event_index(path, tree)
+    return EventIndex(data["event_ids"], data["starts"], data["stops"])
+
+
+def read_events(path, event_ids, branches=None, index=None, tree="hits"):
+    """Hits of the requested events, concatenated in request order.
+
+    Returns ``(arrays, counts)``: a dict of branch -> NumPy array and the
+    number of hits per requested event (``np.split(arr, np.cumsum(counts)[:-1])``
+    recovers per-event arrays). Adjacent row ranges are read together.
+    """
+    if index is None:
+        index = load_event_index(path, tree)
+    if branches is None:
+        branches = HIT_COLUMNS
+    starts, stops = index.rows(event_ids)
+
+    pieces = {name: [] for name in branches}
+    with uproot.open(path) as file:
+        ntuple = file[tree]
+        if starts.size == 0:
+            # No events requested: empty arrays with the branch dtypes
+            return ntuple.arrays(branches, entry_stop=0, library="np"), stops - starts
+        for start, stop in _row_runs(starts, stops):
+            arrays = ntuple.arrays(branches, entry_start=int(start), entry_stop=int(stop), library="np")
+            for name in branches:
+                pieces[name].append(arrays[name])
+    arrays = {name: np.concatenate(chunks) for name, chunks in pieces.items()}
+    return arrays, stops - starts
+
+
+def _row_runs(starts, stops):
+    """``(start, stop)`` row ranges with runs of adjacent ranges merged."""
+    # Merge runs of consecutive ranges (e.g. event lists like range(100, 200))
+    breaks = np.flatnonzero(starts[1:] != stops[:-1]) + 1
+    run_starts = starts[np.r_[0, breaks]]
+    run_stops = stops[np.r_[breaks - 1, stops.size - 1]]
+    return zip(run_starts, run_stops)
+
+
+def read_event(path, event_id, branches=None, index=None, tree="hits"):
+    """Hits of a single event as a dict of branch -> NumPy array."""
+    arrays, _ = read_events(path, [event_id], branches, index, tree)
+    return arrays
@@ -0,0 +1,329 @@
+"""Columnar export of per-file and per-layer shower summaries.
+
+An export is a directory holding two tables, ``files`` (one row per ROOT
+file) and ``layers`` (one row per file and layer), with the fixed column
+sets ``FILE_COLUMNS`` and ``LAYER_COLUMNS``. Values are stored at full
+precision in native dtypes; missing values are NaN (floats), -1 (integers)
+or "" (strings).
+
+Every ``append`` writes one new part per table (``files/part-*.npz`` or
+``.parquet``) and never rewrites earlier parts. Appending the files of
+one batch run therefore costs only that run's rows. Readers combine the
+parts in order: a file written again replaces its earlier rows, and
+dropped files disappear. ``compact`` merges the parts into one::
+
+    rows = map_files(summarize_for_export, paths, jobs=8)
+    append("summary", rows)
+    files = read_table("summary", "files")   # {column: array}
+
+Parts written under an older ``SCHEMA_VERSION`` stay readable; columns
+added since then read as missing.
+
+NPZ parts are always available (compressed, ``allow_pickle=False``).
+Parquet parts need ``pyarrow``, which is imported only when a Parquet
+part is written or read.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+SCHEMA_VERSION = 2  # 2: lateral shape columns
+
+# Column -> dtype; the order is the order written to every part
+FILE_COLUMNS = {
+    "path": "U",
+    "name": "U",
+    "particle": "U",
+    "energy_gev": "f8",
+    "events": "i8",
+    "abs_material": "U",
+    "abs_thickness_mm": "f8",
+    "scint_thickness_mm": "f8",
+    "n_layers": "i8",
+    "radiation_length_mm": "f8",
+    "moliere_radius_mm": "f8",
+    "total_mean_mev": "f8",
+    "total_rms_mev": "f8",
+    "gamma_a": "f8",
+    "gamma_b": "f8",
+    "gamma_scale": "f8",
+    "fit_converged": "?",
+    "z_max_mm": "f8",
+    "z_max_error_mm": "f8",
+    "z_max_x0": "f8",
+    "width_mm": "f8",
+    "width_error_mm": "f8",
+    "rear_fraction": "f8",  # share of the profile in the last layer
+    "leakage": "f8",        # gamma-fit fraction of the shower beyond the stack
+    "peak_mean_mev": "f8",
+    "peak_sigma_mev": "f8",
+    "resolution": "f8",     # peak sigma / mean
+    "moliere_estimate_mm": "f8",  # R90 of the summed hXY_layer* maps
+}
+
+LAYER_COLUMNS = {
+    "path": "U",
+    "layer": "i8",
+    "depth_mm": "f8",
+    "depth_x0": "f8",
+    "mean_mev": "f8",
+    "rms_mev": "f8",
+    "mean_error_mev": "f8",
+    "skewness": "f8",
+    "entries": "f8",
+    "centroid_x_mm": "f8",
+    "centroid_y_mm": "f8",
+    "lateral_rms_mm": "f8",
+    "r90_mm": "f8",
+    "r95_mm": "f8",
+}
+
+TABLES = {"files": FILE_COLUMNS, "layers": LAYER_COLUMNS}
+FORMATS = (".npz", ".parquet")
+
+_MISSING = {"U": "", "f8": np.nan, "i8": -1, "?": False}
+
+
+def _column(values, dtype, length):
+    if values is None:
+        return np.full(length, _MISSING[dtype], dtype=dtype)
+    array = np.asarray(values)
+    if dtype == "U":
+        return array.astype(str)
+    if dtype == "i8" and array.dtype.kind == "f":
+        array = np.where(np.isfinite(array), array, -1)
+    return array.astype(dtype)
+
+
+def to_columns(rows, table):
+    """Column arrays of ``table`` from row dicts (per-layer rows hold arrays)."""
+    schema = TABLES[table]
+    if not rows:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in schema.items()}
+    if table == "files":
+        return {name: _column([row.get(name, _MISSING[dtype]) for row in rows], dtype, len(rows))
+                for name, dtype in schema.items()}
+    lengths = [len(row["layer"]) for row in rows]
+    columns = {}
+    for name, dtype in schema.items():
+        parts = [np.broadcast_to(np.asarray(row.get(name, _MISSING[dtype])), (n,)) for row, n in zip(rows, lengths)]
+        columns[name] = _column(np.concatenate(parts), dtype, sum(lengths))
+    return columns
+
+
+def summarize_for_export(path, fit=True, resolution=True, lateral=True, macro=None, seeds=None):
+    """``{"files": row, "layers": row}`` for one ROOT file.
+
+    The file row carries the run configuration (file name convention),
+    effective X0 and Molière radius of the geometry, hTotal moments, the
+    gamma fit of the mean profile (``fit``) and the visible-energy peak
+    (``resolution``). The layer row holds one array per ``LAYER_COLUMNS``
+    entry; the lateral columns (``lateral``) stay missing for files
+    without ``hXY_layer*`` maps. ``seeds`` (a ``WarmStartCache``) gives the
+    gamma fit start values of similar earlier runs.
+    """
+    from .catalog import parse_filename
+    from .geometry import geometry_for
+    from .summary import load_summary
+
+    path = Path(path)
+    summary = load_summary(path)
+    info = parse_filename(path.name)
+    profile = summary["layer_mean"]
+    geometry = geometry_for(path, macro, n_layers=len(profile))
+    depth = geometry.layer_depth()
+    total = float(profile.sum())
+
+    row = {
+        "path": str(path.resolve()),
+        "name": path.name,
+        "particle": info.get("particle", ""),
+        "energy_gev": float(info["energy"]) if info else np.nan,
+        "events": int(info["events"]) if info else -1,
+        "abs_material": geometry.abs_material,
+        "abs_thickness_mm": geometry.abs_thickness,
+        "scint_thickness_mm": geometry.scint_thickness,
+        "n_layers": len(profile),
+        "radiation_length_mm": geometry.radiation_length,
+        "moliere_radius_mm": geometry.moliere_radius,
+        "total_mean_mev": float(summary.get("total_mean", np.nan)),
+        "total_rms_mev": float(summary.get("total_rms", np.nan)),
+        "rear_fraction": float(profile[-1] / total) if total > 0 else np.nan,
+    }
+    if fit:
+        from scipy.special import gammaincc
+
+        from .gammafit import fit_profiles
+
+        p0 = seeds.get_file(path) if seeds is not None else None
+        result = fit_profiles(depth, profile, p0="moments" if p0 is None else p0)
+        a, b, scale = result.params[0]
+        row.update(gamma_a=a, gamma_b=b, gamma_scale=scale, fit_converged=bool(result.converged[0]))
+        if result.converged[0]:
+            row.update(z_max_mm=result.t_max[0], z_max_error_mm=result.t_max_error[0],
+                       z_max_x0=float(geometry.to_x0(result.t_max[0])), width_mm=result.width[0],
+                       width_error_mm=result.width_error[0],
+                       leakage=float(gammaincc(a, b * geometry.total_thickness)))
+    if resolution:
+        from .resolution import file_energy_histogram, fit_peak
+
+        peak = fit_peak(*file_energy_histogram(path))
+        row.update(peak_mean_mev=peak.mean, peak_sigma_mev=peak.sigma, resolution=peak.resolution)
+
+    layers = {
+        "path": row["path"],
+        "layer": np.arange(len(profile)),
+        "depth_mm": depth,
+        "depth_x0": geometry.to_x0(depth),
+        "mean_mev": profile,
+        "rms_mev": summary["layer_rms"],
+        "mean_error_mev": summary["layer_mean_error"],
+        "skewness": summary["layer_skewness"],
+        "entries": summary["layer_integral"],
+    }
+    if lateral:
+        from .lateral import file_lateral_shapes
+
+        try:
+            shape = file_lateral_shapes(path)
+        except KeyError:
+            shape = None
+        if shape is not None:
+            n = min(len(profile), len(shape.energy))
+
+            def per_layer(values):
+                column = np.full(len(profile), np.nan)
+                column[:n] = values[:n]
+                return column
+
+            row["moliere_estimate_mm"] = float(shape.moliere_estimate)
+            layers.update(centroid_x_mm=per_layer(shape.centroid_x), centroid_y_mm=per_layer(shape.centroid_y),
+                          lateral_rms_mm=per_layer(shape.rms), r90_mm=per_layer(shape.r90),
+                          r95_mm=per_layer(shape.r95))
+    return {"files": row, "layers": layers}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow); use format='npz' instead") from None
+    return pyarrow
+
+
+def _write_part(path, columns, meta):
+    tmp = path.with_name(path.name + ".tmp")
+    if path.suffix == ".parquet":
+        pa = _pyarrow()
+        table = pa.table(columns).replace_schema_metadata({"calosim": json.dumps(meta)})
+        pa.parquet.write_table(table, tmp, compression="zstd")
+    else:
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, __meta__=json.dumps(meta), **columns)
+    os.replace(tmp, path)
+
+
+def _read_part(path):
+    if path.suffix == ".parquet":
+        pa = _pyarrow()
+        table = pa.parquet.read_table(path)
+        meta = json.loads(table.schema.metadata[b"calosim"])
+        return meta, {name: table.column(name).to_numpy() for name in table.column_names}
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["__meta__"]))
+        return meta, {name: data[name] for name in data.files if name != "__meta__"}
+
+
+def _parts(directory, table):
+    folder = Path(directory) / table
+    if not folder.is_dir():
+        return []
+    return sorted(p for p in folder.iterdir() if p.name.startswith("part-") and p.suffix in FORMATS)
+
+
+def append(directory, rows, drop=(), format="npz"):
+    """Write ``rows`` (``summarize_for_export`` results) as a new part of both tables.
+
+    Rows for files already in the export supersede the earlier ones;
+    ``drop`` lists file paths to remove. Returns the part name, or ``None``
+    when there is nothing to write (no rows and no drops).
+    """
+    suffix = f".{format.lstrip('.')}"
+    if suffix not in FORMATS:
+        raise ValueError(f"unknown export format {format!r}")
+    if not rows and not drop:
+        return None
+    if suffix == ".parquet":
+        _pyarrow()
+    name = f"part-{time.time_ns():020d}-{os.getpid()}{suffix}"
+    meta = {"version": SCHEMA_VERSION, "dropped": [str(Path(p).resolve()) for p in drop]}
+    for table in TABLES:
+        folder = Path(directory) / table
+        folder.mkdir(parents=True, exist_ok=True)
+        _write_part(folder / name, to_columns([row[table] for row in rows], table), meta)
+    return name
+
+
+def read_table(directory, table="files"):
+    """Current contents of ``table`` as ``{column: array}``, in file path order.
+
+    Rows of a file come from the newest part that wrote it, unless a later
+    part dropped it.
+    """
+    schema = TABLES[table]
+    latest = {}
+    loaded = []
+    for index, part in enumerate(_parts(directory, table)):
+        meta, columns = _read_part(part)
+        if not 1 <= meta.get("version", 0) <= SCHEMA_VERSION:
+            raise ValueError(f"{part}: schema version {meta.get('version')}, expected at most {SCHEMA_VERSION}")
+        length = len(columns["path"])
+        for name, dtype in schema.items():
+            if name not in columns:
+                columns[name] = _column(None, dtype, length)
+        for dropped in meta["dropped"]:
+            latest.pop(dropped, None)
+        for path in np.unique(columns["path"]):
+            latest[str(path)] = index
+        loaded.append(columns)
+    if not loaded:
+        return to_columns([], table)
+
+    keep = []
+    for index, columns in enumerate(loaded):
+        owner = np.array([latest.get(str(p), -1) for p in columns["path"]])
+        keep.append(owner == index)
+    combined = {name: np.concatenate([c[name][k] for c, k in zip(loaded, keep)]).astype(dtype)
+                for name, dtype in schema.items()}
+    order = np.lexsort((combined["layer"], combined["path"])) if table == "layers" else np.argsort(combined["path"], kind="stable")
+    return {name: values[order] for name, values in combined.items()}
+
+
+def compact(directory, format="npz"):
+    """Replace all parts of both tables by one part holding the current rows.
+
+    Returns the part name, or ``None`` for an export without parts.
+    """
+    suffix = f".{format.lstrip('.')}"
+    if suffix not in FORMATS:
+        raise ValueError(f"unknown export format {format!r}")
+    if suffix == ".parquet":
+        _pyarrow()
+    old = {table: _parts(directory, table) for table in TABLES}
+    if not any(old.values()):
+        return None
+    name = f"part-{time.time_ns():020d}-{os.getpid()}{suffix}"
+    meta = {"version": SCHEMA_VERSION, "dropped": []}
+    tables = {table: read_table(directory, table) for table in TABLES}
+    for table, columns in tables.items():
+        folder = Path(directory) / table
+        folder.mkdir(parents=True, exist_ok=True)
+        _write_part(folder / name, columns, meta)
+        for part in old[table]:
+            os.remove(part)
+    return name
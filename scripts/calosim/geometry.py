@@ -0,0 +1,250 @@
+"""Calorimeter geometry and depth conversions for the profile analyses.
+
+A ``Geometry`` describes the sampling stack that ``DetectorConstruction``
+builds: ``n_layers`` identical layers of ``scint_thickness`` scintillator
+followed by ``abs_thickness`` of ``abs_material``, centred on z = 0.
+It can be read from a macro (``/calor/...`` commands), from the sweep file
+name, from a catalog ``Run`` or, for a ROOT file, from the first of these
+that is available (``geometry_for``).
+
+Depths are measured from the front face of the stack. ``layer_depth``
+gives the depth sampled by every layer (by default the centre of its
+scintillator, where the energy is measured), and ``to_x0``/``from_x0``
+convert between millimetres and radiation lengths. The conversion is
+piecewise linear over the slab boundaries. The boundary tables are
+built once per geometry and cached, so converting a whole batch of
+profiles is a single ``np.interp`` call. The effective radiation length,
+Molière radius and critical energy of the stack are combined from the
+per-material ``MATERIALS`` table with the usual volume-fraction rules.
+"""
+
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from .catalog import count_layers, parse_filename
+
+SCINTILLATOR = "G4_PLASTIC_SC_VINYLTOLUENE"
+
+
+class Material(NamedTuple):
+    density: float           # g/cm^3
+    radiation_length: float  # mm
+    moliere_radius: float    # mm
+    critical_energy: float   # MeV (electrons)
+
+
+# PDG material properties of the NIST materials used as absorber or active medium
+MATERIALS = {
+    "G4_Pb": Material(11.35, 5.612, 16.02, 7.43),
+    "G4_W": Material(19.30, 3.504, 9.327, 7.97),
+    "G4_Fe": Material(7.874, 17.57, 16.93, 21.68),
+    "G4_Cu": Material(8.960, 14.36, 15.66, 19.42),
+    "G4_Al": Material(2.699, 88.97, 44.01, 42.70),
+    "G4_U": Material(18.95, 3.166, 10.00, 6.65),
+    "G4_PbWO4": Material(8.280, 8.903, 19.59, 9.64),
+    SCINTILLATOR: Material(1.032, 425.4, 95.97, 94.11),
+}
+
+# Command -> (field, parser); lengths are converted to mm
+_UNITS = {"nm": 1e-6, "um": 1e-3, "mm": 1.0, "cm": 10.0, "m": 1000.0}
+_MACRO_COMMANDS = {
+    "/calor/setLayers": ("n_layers", int),
+    "/calor/setAbsThickness": ("abs_thickness", lambda value: _length(value)),
+    "/calor/setScintThickness": ("scint_thickness", lambda value: _length(value)),
+    "/calor/setAbsMaterial": ("abs_material", str),
+}
+_COMMAND_LINE = re.compile(r"^\s*(/calor/\w+)\s+(.+?)\s*(?:#.*)?$")
+
+
+def _length(text):
+    value, *unit = text.split()
+    unit = unit[0] if unit else "mm"
+    if unit not in _UNITS:
+        raise ValueError(f"unknown length unit {unit!r}")
+    return float(value) * _UNITS[unit]
+
+
+def material(name):
+    """``Material`` properties of ``name``; ``KeyError`` listing the known ones otherwise."""
+    try:
+        return MATERIALS[name]
+    except KeyError:
+        raise KeyError(f"no material properties for {name!r} (known: {', '.join(sorted(MATERIALS))})") from None
+
+
+class Geometry(NamedTuple):
+    n_layers: int = 20
+    abs_thickness: float = 8.0    # mm
+    scint_thickness: float = 4.0  # mm
+    abs_material: str = "G4_Pb"
+    scint_material: str = SCINTILLATOR
+
+    @property
+    def pitch(self):
+        """Thickness of one scintillator + absorber layer in mm."""
+        return self.abs_thickness + self.scint_thickness
+
+    @property
+    def total_thickness(self):
+        return self.n_layers * self.pitch
+
+    @property
+    def front(self):
+        """z of the stack's front face (the stack is centred on z = 0)."""
+        return -0.5 * self.total_thickness
+
+    @property
+    def layer_x0(self):
+        """Thickness of one layer in radiation lengths."""
+        return (self.abs_thickness / material(self.abs_material).radiation_length
+                + self.scint_thickness / material(self.scint_material).radiation_length)
+
+    @property
+    def radiation_length(self):
+        """Effective radiation length of the stack in mm."""
+        return self.pitch / self.layer_x0
+
+    @property
+    def moliere_radius(self):
+        """Effective Molière radius of the stack in mm (1/R_M averaged by volume)."""
+        absorber, scint = material(self.abs_material), material(self.scint_material)
+        return self.pitch / (self.abs_thickness / absorber.moliere_radius
+                             + self.scint_thickness / scint.moliere_radius)
+
+    @property
+    def critical_energy(self):
+        """Effective critical energy of the stack in MeV."""
+        absorber, scint = material(self.abs_material), material(self.scint_material)
+        return self.radiation_length / self.pitch * (
+            self.abs_thickness * absorber.critical_energy / absorber.radiation_length
+            + self.scint_thickness * scint.critical_energy / scint.radiation_length)
+
+    def with_layers(self, n_layers):
+        return self._replace(n_layers=int(n_layers))
+
+    def layer_depth(self, where="scint", n_layers=None):
+        """Depth in mm of every layer, measured from the front face.
+
+        ``where`` is ``"scint"`` (centre of the scintillator, where the
+        layer's energy is measured), ``"front"`` or ``"center"`` of the
+        layer. ``n_layers`` overrides the layer count (e.g. the number of
+        histograms actually found in a file).
+        """
+        offsets = {"front": 0.0, "scint": 0.5 * self.scint_thickness, "center": 0.5 * self.pitch}
+        if where not in offsets:
+            raise ValueError(f"unknown layer position {where!r}")
+        n = self.n_layers if n_layers is None else n_layers
+        return np.arange(n) * self.pitch + offsets[where]
+
+    def layer_depth_x0(self, where="scint", n_layers=None):
+        """``layer_depth`` in radiation lengths."""
+        return self.to_x0(self.layer_depth(where, n_layers))
+
+    def to_x0(self, depth):
+        """Convert depths in mm (from the front face) to radiation lengths.
+
+        Exact for any depth inside the stack: material is accumulated slab by
+        slab. Depths beyond the stack continue at the average rate.
+        """
+        boundaries, x0 = _depth_tables(self)
+        depth = np.asarray(depth, dtype=np.float64)
+        inside = np.interp(depth, boundaries, x0)
+        beyond = (depth - boundaries[-1]) / self.radiation_length + x0[-1]
+        return np.where(depth > boundaries[-1], beyond, np.where(depth < 0, depth / self.radiation_length, inside))
+
+    def from_x0(self, t):
+        """Inverse of ``to_x0``: depths in mm for ``t`` radiation lengths."""
+        boundaries, x0 = _depth_tables(self)
+        t = np.asarray(t, dtype=np.float64)
+        inside = np.interp(t, x0, boundaries)
+        beyond = (t - x0[-1]) * self.radiation_length + boundaries[-1]
+        return np.where(t > x0[-1], beyond, np.where(t < 0, t * self.radiation_length, inside))
+
+    def depth_of_z(self, z):
+        """Depth from the front face for global ``z`` coordinates (e.g. hit positions)."""
+        return np.asarray(z, dtype=np.float64) - self.front
+
+    def layer_of_z(self, z):
+        """Layer index of global ``z`` (-1 in front of, ``n_layers`` behind the stack)."""
+        layer = np.floor(self.depth_of_z(z) / self.pitch)
+        return np.clip(layer, -1, self.n_layers).astype(np.int64)
+
+
+DEFAULT_GEOMETRY = Geometry()
+
+
+@lru_cache(maxsize=None)
+def _depth_tables(geometry):
+    """Slab boundaries in mm and the radiation lengths traversed up to each of them."""
+    n = max(int(geometry.n_layers), 1)
+    scint = geometry.scint_thickness
+    starts = np.arange(n) * geometry.pitch
+    boundaries = np.append(np.column_stack([starts, starts + scint]).ravel(), n * geometry.pitch)
+    per_slab = np.tile([scint / material(geometry.scint_material).radiation_length,
+                        geometry.abs_thickness / material(geometry.abs_material).radiation_length], n)
+    x0 = np.concatenate(([0.0], np.cumsum(per_slab)))
+    boundaries.flags.writeable = False
+    x0.flags.writeable = False
+    return boundaries, x0
+
+
+def from_macro(macro, base=DEFAULT_GEOMETRY):
+    """Geometry set by the ``/calor/`` commands of a macro (path or text).
+
+    Commands override the fields of ``base`` in order, like Geant4 applies
+    them, so the last setting wins.
+    """
+    text = Path(macro).read_text() if isinstance(macro, Path) or "\n" not in str(macro) else macro
+    fields = {}
+    for line in text.splitlines():
+        match = _COMMAND_LINE.match(line)
+        if match and match.group(1) in _MACRO_COMMANDS:
+            field, convert = _MACRO_COMMANDS[match.group(1)]
+            fields[field] = convert(match.group(2))
+    return base._replace(**fields)
+
+
+def from_filename(filename, n_layers=None, base=DEFAULT_GEOMETRY):
+    """Geometry encoded in a sweep file name; fields it does not carry come from ``base``.
+
+    ``None`` if the name does not follow the convention.
+    """
+    info = parse_filename(Path(filename).name)
+    if not info:
+        return None
+    geometry = base._replace(abs_thickness=float(info["abs_thick"]), scint_thickness=float(info["scin_thick"]),
+                             abs_material=info["abs_mat"])
+    return geometry if n_layers is None else geometry.with_layers(n_layers)
+
+
+def from_run(run, base=DEFAULT_GEOMETRY):
+    """Geometry of a ``calosim.catalog.Run`` (``base`` for fields the catalog has no value for)."""
+    fields = {"n_layers": run.n_layers, "abs_thickness": run.abs_thickness,
+              "scint_thickness": run.scint_thickness, "abs_material": run.abs_material}
+    return base._replace(**{key: value for key, value in fields.items() if value})
+
+
+def geometry_for(path, macro=None, base=DEFAULT_GEOMETRY, n_layers=None):
+    """Best available geometry for the output file ``path``.
+
+    In order of preference: ``macro`` if given, the macro ``run_sweep``
+    keeps in ``logs/<stem>.mac`` next to the file, the file name
+    convention, and ``base`` (the ``DetectorConstruction`` defaults). The
+    layer count of the file (its ``hLayer`` histograms, or ``n_layers``
+    if the caller already knows it) overrides the one from file names and
+    defaults, which do not record it.
+    """
+    path = Path(path)
+    if macro is not None:
+        return from_macro(Path(macro), base)
+    log = path.parent / "logs" / f"{path.stem}.mac"
+    if log.exists():
+        return from_macro(log, base)
+    if n_layers is None:
+        n_layers = count_layers(path) if path.exists() else 0
+    geometry = from_filename(path, base=base) or base
+    return geometry.with_layers(n_layers) if n_layers else geometry
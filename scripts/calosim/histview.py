@@ -0,0 +1,154 @@
+"""Lazy rebinning and range views over in-memory 1D histograms.
+
+A ``HistView`` wraps bin contents and edges that are already loaded (from
+``load_summary``, a ROOT histogram or an accumulator) and derives new
+binnings without touching the file again::
+
+    view = HistView.from_summary(load_summary(path), "total")
+    zoom = view.slice(0, 1300).rebin(2)
+    ax.stairs(zoom.values, zoom.edges)
+
+Operations only record what to do; contents are computed on first access
+and cached. Every operation is a single pass over the bins (cumulative
+sums and ``np.add.reduceat``), so trying binnings interactively is cheap.
+New bin edges are always a subset of the original edges, so contents and
+variances are summed exactly.
+"""
+
+from functools import cached_property
+
+import numpy as np
+
+
+class HistView:
+    """Immutable 1D histogram view; ``rebin``, ``slice`` and ``equal_stats`` return new views."""
+
+    def __init__(self, values, edges, variances=None, parent=None, op=None):
+        self._base = (values, edges, variances)
+        self._parent = parent
+        self._op = op
+
+    @classmethod
+    def from_hist(cls, hist):
+        """View of an uproot TH1 (flow bins excluded)."""
+        variances = hist.variances(flow=False) if hasattr(hist, "variances") else None
+        return cls(hist.values(flow=False), hist.axis().edges(), variances)
+
+    @classmethod
+    def from_summary(cls, summary, name="total"):
+        """View of ``summary[f"{name}_values"]`` with its edges (e.g. hTotal from ``load_summary``)."""
+        return cls(summary[f"{name}_values"], summary[f"{name}_edges"])
+
+    @classmethod
+    def from_accumulator(cls, hist):
+        """View of a ``calosim.accumulators.Hist1D``."""
+        return cls(hist.values, hist.edges, hist.variances)
+
+    @cached_property
+    def _arrays(self):
+        if self._parent is None:
+            values, edges, variances = self._base
+            values = np.asarray(values, dtype=np.float64)
+            if variances is None:
+                variances = values
+            return values, np.asarray(edges, dtype=np.float64), np.asarray(variances, dtype=np.float64)
+        func, args = self._op
+        return func(*self._parent._arrays, *args)
+
+    @property
+    def values(self):
+        return self._arrays[0]
+
+    @property
+    def edges(self):
+        return self._arrays[1]
+
+    @property
+    def variances(self):
+        """Per-bin variances (the contents themselves if none were given, i.e. Poisson)."""
+        return self._arrays[2]
+
+    @property
+    def errors(self):
+        return np.sqrt(self.variances)
+
+    @property
+    def centers(self):
+        return 0.5 * (self.edges[:-1] + self.edges[1:])
+
+    @property
+    def widths(self):
+        return np.diff(self.edges)
+
+    @property
+    def densities(self):
+        """Contents per unit of x, for comparing bins of different width."""
+        return self.values / self.widths
+
+    def __len__(self):
+        return len(self.values)
+
+    def _derive(self, func, *args):
+        return HistView(None, None, parent=self, op=(func, args))
+
+    def rebin(self, factor):
+        """Merge every ``factor`` adjacent bins; leftover bins at the upper end are dropped."""
+        if factor < 1:
+            raise ValueError("rebin factor must be >= 1")
+        return self._derive(_rebin, int(factor))
+
+    def rebin_to(self, bins):
+        """Rebin by the largest integer factor that leaves at least ``bins`` bins."""
+        return self._derive(_rebin_to, int(bins))
+
+    def slice(self, low=None, high=None):
+        """Bins whose centre lies in ``[low, high]`` (``None`` leaves that side open)."""
+        return self._derive(_slice, low, high)
+
+    def equal_stats(self, bins):
+        """Variable-width rebinning into about ``bins`` bins of equal content.
+
+        Boundaries are placed on existing edges where the cumulative sum
+        crosses multiples of ``total / bins``; bins that would be empty are
+        merged, so fewer bins can come back for very peaked histograms.
+        """
+        return self._derive(_equal_stats, int(bins))
+
+
+def _group(values, edges, variances, starts):
+    """Sum contiguous groups of bins beginning at ``starts`` (ascending, first is 0)."""
+    stop = len(values)
+    return (np.add.reduceat(values, starts), np.append(edges[starts], edges[stop]),
+            np.add.reduceat(variances, starts))
+
+
+def _rebin(values, edges, variances, factor):
+    n = (len(values) // factor) * factor
+    if n == 0:
+        raise ValueError(f"cannot rebin {len(values)} bins by {factor}")
+    return _group(values[:n], edges[:n + 1], variances[:n], np.arange(0, n, factor))
+
+
+def _rebin_to(values, edges, variances, bins):
+    return _rebin(values, edges, variances, max(1, len(values) // max(bins, 1)))
+
+
+def _slice(values, edges, variances, low, high):
+    centers = 0.5 * (edges[:-1] + edges[1:])
+    first = 0 if low is None else int(np.searchsorted(centers, low, side="left"))
+    last = len(values) if high is None else int(np.searchsorted(centers, high, side="right"))
+    if last <= first:
+        raise ValueError(f"no bins between {low} and {high}")
+    return values[first:last], edges[first:last + 1], variances[first:last]
+
+
+def _equal_stats(values, edges, variances, bins):
+    cumulative = np.cumsum(values)
+    total = cumulative[-1] if len(cumulative) else 0.0
+    if bins <= 1 or total <= 0:
+        return _group(values, edges, variances, np.array([0]))
+    targets = total * np.arange(1, bins) / bins
+    # A new bin starts after the first original bin whose cumulative sum reaches the target
+    starts = np.unique(np.concatenate(([0], np.searchsorted(cumulative, targets, side="left") + 1)))
+    starts = starts[starts < len(values)]
+    return _group(values, edges, variances, starts)
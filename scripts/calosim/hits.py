@@ -0,0 +1,132 @@
+"""Chunked reduction of the per-hit ``hits`` ntuple written by RootIO."""
+
+import sys
+import time
+from functools import partial
+
+import numpy as np
+import uproot
+
+from .accumulators import Hist1D, Hist2D, RunningMoments
+from .geometry import DEFAULT_GEOMETRY, geometry_for
+
+HIT_BRANCHES = ["edep", "x", "y", "z"]
+
+
+class HitAccumulator:
+    """Energy-weighted radial, longitudinal, XY and per-layer sums of a hit stream.
+
+    Binning defaults mirror the histograms booked in ``RootIO::OpenFile``.
+    Hits are assigned to layers by their ``layer`` column when the ntuple
+    has one, otherwise from ``z`` using the layer count and pitch of
+    ``geometry`` (stack centred on z = 0). The sums are
+    ``calosim.accumulators`` histograms, so accumulators filled from
+    different files or processes can be merged.
+    """
+
+    def __init__(self, geometry=DEFAULT_GEOMETRY,
+                 radial_bins=(100, 0.0, 50.0), long_bins=(100, -150.0, 150.0),
+                 xy_bins=(100, -50.0, 50.0), edep_bins=(100, 0.0, 20.0)):
+        self.geometry = geometry
+        self.n_layers = n_layers = geometry.n_layers
+        self.radial_bins = radial_bins
+        self.long_bins = long_bins
+        self.xy_bins = xy_bins
+        self.edep_bins = edep_bins
+
+        self.hists = {
+            "radial": Hist1D(*radial_bins),
+            "longitudinal": Hist1D(*long_bins),
+            "xy": Hist2D(*xy_bins, *xy_bins),
+            "edep": Hist1D(*edep_bins),
+            "layer_energy": Hist1D(n_layers, 0, n_layers),
+        }
+        self.energy = RunningMoments()
+
+    radial = property(lambda self: self.hists["radial"].values)
+    longitudinal = property(lambda self: self.hists["longitudinal"].values)
+    xy = property(lambda self: self.hists["xy"].values)
+    edep = property(lambda self: self.hists["edep"].values)
+    layer_energy = property(lambda self: self.hists["layer_energy"].values)
+    n_hits = property(lambda self: int(self.energy.n))
+    total_energy = property(lambda self: self.energy.sum)
+
+    def fill(self, chunk):
+        """Fold one chunk (mapping of branch name -> NumPy array) into the sums."""
+        edep = np.asarray(chunk["edep"], dtype=np.float64)
+        x = np.asarray(chunk["x"], dtype=np.float64)
+        y = np.asarray(chunk["y"], dtype=np.float64)
+        z = np.asarray(chunk["z"], dtype=np.float64)
+
+        self.hists["radial"].fill(np.hypot(x, y), edep)
+        self.hists["longitudinal"].fill(z, edep)
+        self.hists["edep"].fill(edep)
+        self.hists["xy"].fill(x, y, edep)
+
+        if "layer" in chunk:
+            layer = np.asarray(chunk["layer"], dtype=np.float64)
+        else:
+            layer = self.geometry.layer_of_z(z)
+        self.hists["layer_energy"].fill(layer, edep)
+
+        self.energy.fill(edep)
+
+    def merge(self, other):
+        """Add the sums of another accumulator with the same binning."""
+        for name, hist in self.hists.items():
+            hist.merge(other.hists[name])
+        self.energy.merge(other.energy)
+        return self
+
+
+def stream_hits(path, accumulator=None, step_size="100 MB", tree="hits", progress=True, geometry=None):
+    """Reduce the hit ntuple of ``path`` chunk by chunk.
+
+    Only one chunk of ``step_size`` (entries or a size string such as
+    ``"100 MB"``) is held in memory at a time. Returns the filled
+    ``HitAccumulator``; pass one in to accumulate several files. A new
+    accumulator uses ``geometry``, by default ``geometry_for(path)``.
+    """
+    if accumulator is None:
+        accumulator = HitAccumulator(geometry or geometry_for(path))
+
+    start = time.perf_counter()
+    with uproot.open(path) as file:
+        ntuple = file[tree]
+        n_entries = ntuple.num_entries
+        branches = HIT_BRANCHES + (["layer"] if "layer" in ntuple else [])
+        for chunk in ntuple.iterate(branches, step_size=step_size, library="np"):
+            accumulator.fill(chunk)
+            if progress:
+                _report(accumulator.n_hits, n_entries, time.perf_counter() - start)
+    if progress:
+        sys.stderr.write("\n")
+    return accumulator
+
+
+def _report(done, total, elapsed):
+    rate = done / elapsed if elapsed > 0 else 0.0
+    sys.stderr.write(f"\r   {done:,}/{total:,} hits ({100.0 * done / max(total, 1):5.1f}%)"
+                     f"  {rate / 1e6:6.2f} M hits/s")
+    sys.stderr.flush()
+
+
+def _stream_quiet(path, geometry=None):
+    return stream_hits(path, progress=False, geometry=geometry)
+
+
+def stream_hit_files(paths, jobs=1, geometry=None):
+    """Reduce the hit ntuples of several files (e.g. shards) in parallel and merge the sums.
+
+    Without ``geometry`` each file uses ``geometry_for`` its own path; the
+    files must share a layer count to be merged.
+    """
+    from .batch import map_files
+
+    accumulators = map_files(partial(_stream_quiet, geometry=geometry), paths, jobs=jobs)
+    if not accumulators:
+        return HitAccumulator(geometry or DEFAULT_GEOMETRY)
+    total = accumulators[0]
+    for accumulator in accumulators[1:]:
+        total.merge(accumulator)
+    return total
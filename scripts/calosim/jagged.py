@@ -0,0 +1,74 @@
+"""Per-event view of the ``hits`` ntuple as an awkward array.
+
+``load_event_hits`` groups the flat ntuple rows into events -> hits using
+the run lengths of the ``event`` column; the reducers below work on the
+whole jagged array at once, without a Python loop over events.
+"""
+
+import awkward as ak
+import numpy as np
+import uproot
+
+EVENT_FIELDS = ["edep", "x", "y", "z", "layer"]
+
+
+def _run_lengths(event):
+    change = np.flatnonzero(np.diff(event, prepend=event[:1] - 1))
+    return np.diff(np.append(change, event.size)), event[change]
+
+
+def load_event_hits(path, entry_start=None, entry_stop=None, tree="hits"):
+    """Hits of ``path`` as an awkward array with one record per event.
+
+    Each event has an ``event_id`` and a ``hits`` list of records with
+    fields ``edep, x, y, z, layer``. Entry ranges should start and stop on
+    event boundaries (see ``calosim.events.load_event_index``).
+    """
+    with uproot.open(path) as file:
+        ntuple = file[tree]
+        fields = [f for f in EVENT_FIELDS if f in ntuple]
+        flat = ntuple.arrays(fields + ["event"], entry_start=entry_start, entry_stop=entry_stop, library="np")
+
+    counts, event_ids = _run_lengths(flat.pop("event"))
+    hits = ak.unflatten(ak.zip(flat), counts)
+    return ak.zip({"event_id": event_ids, "hits": hits}, depth_limit=1)
+
+
+def total_energy(events):
+    """Summed ``edep`` per event."""
+    return ak.to_numpy(ak.sum(events.hits.edep, axis=1))
+
+
+def centroid(events):
+    """Energy-weighted ``(x, y)`` centroid per event, two arrays of shape ``(n_events,)``."""
+    hits = events.hits
+    energy = ak.sum(hits.edep, axis=1)
+    cx = ak.sum(hits.edep * hits.x, axis=1) / energy
+    cy = ak.sum(hits.edep * hits.y, axis=1) / energy
+    return ak.to_numpy(cx), ak.to_numpy(cy)
+
+
+def _radius2(events, center):
+    hits = events.hits
+    if center == "axis":
+        return hits.x**2 + hits.y**2
+    cx, cy = centroid(events)
+    return (hits.x - cx) ** 2 + (hits.y - cy) ** 2
+
+
+def lateral_rms(events, center="centroid"):
+    """Energy-weighted RMS distance from the shower centroid (or the beam ``"axis"``)."""
+    hits = events.hits
+    r2 = _radius2(events, center)
+    return ak.to_numpy(np.sqrt(ak.sum(hits.edep * r2, axis=1) / ak.sum(hits.edep, axis=1)))
+
+
+def containment_fraction(events, radius, center="centroid"):
+    """Fraction of each event's energy within ``radius`` (mm) of the centroid or beam axis.
+
+    With ``radius`` set to the Molière radius of the absorber this is the
+    usual ~90 % containment check.
+    """
+    hits = events.hits
+    inside = _radius2(events, center) <= radius**2
+    return ak.to_numpy(ak.sum(hits.edep[inside], axis=1) / ak.sum(hits.edep, axis=1))
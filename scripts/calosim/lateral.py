@@ -0,0 +1,169 @@
+"""Lateral shower shapes from the per-layer XY maps.
+
+``lateral_shapes`` works on the stacked ``hXY_layer*`` array from
+``load_xy_layers`` (``(n_layers, nx, ny)``, or with further leading axes
+such as files) and evaluates every layer at once:
+
+* energy-weighted centroid and lateral RMS about it, from the x and y
+  marginals (two small matrix products per layer)
+* radial energy in rings around the beam axis and the cumulative
+  containment curve
+* the radii containing 90 % and 95 % of the energy (R90, R95), per layer
+  and for the layer sum; R90 of the whole shower is the usual estimate of
+  the Molière radius
+
+Ring sums use a ``RadialBins`` matrix that holds, for each XY cell, the
+fraction of its area inside each ring (found by subdividing the cell).
+The ring energies of all layers are then a single ``(layers, cells) @
+(cells, rings)`` product. The matrix depends only on the binning and the
+rings, so it is built once and cached for every layer and every file
+with the same histograms. Energy outside the map (histogram overflow) is
+not seen; containment is relative to the energy inside the map.
+"""
+
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+
+from .moments import safe_divide
+
+SUBDIVIDE = 8
+FRACTIONS = (0.9, 0.95)
+
+
+class RadialBins(NamedTuple):
+    r_edges: np.ndarray
+    weights: np.ndarray  # (nx * ny, n_rings) area fraction of every cell in every ring
+    center: tuple
+
+    @property
+    def r_centers(self):
+        return 0.5 * (self.r_edges[:-1] + self.r_edges[1:])
+
+    def ring_sums(self, maps):
+        """Energy per ring for maps of shape ``(..., nx, ny)`` -> ``(..., n_rings)``."""
+        maps = np.asarray(maps, dtype=np.float64)
+        flat = maps.reshape(maps.shape[:-2] + (-1,))
+        return flat @ self.weights
+
+
+@lru_cache(maxsize=32)
+def _radial_bins(x_edges, y_edges, r_edges, center, subdivide):
+    x_edges, y_edges, r_edges = (np.array(e) for e in (x_edges, y_edges, r_edges))
+    nx, ny = len(x_edges) - 1, len(y_edges) - 1
+    # Sub-cell centres: offsets in units of the cell width
+    offsets = (np.arange(subdivide) + 0.5) / subdivide
+    sub_x = (x_edges[:-1, None] + np.diff(x_edges)[:, None] * offsets).ravel() - center[0]
+    sub_y = (y_edges[:-1, None] + np.diff(y_edges)[:, None] * offsets).ravel() - center[1]
+    radius = np.hypot(sub_x[:, None], sub_y[None, :])  # (nx * s, ny * s)
+    ring = np.searchsorted(r_edges, radius, side="right") - 1
+    n_rings = len(r_edges) - 1
+    ring = np.where((ring >= 0) & (ring < n_rings), ring, n_rings)  # outside the rings -> dropped column
+    cell = (np.arange(nx * subdivide)[:, None] // subdivide) * ny + np.arange(ny * subdivide)[None, :] // subdivide
+    counts = np.bincount((cell * (n_rings + 1) + ring).ravel(), minlength=nx * ny * (n_rings + 1))
+    weights = counts.reshape(nx * ny, n_rings + 1)[:, :n_rings] / subdivide**2
+    weights.flags.writeable = False
+    r_edges.flags.writeable = False
+    return RadialBins(r_edges, weights, center)
+
+
+def radial_bins(x_edges, y_edges, r_edges=None, center=(0.0, 0.0), subdivide=SUBDIVIDE):
+    """Cached ``RadialBins`` for an XY binning.
+
+    ``r_edges`` defaults to rings of half the smallest cell width out to
+    the farthest map corner from ``center`` (the beam axis).
+    """
+    x_edges = np.asarray(x_edges, dtype=np.float64)
+    y_edges = np.asarray(y_edges, dtype=np.float64)
+    if r_edges is None:
+        step = 0.5 * min(np.diff(x_edges).min(), np.diff(y_edges).min())
+        r_max = np.hypot(np.abs(x_edges[[0, -1]] - center[0]).max(), np.abs(y_edges[[0, -1]] - center[1]).max())
+        r_edges = np.arange(0.0, r_max + step, step)
+    return _radial_bins(tuple(x_edges), tuple(y_edges), tuple(np.asarray(r_edges, dtype=np.float64)),
+                        tuple(float(c) for c in center), int(subdivide))
+
+
+def containment_radius(r_edges, containment, fraction):
+    """Radius where each cumulative ``containment`` curve (last axis) reaches ``fraction``.
+
+    Interpolates linearly within the ring that crosses ``fraction``; NaN for
+    empty maps.
+    """
+    containment = np.asarray(containment, dtype=np.float64)
+    reached = containment >= fraction
+    index = np.argmax(reached, axis=-1)  # first ring whose outer edge reaches the fraction
+    before = np.take_along_axis(np.concatenate([np.zeros(containment.shape[:-1] + (1,)), containment], axis=-1),
+                                index[..., None], axis=-1)[..., 0]
+    after = np.take_along_axis(containment, index[..., None], axis=-1)[..., 0]
+    step = safe_divide(fraction - before, after - before)
+    radius = r_edges[index] + step * (r_edges[index + 1] - r_edges[index])
+    return np.where(reached.any(axis=-1), radius, np.nan)
+
+
+class LateralShape(NamedTuple):
+    energy: np.ndarray       # (..., layers) energy inside the map
+    centroid_x: np.ndarray
+    centroid_y: np.ndarray
+    rms: np.ndarray          # sqrt(var_x + var_y) about the centroid
+    r_edges: np.ndarray
+    rings: np.ndarray        # (..., layers, rings) energy per ring around the beam axis
+    radii: np.ndarray        # (..., layers, len(fractions)) containment radii
+    fractions: tuple
+
+    @property
+    def containment(self):
+        """Cumulative containment curve per layer, ``(..., layers, rings)`` at the outer ring edges."""
+        return safe_divide(np.cumsum(self.rings, axis=-1), self.energy[..., None])
+
+    @property
+    def r90(self):
+        return self.radii[..., self.fractions.index(0.9)]
+
+    @property
+    def r95(self):
+        return self.radii[..., self.fractions.index(0.95)]
+
+    @property
+    def shower_containment(self):
+        """Containment curve of the layer sum, ``(..., rings)``."""
+        rings = self.rings.sum(axis=-2)
+        return safe_divide(np.cumsum(rings, axis=-1), rings.sum(axis=-1)[..., None])
+
+    @property
+    def moliere_estimate(self):
+        """R90 of the whole shower (all layers summed), the usual Molière-radius estimate."""
+        return containment_radius(self.r_edges, self.shower_containment, 0.9)
+
+
+def lateral_shapes(maps, x_edges, y_edges, r_edges=None, fractions=FRACTIONS, center=(0.0, 0.0)):
+    """Centroid, RMS, radial rings and containment radii of every map in ``maps`` (``(..., nx, ny)``)."""
+    maps = np.asarray(maps, dtype=np.float64)
+    x_edges = np.asarray(x_edges, dtype=np.float64)
+    y_edges = np.asarray(y_edges, dtype=np.float64)
+    xc = 0.5 * (x_edges[:-1] + x_edges[1:])
+    yc = 0.5 * (y_edges[:-1] + y_edges[1:])
+
+    along_x = maps.sum(axis=-1)  # (..., nx)
+    along_y = maps.sum(axis=-2)  # (..., ny)
+    energy = along_x.sum(axis=-1)
+    cx = safe_divide(along_x @ xc, energy)
+    cy = safe_divide(along_y @ yc, energy)
+    var_x = safe_divide(along_x @ xc**2, energy) - cx**2
+    var_y = safe_divide(along_y @ yc**2, energy) - cy**2
+    rms = np.sqrt(np.clip(var_x + var_y, 0, None))
+
+    bins = radial_bins(x_edges, y_edges, r_edges, center)
+    rings = bins.ring_sums(maps)
+    containment = safe_divide(np.cumsum(rings, axis=-1), energy[..., None])
+    fractions = tuple(fractions)
+    radii = np.stack([containment_radius(bins.r_edges, containment, f) for f in fractions], axis=-1)
+    return LateralShape(energy, cx, cy, rms, bins.r_edges, rings, radii, fractions)
+
+
+def file_lateral_shapes(path, **options):
+    """``lateral_shapes`` of the ``hXY_layer*`` maps of one file."""
+    from .loader import load_xy_layers
+
+    maps, x_edges, y_edges = load_xy_layers(path)
+    return lateral_shapes(maps, x_edges, y_edges, **options)
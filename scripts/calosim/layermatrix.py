@@ -0,0 +1,101 @@
+"""Per-event layer-energy matrix stored once as a memory-mapped ``.npy``.
+
+The ``LayerN`` branches of the ``CalorimeterSim`` tree are decompressed a
+single time into an ``(n_events, n_layers)`` float64 array; a sidecar JSON
+records the source file fingerprint so stale conversions are rebuilt.
+"""
+
+import json
+import os
+import re
+
+import numpy as np
+import uproot
+
+from .cache import content_hash, entry_path, fingerprint
+
+LAYER_BRANCH = re.compile(r"^Layer(\d+)$")
+
+
+def layer_branches(tree):
+    names = [k for k in tree.keys() if LAYER_BRANCH.match(k)]
+    return sorted(names, key=lambda k: int(LAYER_BRANCH.match(k).group(1)))
+
+
+def convert_layer_matrix(root_path, out_path, tree="CalorimeterSim", step_size="100 MB"):
+    """Write the ``(n_events, n_layers)`` matrix of ``root_path`` to ``out_path`` (.npy)."""
+    with uproot.open(root_path) as file:
+        ttree = file[tree]
+        branches = layer_branches(ttree)
+        if not branches:
+            raise KeyError(f"no Layer branches in {root_path}:{tree}")
+
+        tmp = f"{out_path}.{os.getpid()}.tmp"
+        matrix = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float64,
+                                           shape=(ttree.num_entries, len(branches)))
+        row = 0
+        for chunk in ttree.iterate(branches, step_size=step_size, library="np"):
+            n = chunk[branches[0]].size
+            for col, name in enumerate(branches):
+                matrix[row:row + n, col] = chunk[name]
+            row += n
+        matrix.flush()
+        del matrix
+    # Drop the old sidecar first: a crash before the new one is in place
+    # leaves a matrix without metadata, which is rebuilt, never a stale pair
+    try:
+        os.remove(f"{out_path}.json")
+    except FileNotFoundError:
+        pass
+    os.replace(tmp, out_path)
+
+    meta = {
+        "source": str(root_path),
+        "tree": tree,
+        "branches": branches,
+        "shape": [row, len(branches)],
+        "dtype": "float64",
+        **fingerprint(root_path),
+    }
+    tmp = f"{out_path}.json.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp, f"{out_path}.json")
+    return meta
+
+
+def _is_current(meta, root_path, tree):
+    if meta.get("tree") != tree:
+        return False
+    st = os.stat(root_path)
+    if meta["size"] != st.st_size:
+        return False
+    return meta["mtime_ns"] == st.st_mtime_ns or meta["xxh64"] == content_hash(root_path)
+
+
+def open_layer_matrix(root_path, out_path=None, tree="CalorimeterSim"):
+    """Read-only memory map of the layer matrix, converting on first use.
+
+    By default the ``.npy`` lives in ``.calosim_cache/`` next to the ROOT
+    file. Returns ``(matrix, meta)`` where ``meta`` is the sidecar dict
+    (``branches`` gives the layer order of the columns).
+    """
+    if out_path is None:
+        out_path = entry_path(root_path, f"{tree}.layers", suffix=".npy")
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path = str(out_path)
+
+    meta = None
+    if os.path.exists(out_path) and os.path.exists(f"{out_path}.json"):
+        with open(f"{out_path}.json") as f:
+            meta = json.load(f)
+        if not _is_current(meta, root_path, tree):
+            meta = None
+    if meta is None:
+        meta = convert_layer_matrix(root_path, out_path, tree)
+    matrix = np.load(out_path, mmap_mode="r")
+    if list(matrix.shape) != meta["shape"]:
+        # Matrix and sidecar from different conversions (interrupted rewrite)
+        meta = convert_layer_matrix(root_path, out_path, tree)
+        matrix = np.load(out_path, mmap_mode="r")
+    return matrix, meta
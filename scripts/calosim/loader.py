@@ -0,0 +1,116 @@
+"""Bulk readers for the per-layer histograms written by RootIO."""
+
+import re
+
+import numpy as np
+import uproot
+
+LAYER_PATTERN = re.compile(r"^hLayer(\d+)$")
+XY_LAYER_PATTERN = re.compile(r"^hXY_layer(\d+)$")
+
+
+def open_file(source):
+    """Return an open uproot directory for ``source`` (path or already open file)."""
+    if isinstance(source, uproot.reading.ReadOnlyDirectory):
+        return source
+    return uproot.open(source)
+
+
+def find_layer_keys(file, pattern=LAYER_PATTERN):
+    """Map layer index -> key for the histograms matching ``pattern``.
+
+    The directory is listed once; when several cycles of the same histogram
+    exist only the highest one is kept. Like the original
+    ``while f"hLayer{i}" in file`` loops, layers are taken from index 0 up
+    to the first missing index; histograms after a gap are ignored.
+    """
+    keys = {}
+    cycles = {}
+    for key in file.keys(recursive=False):
+        name, _, cycle = key.partition(";")
+        match = pattern.match(name)
+        if not match:
+            continue
+        idx = int(match.group(1))
+        cycle = int(cycle) if cycle else 0
+        if idx not in keys or cycle > cycles[idx]:
+            keys[idx] = key
+            cycles[idx] = cycle
+    n_layers = 0
+    while n_layers in keys:
+        n_layers += 1
+    return {i: keys[i] for i in range(n_layers)}
+
+
+def load_layers(source, pattern=LAYER_PATTERN):
+    """Read all ``hLayer{i}`` histograms into one dense array.
+
+    Returns ``(values, edges)`` where ``values`` has shape
+    ``(n_layers, n_bins)`` with row ``i`` holding ``hLayer{i}`` (layers
+    0, 1, ... up to the first missing index) and ``edges`` are the bin
+    edges shared by every layer. Raises ``KeyError`` if no layer histograms are present and
+    ``ValueError`` if the layers do not share the same binning.
+    """
+    file = open_file(source)
+    keys = find_layer_keys(file, pattern)
+    if not keys:
+        raise KeyError(f"no layer histograms found in {file.file_path}")
+
+    values = None
+    edges = None
+    for idx, key in keys.items():
+        hist = file[key]
+        counts = hist.values(flow=False)
+        if values is None:
+            edges = hist.axis().edges()
+            values = np.zeros((len(keys), counts.size), dtype=np.float64)
+        elif counts.size != values.shape[1] or not np.array_equal(hist.axis().edges(), edges):
+            raise ValueError(f"{key} does not share the binning of the other layers")
+        values[idx] = counts
+    return values, edges
+
+
+def load_xy_layers(source, pattern=XY_LAYER_PATTERN):
+    """Read all ``hXY_layer{i}`` maps into one ``(n_layers, nx, ny)`` array.
+
+    Returns ``(values, x_edges, y_edges)``; like ``load_layers``, layers
+    run up to the first missing index and all maps must share the same
+    binning.
+    """
+    file = open_file(source)
+    keys = find_layer_keys(file, pattern)
+    if not keys:
+        raise KeyError(f"no per-layer XY histograms found in {file.file_path}")
+
+    values = None
+    for idx, key in keys.items():
+        hist = file[key]
+        counts = hist.values(flow=False)
+        if values is None:
+            x_edges = hist.axis(0).edges()
+            y_edges = hist.axis(1).edges()
+            values = np.zeros((len(keys),) + counts.shape, dtype=np.float64)
+        elif (counts.shape != values.shape[1:] or not np.array_equal(hist.axis(0).edges(), x_edges)
+              or not np.array_equal(hist.axis(1).edges(), y_edges)):
+            raise ValueError(f"{key} does not share the binning of the other layers")
+        values[idx] = counts
+    return values, x_edges, y_edges
+
+
+def load_layer_stack(sources, pattern=LAYER_PATTERN):
+    """Stack the layer histograms of several files into ``(n_files, n_layers, n_bins)``.
+
+    Files with fewer layers are zero-padded; all files must share the same
+    binning. Returns ``(values, edges)``.
+    """
+    per_file = [load_layers(source, pattern) for source in sources]
+    if not per_file:
+        raise ValueError("no files given")
+    edges = per_file[0][1]
+    n_layers = max(values.shape[0] for values, _ in per_file)
+    stack = np.zeros((len(per_file), n_layers, edges.size - 1), dtype=np.float64)
+    for i, (values, file_edges) in enumerate(per_file):
+        if not np.array_equal(file_edges, edges):
+            raise ValueError(f"file {i} does not share the layer binning of the first file")
+        stack[i, : values.shape[0]] = values
+    return stack, edges
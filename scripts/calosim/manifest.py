@@ -0,0 +1,135 @@
+"""Bookkeeping for incremental batch runs.
+
+A ``Manifest`` remembers the fingerprint (size, mtime, xxh64) of every
+file a batch job has processed, so the next run can pick out the outputs
+that are new or changed. Per-file results are kept in a summary table
+(``.npz``, one row per file) that is merged rather than rewritten::
+
+    manifest = Manifest("batch_plots/manifest.json")
+    todo = manifest.changed(root_files)
+    rows = map_files(summarize_layers, todo, jobs=8)
+    merge_summary("batch_plots/layer_summary.npz", rows, drop=manifest.removed(root_files))
+    manifest.update(todo)
+    manifest.forget(manifest.removed(root_files))
+    manifest.save()
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .cache import content_hash, fingerprint
+
+MANIFEST_VERSION = 1
+
+
+def _key(path):
+    return str(Path(path).resolve())
+
+
+class Manifest:
+    """Fingerprints of already processed files, stored as JSON."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.files = {}
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == MANIFEST_VERSION:
+            self.files = data["files"]
+
+    def is_current(self, path):
+        """True if ``path`` was processed and has not changed since.
+
+        Size and mtime are compared first; a file that was only touched
+        (same size, new mtime) is accepted if its content hash matches.
+        """
+        known = self.files.get(_key(path))
+        if known is None:
+            return False
+        current = fingerprint(path, digest=False)
+        if current["size"] != known["size"]:
+            return False
+        if current["mtime_ns"] == known["mtime_ns"]:
+            return True
+        if content_hash(path) != known["xxh64"]:
+            return False
+        known["mtime_ns"] = current["mtime_ns"]
+        return True
+
+    def changed(self, paths):
+        """The subset of ``paths`` that is new or modified, in input order."""
+        return [path for path in paths if not self.is_current(path)]
+
+    def removed(self, paths):
+        """Recorded files that are no longer among ``paths``."""
+        present = {_key(path) for path in paths}
+        return [path for path in self.files if path not in present]
+
+    def update(self, paths):
+        for path in paths:
+            self.files[_key(path)] = fingerprint(path)
+
+    def forget(self, paths):
+        for path in paths:
+            self.files.pop(_key(path), None)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + f".{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+def load_summary_table(path):
+    """Rows of a summary table as ``{"path": ..., column: array, ...}`` dicts keyed by path."""
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            paths = data["path"]
+            columns = {k: data[k] for k in data.files if k != "path"}
+    except (OSError, KeyError, ValueError):
+        return {}
+    return {
+        str(p): dict({"path": str(p)}, **{k: v[i] for k, v in columns.items()})
+        for i, p in enumerate(paths)
+    }
+
+
+def merge_summary(path, rows, drop=()):
+    """Merge per-file result dicts into the table at ``path`` and rewrite it.
+
+    Each row needs a ``"path"`` entry plus the same array-valued columns;
+    rows replace earlier ones for the same file, files in ``drop`` are
+    removed. Columns of different lengths (e.g. layer counts) are
+    zero-padded. Returns the merged rows sorted by path.
+    """
+    table = load_summary_table(path)
+    for dropped in drop:
+        table.pop(_key(dropped), None)
+    for row in rows:
+        table[_key(row["path"])] = dict(row, path=_key(row["path"]))
+    merged = [table[k] for k in sorted(table)]
+
+    arrays = {"path": np.array([row["path"] for row in merged], dtype=str)}
+    columns = [k for k in merged[0] if k != "path"] if merged else []
+    for column in columns:
+        values = [np.atleast_1d(np.asarray(row[column], dtype=np.float64)) for row in merged]
+        width = max(len(v) for v in values)
+        out = np.zeros((len(values), width))
+        for i, v in enumerate(values):
+            out[i, :len(v)] = v
+        arrays[column] = out
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+    return merged
@@ -0,0 +1,141 @@
+"""Lossless merging of ROOT outputs from runs of the same configuration.
+
+Used to combine the shards of a split run (see ``calosim.sweep``) into
+one file that looks like a single long run: every TH1/TH2 is summed bin
+by bin including under/overflow, sum of weights squared and the fit
+statistics (entries, sumw, sumwx, ...), and every TTree (or RNTuple) is
+concatenated in input order. Only the highest cycle of each object is
+read, and each object is written once. The ``event`` column of the
+ntuples is shifted so event numbers stay unique. Histograms must have identical binning in all
+inputs, otherwise ``ValueError`` is raised.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+import uproot
+from uproot.writing.identify import to_TAxis, to_TH1x, to_TH2x
+
+_STATS = {
+    1: ("fEntries", "fTsumw", "fTsumw2", "fTsumwx", "fTsumwx2"),
+    2: ("fEntries", "fTsumw", "fTsumw2", "fTsumwx", "fTsumwx2", "fTsumwy", "fTsumwy2", "fTsumwxy"),
+}
+_AXIS_FIELDS = ("fNbins", "fXmin", "fXmax")
+_TREES = ("TTree", "ROOT::RNTuple")
+
+
+def _dimension(classname):
+    if classname.startswith("TH1"):
+        return 1
+    if classname.startswith("TH2"):
+        return 2
+    return None
+
+
+def _axis_key(axis):
+    return tuple(axis.member(f) for f in _AXIS_FIELDS) + (tuple(np.asarray(axis.member("fXbins"))),)
+
+
+def _axis_copy(axis):
+    return to_TAxis(axis.member("fName"), axis.member("fTitle"), *(axis.member(f) for f in _AXIS_FIELDS),
+                    fXbins=np.asarray(axis.member("fXbins"), dtype=np.float64))
+
+
+def _merge_hists(name, hists):
+    """Sum histograms of one name; returns an object uproot can write."""
+    first = hists[0]
+    ndim = _dimension(first.classname)
+    axes = ["fXaxis", "fYaxis"][:ndim]
+    reference = [_axis_key(first.member(a)) for a in axes]
+
+    data = np.zeros(len(first.bases[-1]), dtype=np.float64)
+    sumw2 = np.zeros_like(data)
+    stats = dict.fromkeys(_STATS[ndim], 0.0)
+    for hist in hists:
+        if [_axis_key(hist.member(a)) for a in axes] != reference:
+            raise ValueError(f"{name}: binning differs between inputs")
+        raw = np.asarray(hist.bases[-1], dtype=np.float64)
+        data += raw
+        weights2 = np.asarray(hist.member("fSumw2"), dtype=np.float64)
+        # Unweighted histograms store no sumw2; there it equals the contents
+        sumw2 += weights2 if len(weights2) else raw
+        for key in stats:
+            stats[key] += hist.member(key)
+
+    copied = [_axis_copy(first.member(a)) for a in axes]
+    if ndim == 1:
+        return to_TH1x(first.member("fName"), first.member("fTitle"), data, *stats.values(),
+                       sumw2, copied[0])
+    return to_TH2x(first.member("fName"), first.member("fTitle"), data, *stats.values(),
+                   sumw2, copied[0], copied[1], to_TAxis("zaxis", "", 1, 0.0, 1.0))
+
+
+def _copy_trees(out, name, classname, trees, event_offsets, step_size):
+    # Keep the input's storage format (TTree from Geant4, RNTuple from newer writers)
+    columns = trees[0].arrays(library="np", entry_stop=0)
+    make = out.mktree if classname == "TTree" else out.mkrntuple
+    writer = make(name, {k: v.dtype for k, v in columns.items()})
+    for tree, offset in zip(trees, event_offsets):
+        for chunk in tree.iterate(library="np", step_size=step_size):
+            if "event" in chunk and offset:
+                chunk["event"] = chunk["event"] + np.asarray(offset, dtype=chunk["event"].dtype)
+            writer.extend(chunk)
+
+
+def _event_offsets(files, trees):
+    """Running offsets from the largest event number seen in each input."""
+    offsets = [0]
+    for file in files[:-1]:
+        largest = -1
+        for tree in trees:
+            if "event" in file[tree].keys():
+                events = file[tree]["event"].array(library="np")
+                if len(events):
+                    largest = max(largest, int(events.max()))
+        offsets.append(offsets[-1] + largest + 1)
+    return offsets
+
+
+def merge_outputs(inputs, output, event_offsets=None, step_size="100 MB"):
+    """Merge ROOT files ``inputs`` into ``output`` (written atomically).
+
+    Every input must contain the same histograms and trees. ``event_offsets``
+    gives the number added to the ``event`` column of each input; by
+    default it is derived from the largest event number of the previous
+    inputs (pass the requested events per input when trailing events may
+    have left no hits).
+    """
+    inputs = [Path(p) for p in inputs]
+    if not inputs:
+        raise ValueError("nothing to merge")
+    files = [uproot.open(p) for p in inputs]
+    try:
+        # Cycle-free names: older cycles (e.g. tree autosaves) are stale copies,
+        # and file[name] reads the highest cycle
+        names = files[0].classnames(recursive=False, cycle=False)
+        for path, file in zip(inputs[1:], files[1:]):
+            if file.classnames(recursive=False, cycle=False) != names:
+                raise ValueError(f"{path} does not contain the same objects as {inputs[0]}")
+
+        trees = [name for name, classname in names.items() if classname in _TREES]
+        if event_offsets is None:
+            event_offsets = _event_offsets(files, trees)
+        if len(event_offsets) != len(files):
+            raise ValueError("need one event offset per input")
+
+        output = Path(output)
+        tmp = output.with_name(output.name + f".{os.getpid()}.tmp")
+        with uproot.recreate(tmp) as out:
+            for name, classname in names.items():
+                if classname in _TREES:
+                    _copy_trees(out, name, classname, [f[name] for f in files], event_offsets, step_size)
+                elif _dimension(classname):
+                    out[name] = _merge_hists(name, [f[name] for f in files])
+                else:
+                    raise ValueError(f"{name}: cannot merge objects of class {classname}")
+        os.replace(tmp, output)
+    finally:
+        for file in files:
+            file.close()
+    return output
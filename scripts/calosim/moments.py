@@ -0,0 +1,40 @@
+"""Batched weighted moments of stacked histograms."""
+
+from typing import NamedTuple
+
+import numpy as np
+
+
+class Moments(NamedTuple):
+    mean: np.ndarray
+    rms: np.ndarray
+    skewness: np.ndarray
+    integral: np.ndarray
+    mean_error: np.ndarray
+
+
+def safe_divide(num, den):
+    """``num / den`` elementwise, 0 where ``den`` is not positive (empty bins, layers, maps)."""
+    return np.divide(num, den, out=np.zeros(np.broadcast(num, den).shape), where=den > 0)
+
+
+def histogram_moments(values, edges):
+    """Mean, RMS, skewness, integral and error on the mean along the last axis.
+
+    ``values`` may have any leading shape, e.g. ``(n_bins,)``,
+    ``(n_layers, n_bins)`` or ``(n_files, n_layers, n_bins)``; every
+    histogram is evaluated at the bin centres of ``edges`` in one pass.
+    Empty histograms yield zeros for every moment.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    centers = 0.5 * (edges[1:] + edges[:-1])
+
+    integral = values.sum(axis=-1)
+    mean = safe_divide(values @ centers, integral)
+    delta = centers - mean[..., None]
+    variance = safe_divide((values * delta**2).sum(axis=-1), integral)
+    third = safe_divide((values * delta**3).sum(axis=-1), integral)
+    rms = np.sqrt(variance)
+    skewness = safe_divide(third, variance * rms)
+    mean_error = safe_divide(rms, np.sqrt(integral))
+    return Moments(mean, rms, skewness, integral, mean_error)
@@ -0,0 +1,199 @@
+"""Headless figure rendering with reusable templates.
+
+A template builds its Figure and artists once and then only swaps the
+artist data for each item, which is far cheaper than creating a new
+figure per plot. ``render_many`` spreads items over worker processes,
+each holding its own template instance. Figures are created through
+``matplotlib.figure.Figure`` with an Agg canvas, so nothing here depends
+on (or blocks in) an interactive backend.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+class FigureTemplate:
+    """Base class: ``build`` creates the artists, ``update`` fills them from one item."""
+
+    figsize = (8, 5)
+    dpi = 100
+
+    def __init__(self, **options):
+        self.options = options
+        self.fig = Figure(figsize=self.figsize)
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.build(**options)
+        self.fig.tight_layout()
+
+    def build(self, **options):
+        raise NotImplementedError
+
+    def update(self, item):
+        raise NotImplementedError
+
+    def render(self, item):
+        """Draw ``item`` and save it to ``item["path"]``; returns the path."""
+        self.update(item)
+        self.fig.savefig(item["path"], dpi=self.dpi)
+        return item["path"]
+
+    def frame(self, item):
+        """Draw ``item`` and return the canvas as an ``(h, w, 4)`` uint8 array."""
+        self.update(item)
+        self.fig.canvas.draw()
+        return np.asarray(self.fig.canvas.buffer_rgba()).copy()
+
+
+class LayerHistogramTemplate(FigureTemplate):
+    """Energy spectrum of one layer; items carry ``values``, ``title`` and ``path``."""
+
+    figsize = (6.4, 4.8)
+
+    def build(self, edges, xlabel="Energy Deposition (MeV)", ylabel="Counts"):
+        self.edges = np.asarray(edges)
+        self.bars = self.ax.stairs(np.zeros(self.edges.size - 1), self.edges, fill=True,
+                                   facecolor="skyblue", edgecolor="k")
+        self.title = self.ax.set_title(" ")
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+        self.ax.set_xlim(self.edges[0], self.edges[-1])
+        self.ax.grid(True, alpha=0.3)
+
+    def update(self, item):
+        values = np.asarray(item["values"])
+        self.bars.set_data(values)
+        self.ax.set_ylim(0, max(values.max(), 1) * 1.05)
+        self.title.set_text(item.get("title", ""))
+
+
+class ProfileTemplate(FigureTemplate):
+    """Per-layer profile line; items carry ``y`` (and optional ``x``), ``title`` and ``path``."""
+
+    def build(self, xlabel="Layer", ylabel="Mean Energy Deposition (MeV)"):
+        (self.line,) = self.ax.plot([], [], marker="o")
+        self.title = self.ax.set_title(" ")
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+        self.ax.grid(True)
+
+    def update(self, item):
+        y = np.asarray(item["y"])
+        x = np.asarray(item.get("x", np.arange(y.size)))
+        self.line.set_data(x, y)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.title.set_text(item.get("title", ""))
+
+
+class SpectrumTemplate(FigureTemplate):
+    """Log-scale energy spectrum drawn as a line; items carry ``values`` and ``title``."""
+
+    def build(self, edges, ymax, xlabel="Energy Deposition (MeV)", ylabel="Counts"):
+        edges = np.asarray(edges)
+        self.centers = 0.5 * (edges[:-1] + edges[1:])
+        (self.line,) = self.ax.plot([], [], lw=2, color="blue")
+        self.title = self.ax.set_title(" ")
+        self.ax.set_xlim(self.centers[0], self.centers[-1])
+        self.ax.set_ylim(1, ymax)
+        self.ax.set_yscale("log")
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+
+    def update(self, item):
+        self.line.set_data(self.centers, item["values"])
+        self.title.set_text(item.get("title", ""))
+
+
+class SurfaceTemplate(FigureTemplate):
+    """3D surface of one XY map; the surface polygons are updated in place per item.
+
+    The surface is a single ``Poly3DCollection`` built once (sampled like
+    ``plot_surface``, at most ``count`` rows and columns). Each item only
+    replaces its vertex heights and face colours.
+    """
+
+    figsize = (6.4, 4.8)
+    count = 50
+
+    def __init__(self, **options):
+        self.options = options
+        self.fig = Figure(figsize=self.figsize)
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot(projection="3d")
+        self.build(**options)
+
+    def build(self, x, y, norm, zmax, cmap="viridis"):
+        from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+
+        X, Y = np.meshgrid(x, y)
+        # Row/column sampling of plot_surface(rcount=count, ccount=count)
+        self.rows, self.cols = (
+            np.unique(np.r_[np.arange(0, n - 1, max(int(np.ceil(n / self.count)), 1)), n - 1])
+            for n in X.shape
+        )
+        self.X = X[np.ix_(self.rows, self.cols)]
+        self.Y = Y[np.ix_(self.rows, self.cols)]
+        self.surface = Poly3DCollection(self._polygons(np.zeros_like(self.X)), cmap=cmap, norm=norm,
+                                        linewidth=0, antialiased=False)
+        self.ax.add_collection3d(self.surface)
+        self.title = self.ax.set_title(" ")
+        self.ax.set_xlabel("X [mm]")
+        self.ax.set_ylabel("Y [mm]")
+        self.ax.set_zlabel("Energy [MeV]")
+        self.ax.set_xlim(np.min(x), np.max(x))
+        self.ax.set_ylim(np.min(y), np.max(y))
+        self.ax.set_zlim(0, zmax)
+
+    def _polygons(self, Z):
+        """Quads between neighbouring sampled points, ``(n_quads, 4, 3)``."""
+        grid = np.stack([self.X, self.Y, Z], axis=-1)
+        corners = [grid[:-1, :-1], grid[:-1, 1:], grid[1:, 1:], grid[1:, :-1]]
+        return np.stack(corners, axis=-2).reshape(-1, 4, 3)
+
+    def update(self, item):
+        polygons = self._polygons(np.asarray(item["values"])[np.ix_(self.rows, self.cols)])
+        self.surface.set_verts(polygons)
+        self.surface.set_array(polygons[..., 2].mean(axis=-1))
+        self.title.set_text(item.get("title", ""))
+
+
+_worker_template = None
+
+
+def _init_worker(template_cls, options):
+    global _worker_template
+    _worker_template = template_cls(**options)
+
+
+def _render_item(item):
+    return _worker_template.render(item)
+
+
+def _frame_item(item):
+    return _worker_template.frame(item)
+
+
+def _run(worker, template_cls, items, jobs, options):
+    items = list(items)
+    if jobs <= 1 or len(items) <= 1:
+        template = template_cls(**options)
+        method = template.render if worker is _render_item else template.frame
+        return [method(item) for item in items]
+    jobs = min(jobs, len(items))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(template_cls, options)) as pool:
+        return list(pool.map(worker, items, chunksize=max(1, len(items) // (4 * jobs))))
+
+
+def render_many(template_cls, items, jobs=1, **options):
+    """Render every item with ``template_cls(**options)``; returns the saved paths in order."""
+    return _run(_render_item, template_cls, items, jobs, options)
+
+
+def render_frames(template_cls, items, jobs=1, **options):
+    """Like ``render_many`` but returns each drawing as an RGBA array (animation frames)."""
+    return _run(_frame_item, template_cls, items, jobs, options)
@@ -0,0 +1,174 @@
+"""Bootstrap and jackknife replicas of the mean longitudinal profile.
+
+Replicas are built from the per-event layer-energy matrix (``(events,
+layers)``, usually the memory-mapped array from ``open_layer_matrix``)
+without copying events. A bootstrap replica draws a Poisson(1) weight for
+every event, so a block of replicas is one matrix product::
+
+    weights (replicas, events) @ energy (events, layers) -> weighted sums
+
+The events are processed in blocks (the matrix never has to fit in
+memory) and replica blocks can be spread over worker processes, each
+with its own ``SeedSequence`` child; the result is the same for any
+number of workers. Delete-a-group jackknife replicas come from per-group
+sums and cost a single pass.
+
+The replica profiles are then pushed through the batched gamma fit and
+the moment-based shower-shape observables (``profile_observables``).
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+
+from .gammafit import fit_profiles
+from .moments import safe_divide
+
+EVENT_BLOCK = 65536
+REPLICA_BLOCK = 64
+
+# Poisson(1) CDF in float32; inverse-CDF lookup of float32 uniforms is about
+# twice as fast as Generator.poisson and exact to float32 resolution
+_POISSON_CDF = np.cumsum(np.exp(-1.0) / np.cumprod(np.r_[1.0, np.arange(1.0, 16.0)])).astype(np.float32)
+
+
+class Estimate(NamedTuple):
+    value: float
+    error: float
+    replicas: np.ndarray
+
+
+def _bootstrap_block(task):
+    """Weighted layer sums and weight totals of one block of replicas."""
+    matrix, n_replicas, seed, event_block = task
+    if isinstance(matrix, str):
+        matrix = np.load(matrix, mmap_mode="r")
+    rng = np.random.default_rng(seed)
+    sums = np.zeros((n_replicas, matrix.shape[1]))
+    totals = np.zeros(n_replicas)
+    for start in range(0, matrix.shape[0], event_block):
+        block = np.asarray(matrix[start:start + event_block], dtype=np.float32)
+        uniform = rng.random((n_replicas, len(block)), dtype=np.float32)
+        weights = np.searchsorted(_POISSON_CDF, uniform, side="right").astype(np.float32)
+        sums += weights @ block
+        totals += weights.sum(axis=1, dtype=np.float64)
+    return sums, totals
+
+
+def bootstrap_profiles(matrix, n_replicas=1000, seed=0, jobs=1,
+                       replica_block=REPLICA_BLOCK, event_block=EVENT_BLOCK):
+    """``(n_replicas, layers)`` bootstrap replicas of the mean profile.
+
+    ``matrix`` is an ``(events, layers)`` array or the path of a ``.npy``
+    file (opened memory-mapped in each worker, which avoids sending the
+    matrix to the worker processes). The sums use float32 weights and
+    blocks; replicas are accumulated in float64.
+    """
+    n_blocks = -(-n_replicas // replica_block)
+    sizes = [min(replica_block, n_replicas - i * replica_block) for i in range(n_blocks)]
+    seeds = np.random.SeedSequence(seed).spawn(n_blocks)
+    source = str(matrix) if not isinstance(matrix, np.ndarray) else matrix
+    if isinstance(source, np.memmap) and jobs > 1:
+        source = source.filename
+    tasks = [(source, size, child, event_block) for size, child in zip(sizes, seeds)]
+    if jobs <= 1 or n_blocks <= 1:
+        results = [_bootstrap_block(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, n_blocks)) as pool:
+            results = list(pool.map(_bootstrap_block, tasks))
+    sums = np.concatenate([s for s, _ in results])
+    totals = np.concatenate([t for _, t in results])
+    return sums / totals[:, None]
+
+
+def jackknife_profiles(matrix, n_groups=100, event_block=EVENT_BLOCK):
+    """``(n_groups, layers)`` delete-a-group jackknife replicas of the mean profile.
+
+    Events are split into ``n_groups`` contiguous groups; replica ``k`` is
+    the mean profile without group ``k``.
+    """
+    if isinstance(matrix, str):
+        matrix = np.load(matrix, mmap_mode="r")
+    n_events, n_layers = matrix.shape
+    bounds = np.linspace(0, n_events, n_groups + 1).astype(np.int64)
+    group_sums = np.zeros((n_groups, n_layers))
+    for k, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])):
+        for start in range(a, b, event_block):
+            group_sums[k] += np.asarray(matrix[start:min(start + event_block, b)], dtype=np.float64).sum(axis=0)
+    counts = np.diff(bounds).astype(np.float64)
+    rest = n_events - counts
+    return (group_sums.sum(axis=0) - group_sums) / np.where(rest > 0, rest, np.nan)[:, None]
+
+
+def profile_observables(depth, profiles, fit=True, p0="moments"):
+    """Shower-shape observables for every row of ``profiles``.
+
+    Returns a dict of arrays: ``energy`` (sum over layers), ``mean_depth``
+    and ``rms_depth`` (energy-weighted moments), and with ``fit`` the gamma
+    fit results ``a``, ``b``, ``t_max`` and ``width`` (NaN where the fit
+    did not converge). ``p0`` is passed on to ``fit_profiles``.
+    """
+    profiles = np.atleast_2d(profiles)
+    depth = np.asarray(depth, dtype=np.float64)
+    energy = profiles.sum(axis=1)
+    mean_depth = safe_divide(profiles @ depth, energy)
+    variance = safe_divide(profiles @ depth**2, energy) - mean_depth**2
+    observables = {
+        "energy": energy,
+        "mean_depth": mean_depth,
+        "rms_depth": np.sqrt(np.clip(variance, 0, None)),
+    }
+    if fit:
+        result = fit_profiles(depth, profiles, p0=p0)
+        bad = ~result.converged
+        for name in ("a", "b", "t_max", "width"):
+            values = np.array(getattr(result, name), dtype=np.float64)
+            values[bad] = np.nan
+            observables[name] = values
+    return observables
+
+
+def profile_uncertainties(matrix, depth, n_replicas=1000, method="bootstrap", seed=0, jobs=1, fit=True,
+                          p0="moments"):
+    """Observables of the mean profile with resampling errors.
+
+    ``method`` is ``"bootstrap"`` (``n_replicas`` Poisson-weighted replicas)
+    or ``"jackknife"`` (``n_replicas`` groups). ``p0`` seeds the fit of the
+    mean profile (e.g. from a ``WarmStartCache``); the replicas then start
+    from its result. Returns ``{name: Estimate}``.
+    """
+    nominal_profile = _mean_profile(matrix)
+    if method == "bootstrap":
+        replicas = bootstrap_profiles(matrix, n_replicas, seed=seed, jobs=jobs)
+    elif method == "jackknife":
+        replicas = jackknife_profiles(matrix, n_replicas)
+    else:
+        raise ValueError(f"unknown resampling method {method!r}")
+
+    if fit:
+        central = fit_profiles(depth, nominal_profile, p0=p0)
+        if central.converged[0]:
+            # Replicas scatter around the mean profile: start them from its fit
+            p0 = central.params
+    nominal = profile_observables(depth, nominal_profile, fit, p0)
+    resampled = profile_observables(depth, replicas, fit, p0)
+    estimates = {}
+    for name, values in resampled.items():
+        finite = values[np.isfinite(values)]
+        if method == "bootstrap":
+            error = finite.std(ddof=1) if finite.size > 1 else np.nan
+        else:
+            n = finite.size
+            error = np.sqrt((n - 1) / n * ((finite - finite.mean()) ** 2).sum()) if n > 1 else np.nan
+        estimates[name] = Estimate(float(nominal[name][0]), float(error), values)
+    return estimates
+
+
+def _mean_profile(matrix, event_block=EVENT_BLOCK):
+    if isinstance(matrix, str):
+        matrix = np.load(matrix, mmap_mode="r")
+    total = np.zeros(matrix.shape[1])
+    for start in range(0, matrix.shape[0], event_block):
+        total += np.asarray(matrix[start:start + event_block], dtype=np.float64).sum(axis=0)
+    return total / max(matrix.shape[0], 1)
@@ -0,0 +1,276 @@
+"""Energy-resolution scans over a set of sweep outputs.
+
+For every file the visible-energy peak is fitted with a Gaussian core
+(iterated in a window around the peak) or a Crystal Ball with a
+low-energy tail. ``sigma/mean`` against beam energy is then fitted with
+the usual calorimeter model
+
+    sigma/E = a/sqrt(E) (+) b (+) c/E        (terms added in quadrature, E in GeV)
+
+with stochastic term ``a``, constant term ``b`` and noise term ``c``.
+Uncertainties on ``a, b, c`` come from a bootstrap: every file's
+histogram is resampled (a multinomial draw over its bins, which equals
+resampling the events), all peaks are refitted and the model is refitted
+per replica. Files are processed in parallel, each with its own
+``SeedSequence`` child so results do not depend on the number of workers.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+from scipy.optimize import curve_fit
+from scipy.special import erf
+
+from .batch import map_files
+from .layermatrix import open_layer_matrix
+from .loader import open_file
+
+
+class PeakFit(NamedTuple):
+    mean: float
+    sigma: float
+    mean_error: float
+    sigma_error: float
+    chi2: float
+    ndf: int
+    converged: bool
+    params: tuple = ()  # all fitted model parameters
+
+    @property
+    def resolution(self):
+        return self.sigma / self.mean if self.mean else np.nan
+
+
+class ResolutionScan(NamedTuple):
+    energies: np.ndarray  # beam energy per file [GeV]
+    paths: list
+    peaks: list  # PeakFit per file
+    params: np.ndarray  # (a, b, c)
+    errors: np.ndarray  # bootstrap standard deviation of (a, b, c)
+    replicas: np.ndarray  # (n_boot, 3) refitted model parameters
+
+    @property
+    def resolutions(self):
+        return np.array([peak.resolution for peak in self.peaks])
+
+    @property
+    def resolution_errors(self):
+        return np.array([_ratio_error(peak) for peak in self.peaks])
+
+
+def gauss(x, norm, mean, sigma):
+    return norm * np.exp(-0.5 * ((x - mean) / sigma) ** 2)
+
+
+def crystal_ball(x, norm, beta, m, mean, sigma):
+    """Normalised Crystal Ball (Gaussian core, power-law tail below ``mean - beta*sigma``) times ``norm``."""
+    t = (np.asarray(x, dtype=np.float64) - mean) / sigma
+    tail_scale = (m / beta) ** m * np.exp(-0.5 * beta * beta)
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        tail = tail_scale * (m / beta - beta - t) ** -m
+    shape = np.where(t > -beta, np.exp(-0.5 * t * t), tail)
+    area = sigma * (m / (beta * (m - 1)) * np.exp(-0.5 * beta * beta)
+                    + np.sqrt(np.pi / 2) * (1 + erf(beta / np.sqrt(2))))
+    return norm * shape / area
+
+
+def resolution_model(energy, a, b, c):
+    """``sigma/E`` for beam energy ``energy`` in GeV."""
+    energy = np.asarray(energy, dtype=np.float64)
+    return np.sqrt(a * a / energy + b * b + c * c / (energy * energy))
+
+
+def energy_histogram(sample, bins=None):
+    """Histogram of per-event energies over a robust window around the median."""
+    sample = np.asarray(sample, dtype=np.float64)
+    median = np.median(sample)
+    spread = 1.4826 * np.median(np.abs(sample - median)) or sample.std() or 1.0
+    if bins is None:
+        bins = int(np.clip(np.sqrt(sample.size), 20, 200))
+    return np.histogram(sample, bins=bins, range=(median - 8 * spread, median + 6 * spread))
+
+
+def _binned_median_spread(centers, values):
+    """Median and ``1.4826 * MAD`` of binned data (the robust spread of ``energy_histogram``)."""
+    def weighted_median(x, w):
+        order = np.argsort(x)
+        cumulative = np.cumsum(w[order])
+        return x[order][np.searchsorted(cumulative, 0.5 * cumulative[-1])]
+
+    weights = np.maximum(values, 0.0)
+    if weights.sum() <= 0:
+        return np.nan, np.nan
+    median = weighted_median(centers, weights)
+    return median, 1.4826 * weighted_median(np.abs(centers - median), weights)
+
+
+def _window_moments(centers, values, mask):
+    weight = values[mask].sum()
+    if weight <= 0:
+        return np.nan, np.nan
+    mean = np.dot(centers[mask], values[mask]) / weight
+    return mean, np.sqrt(np.dot((centers[mask] - mean) ** 2, values[mask]) / weight)
+
+
+def fit_peak(values, edges, model="gauss", window=(1.5, 2.5), iterations=3, p0=None):
+    """Fit the peak of a binned energy distribution.
+
+    ``model="gauss"`` refits a Gaussian ``iterations`` times within
+    ``[mean - window[0]*sigma, mean + window[1]*sigma]``; ``"crystalball"``
+    fits a Crystal Ball over a wider window so its tail absorbs leakage.
+    The fit starts from the median and ``1.4826 * MAD`` of the histogram;
+    ``p0`` (the ``params`` of an earlier fit) skips this, e.g. for bootstrap
+    replicas. A window holding fewer than 4 bins is widened until it holds
+    enough. If the fit fails the windowed moments are returned with
+    ``converged=False``.
+    """
+    if model not in ("gauss", "crystalball"):
+        raise ValueError(f"unknown peak model {model!r}")
+    values = np.asarray(values, dtype=np.float64)
+    edges = np.asarray(edges, dtype=np.float64)
+    centers = 0.5 * (edges[:-1] + edges[1:])
+    width = np.diff(edges).max()
+    mean, sigma = _binned_median_spread(centers, values)
+    if not np.isfinite(sigma) or sigma < width:
+        # Peak narrower than a bin (or empty histogram): the bin width is the best guess
+        sigma = width
+    if not np.isfinite(mean):
+        mean = centers[np.argmax(values)]
+    if p0 is not None and len(p0):
+        mean, sigma = (p0[1], p0[2]) if model == "gauss" else (p0[3], p0[4])
+    low, high = window if model == "gauss" else (5.0, 2.5)
+
+    popt = pcov = None
+    mask = np.ones_like(values, dtype=bool)
+    for _ in range(iterations if model == "gauss" else 1):
+        scale = 1.0
+        mask = (centers > mean - low * sigma) & (centers < mean + high * sigma)
+        while mask.sum() < 4 and not mask.all():
+            scale *= 1.5
+            mask = (centers > mean - scale * low * sigma) & (centers < mean + scale * high * sigma)
+        if mask.sum() < 4:
+            break
+        errors = np.sqrt(np.maximum(values[mask], 1.0))
+        try:
+            if model == "gauss":
+                start = [values.max(), mean, sigma] if p0 is None or not len(p0) else p0
+                popt, pcov = curve_fit(gauss, centers[mask], values[mask], p0=start,
+                                       sigma=errors, absolute_sigma=True)
+                mean, sigma = popt[1], abs(popt[2])
+            else:
+                norm = values[mask].sum() * np.diff(edges).mean()
+                start = [norm, 1.5, 3.0, mean, sigma] if p0 is None or not len(p0) else p0
+                popt, pcov = curve_fit(crystal_ball, centers[mask], values[mask],
+                                       p0=start, sigma=errors, absolute_sigma=True,
+                                       bounds=([0, 0.1, 1.01, -np.inf, 1e-9], [np.inf, 10, 50, np.inf, np.inf]))
+                mean, sigma = popt[3], popt[4]
+        except (RuntimeError, ValueError, np.linalg.LinAlgError):
+            popt = None
+            break
+
+    if popt is None:
+        mean, sigma = _window_moments(centers, values, mask)
+        n = values[mask].sum()
+        return PeakFit(mean, sigma, sigma / np.sqrt(max(n, 1)), sigma / np.sqrt(max(2 * n, 1)),
+                       np.nan, 0, False)
+
+    model_func = gauss if model == "gauss" else crystal_ball
+    residual = (values[mask] - model_func(centers[mask], *popt)) / errors
+    perr = np.sqrt(np.abs(np.diag(pcov)))
+    i_mean, i_sigma = (1, 2) if model == "gauss" else (3, 4)
+    return PeakFit(float(mean), float(sigma), float(perr[i_mean]), float(perr[i_sigma]),
+                   float(np.dot(residual, residual)), int(mask.sum() - len(popt)), True, tuple(popt))
+
+
+def _ratio_error(peak):
+    if not peak.mean:
+        return np.nan
+    return peak.resolution * np.hypot(peak.sigma_error / peak.sigma, peak.mean_error / peak.mean)
+
+
+def file_energy_histogram(path, tree="CalorimeterSim"):
+    """Per-event visible energy of ``path`` as a histogram.
+
+    Uses the event-by-layer matrix when the ``tree`` exists and falls back
+    to the ``hTotal`` histogram otherwise.
+    """
+    try:
+        matrix, _ = open_layer_matrix(path, tree=tree)
+    except KeyError:
+        file = open_file(path)
+        return file["hTotal"].values(flow=False), file["hTotal"].axis().edges()
+    return energy_histogram(np.asarray(matrix).sum(axis=1))
+
+
+def scan_file(task):
+    """Peak fit plus bootstrap replicas for one file; ``task`` is ``(path, model, n_boot, seed)``."""
+    path, model, n_boot, seed = task
+    values, edges = file_energy_histogram(path)
+    fit = fit_peak(values, edges, model)
+    rng = np.random.default_rng(seed)
+    total = int(round(values.sum()))
+    replicas = np.full((n_boot, 2), np.nan)
+    if total > 0:
+        probabilities = values / values.sum()
+        for i in range(n_boot):
+            replica = fit_peak(rng.multinomial(total, probabilities), edges, model, p0=fit.params)
+            if replica.converged:  # failed replicas stay NaN rather than fallback moments
+                replicas[i] = replica.mean, replica.sigma
+    return {"path": str(path), "fit": fit, "replicas": replicas}
+
+
+def fit_resolution(energies, resolutions, errors=None):
+    """Fit ``resolution_model`` to ``sigma/E`` points; returns ``(params, covariance)``."""
+    energies = np.asarray(energies, dtype=np.float64)
+    resolutions = np.asarray(resolutions, dtype=np.float64)
+    ok = np.isfinite(resolutions) & (energies > 0)
+    if errors is not None:
+        errors = np.asarray(errors, dtype=np.float64)
+        ok &= np.isfinite(errors) & (errors > 0)
+        errors = errors[ok]
+    if ok.sum() < 3:
+        raise ValueError("need at least three energies to fit the resolution model")
+    e, r = energies[ok], resolutions[ok]
+    p0 = [r[np.argmin(e)] * np.sqrt(e.min()), r.min() / 2, 1e-3]
+    popt, pcov = curve_fit(resolution_model, e, r, p0=p0, sigma=errors, bounds=(0, np.inf))
+    return popt, pcov
+
+
+def resolution_scan(runs, model="gauss", n_boot=200, jobs=1, seed=0):
+    """Fit every run's peak and the resolution model with bootstrap errors.
+
+    ``runs`` is a sequence of ``(energy_GeV, path)`` pairs or catalog
+    ``Run`` records. Files are fitted in ``jobs`` worker processes.
+
+    Only converged peak fits enter the model fit (the others stay in
+    ``peaks`` with ``converged=False``); fewer than three raise
+    ``ValueError``. Every bootstrap replica is fitted with the same
+    per-point errors as the central fit, so ``errors`` describe the
+    spread of the same weighted estimator.
+    """
+    pairs = [(run.energy, run.path) if hasattr(run, "energy") else tuple(run) for run in runs]
+    pairs.sort(key=lambda pair: pair[0])
+    energies = np.array([energy for energy, _ in pairs], dtype=np.float64)
+    children = np.random.SeedSequence(seed).spawn(len(pairs))
+    tasks = [(path, model, n_boot, child) for (_, path), child in zip(pairs, children)]
+    results = map_files(scan_file, tasks, jobs=jobs)
+
+    peaks = [result["fit"] for result in results]
+    converged = np.array([p.converged for p in peaks], dtype=bool)
+    if converged.sum() < 3:
+        failed = ", ".join(f"{e:g}" for e in energies[~converged])
+        raise ValueError(f"only {converged.sum()} peak fits converged (failed: {failed} GeV); "
+                         "need at least three energies to fit the resolution model")
+    point_errors = np.array([_ratio_error(p) for p in peaks])
+    point_errors[~converged] = np.nan  # excluded by fit_resolution
+    params, _ = fit_resolution(energies, [p.resolution for p in peaks], point_errors)
+
+    boot = np.stack([result["replicas"] for result in results], axis=1)  # (n_boot, files, 2)
+    replicas = np.full((n_boot, 3), np.nan)
+    for i in range(n_boot):
+        try:
+            replicas[i], _ = fit_resolution(energies, boot[i, :, 1] / boot[i, :, 0], point_errors)
+        except (RuntimeError, ValueError):
+            continue
+    errors = np.nanstd(replicas, axis=0) if np.isfinite(replicas).any() else np.full(3, np.nan)
+    return ResolutionScan(energies, [path for _, path in pairs], peaks, params, errors, replicas)
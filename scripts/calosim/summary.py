@@ -0,0 +1,46 @@
+"""Per-file shower summary: layer arrays, layer moments and hTotal moments."""
+
+import numpy as np
+
+from .cache import cached
+from .moments import histogram_moments
+
+SUMMARY_VERSION = 1
+
+
+def summarize_file(path):
+    """Read ``path`` once and derive everything the plotting scripts need."""
+    # uproot is only needed on a cache miss; cached summaries load without it
+    from .loader import load_layers, open_file
+
+    file = open_file(path)
+    values, edges = load_layers(file)
+    layer = histogram_moments(values, edges)
+    summary = {
+        "layer_values": values,
+        "layer_edges": edges,
+        "layer_mean": layer.mean,
+        "layer_rms": layer.rms,
+        "layer_skewness": layer.skewness,
+        "layer_integral": layer.integral,
+        "layer_mean_error": layer.mean_error,
+    }
+    if "hTotal" in file:
+        total_values = file["hTotal"].values(flow=False)
+        total_edges = file["hTotal"].axis().edges()
+        total = histogram_moments(total_values, total_edges)
+        summary.update(
+            total_values=total_values,
+            total_edges=total_edges,
+            total_mean=total.mean,
+            total_rms=total.rms,
+            total_integral=total.integral,
+        )
+    return summary
+
+
+def load_summary(path, use_cache=True, cache_dir=None):
+    """Summary of ``path``, served from ``.calosim_cache/`` when still valid."""
+    if not use_cache:
+        return {k: np.asarray(v) for k, v in summarize_file(path).items()}
+    return cached(path, "summary", summarize_file, version=SUMMARY_VERSION, cache_dir=cache_dir)
@@ -0,0 +1,236 @@
+"""Parameter sweeps of CalorimeterSim driven from a macro template.
+
+``make_jobs`` renders one macro per point of a parameter grid by
+rewriting the matching command lines of the template (the same edit
+``test/run_and_rename_rootfile.sh`` does with sed), gives each job its
+own ``/random/setSeeds`` pair and names the output after the
+``particle_EGeV_Nevt_Amm_MAT_Smm.root`` convention read by
+``calosim.catalog``. ``run_sweep`` then runs the jobs on a pool of local
+workers. Every job runs in a scratch directory (the simulation always
+writes ``output.root`` into its working directory) and its output is
+moved into place only after a successful run, so an interrupted sweep
+can be resumed by skipping outputs that already exist.
+
+With ``shards=K`` each point's events are split over K jobs with their
+own seeds; the partial outputs are kept in ``.shards/`` and merged
+losslessly (``calosim.merge``) into the point's file once all K exist.
+"""
+
+import itertools
+import os
+import re
+import shutil
+import subprocess
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import xxhash
+
+from .merge import merge_outputs
+
+SHARD_DIRNAME = ".shards"
+DEFAULT_TEMPLATE = Path(__file__).resolve().parents[2] / "macros" / "run_datacollection_template.mac"
+
+# Grid parameter -> (macro command, value formatter)
+COMMANDS = {
+    "layers": ("/calor/setLayers", "{:d}"),
+    "abs_thickness": ("/calor/setAbsThickness", "{:g} mm"),
+    "scint_thickness": ("/calor/setScintThickness", "{:g} mm"),
+    "abs_material": ("/calor/setAbsMaterial", "{}"),
+    "particle": ("/gun/particle", "{}"),
+    "energy": ("/gun/energy", "{:g} GeV"),
+    "events": ("/run/beamOn", "{:d}"),
+}
+
+DEFAULTS = {
+    "layers": 20,
+    "abs_thickness": 8.0,
+    "scint_thickness": 4.0,
+    "abs_material": "G4_Pb",
+    "particle": "e-",
+    "energy": 10.0,
+    "events": 10000,
+}
+
+
+class Job(NamedTuple):
+    name: str
+    params: dict
+    seeds: tuple
+    macro: str
+    target: str = None  # merged output name for shards of a split point
+    first_event: int = 0  # event number offset of a shard within the merged output
+
+
+def output_name(params, with_layers=False):
+    """File name following the sweep convention (plus ``_<n>layers`` if requested)."""
+    name = (f"{params['particle']}_{params['energy']:g}GeV_{params['events']}evt_"
+            f"{params['abs_thickness']:g}mm_{params['abs_material']}_{params['scint_thickness']:g}mm")
+    if with_layers:
+        name += f"_{params['layers']}layers"
+    return name + ".root"
+
+
+def job_seeds(name, base_seed=0):
+    """Two positive 31-bit seeds derived from the job name, stable across resumes."""
+    seq = np.random.SeedSequence(base_seed, spawn_key=(xxhash.xxh32(name.encode()).intdigest(),))
+    state = seq.generate_state(2, dtype=np.uint32)
+    return tuple(int(s) % (2**31 - 2) + 1 for s in state)
+
+
+def render_macro(template, params, seeds):
+    """Replace the command lines of ``template`` for every given parameter.
+
+    Commands missing from the template are inserted before ``/run/initialize``
+    (``/run/beamOn`` is appended at the end).
+    """
+    lines = template.splitlines()
+    values = {COMMANDS[key][0]: COMMANDS[key][1].format(value) for key, value in params.items()}
+    values["/random/setSeeds"] = f"{seeds[0]} {seeds[1]}"
+    for command, value in values.items():
+        pattern = re.compile(rf"^\s*{re.escape(command)}(\s|$)")
+        matches = [i for i, line in enumerate(lines) if pattern.match(line)]
+        if matches:
+            for i in matches:
+                lines[i] = f"{command} {value}"
+        elif command == "/run/beamOn":
+            lines.append(f"{command} {value}")
+        else:
+            init = [i for i, line in enumerate(lines) if line.strip() == "/run/initialize"]
+            lines.insert(init[0] if init else len(lines), f"{command} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def split_events(events, shards):
+    """Event counts of ``shards`` jobs adding up to ``events`` (first ones get the remainder)."""
+    base, extra = divmod(events, shards)
+    return [base + (k < extra) for k in range(shards) if base + (k < extra) > 0]
+
+
+def make_jobs(grid, template=DEFAULT_TEMPLATE, base_seed=0, shards=1):
+    """One ``Job`` per point of ``grid`` (parameter -> list of values).
+
+    Parameters not in ``grid`` keep ``DEFAULTS``. The layer count is added
+    to the file names only when the grid scans it, since the convention
+    has no field for it. With ``shards > 1`` every point becomes that many
+    jobs, each with its share of the events and its own seeds. Raises
+    ``ValueError`` for unknown parameters.
+    """
+    unknown = set(grid) - set(COMMANDS)
+    if unknown:
+        raise ValueError(f"unknown sweep parameters: {sorted(unknown)}")
+    text = Path(template).read_text()
+    grid = {key: list(grid.get(key, [default])) for key, default in DEFAULTS.items()}
+    with_layers = len(set(grid["layers"])) > 1
+
+    jobs = []
+    names = set()
+    for values in itertools.product(*grid.values()):
+        params = dict(zip(grid, values))
+        name = output_name(params, with_layers)
+        if name in names:
+            continue
+        names.add(name)
+        if shards <= 1:
+            seeds = job_seeds(name, base_seed)
+            jobs.append(Job(name, params, seeds, render_macro(text, params, seeds)))
+            continue
+        first_event = 0
+        counts = split_events(params["events"], shards)
+        for k, events in enumerate(counts):
+            shard = f"{name[:-len('.root')]}.shard{k + 1:03d}of{len(counts):03d}.root"
+            shard_params = dict(params, events=events)
+            seeds = job_seeds(shard, base_seed)
+            jobs.append(Job(shard, shard_params, seeds, render_macro(text, shard_params, seeds),
+                            target=name, first_event=first_event))
+            first_event += events
+    return jobs
+
+
+def run_job(job, executable, outdir, retries=1, timeout=None):
+    """Run one job, retrying failures; returns ``(job, ok, attempts, seconds)``.
+
+    The macro and the simulation log are kept in ``outdir/logs/``.
+    """
+    outdir = Path(outdir)
+    logs = outdir / "logs"
+    logs.mkdir(parents=True, exist_ok=True)
+    stem = job.name[:-len(".root")]
+    (logs / f"{stem}.mac").write_text(job.macro)
+
+    start = time.perf_counter()
+    for attempt in range(1, retries + 2):
+        scratch = outdir / ".sweep" / stem
+        shutil.rmtree(scratch, ignore_errors=True)
+        scratch.mkdir(parents=True)
+        (scratch / "run.mac").write_text(job.macro)
+        with open(logs / f"{stem}.log", "w") as log:
+            try:
+                code = subprocess.run([str(executable), "run.mac"], cwd=scratch, stdout=log,
+                                      stderr=subprocess.STDOUT, timeout=timeout).returncode
+            except subprocess.TimeoutExpired:
+                code = None
+        result = scratch / "output.root"
+        if code == 0 and result.exists():
+            dest = outdir / SHARD_DIRNAME if job.target else outdir
+            dest.mkdir(exist_ok=True)
+            os.replace(result, dest / job.name)
+            shutil.rmtree(scratch, ignore_errors=True)
+            return job, True, attempt, time.perf_counter() - start
+    shutil.rmtree(scratch, ignore_errors=True)
+    return job, False, retries + 1, time.perf_counter() - start
+
+
+def run_sweep(jobs, executable, outdir, workers=1, retries=1, resume=True, timeout=None):
+    """Run ``jobs`` on ``workers`` parallel simulations.
+
+    With ``resume`` jobs whose output file already exists are skipped.
+    Yields ``(job, ok, attempts, seconds)`` as jobs finish. When the last
+    shard of a point is done the shards are merged and removed; the merge
+    is reported as a job named after the merged file with ``attempts == 0``.
+    """
+    executable = Path(executable).resolve()
+    if not executable.exists():
+        raise FileNotFoundError(f"simulation executable not found: {executable}")
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    shard_dir = outdir / SHARD_DIRNAME
+
+    shards = defaultdict(list)
+    for job in jobs:
+        if job.target:
+            shards[job.target].append(job)
+
+    def done(job):
+        if job.target:
+            return (outdir / job.target).exists() or (shard_dir / job.name).exists()
+        return (outdir / job.name).exists()
+
+    def merge(target):
+        parts = shards[target]
+        start = time.perf_counter()
+        merge_outputs([shard_dir / part.name for part in parts], outdir / target,
+                      event_offsets=[part.first_event for part in parts])
+        for part in parts:
+            os.remove(shard_dir / part.name)
+        merged = parts[0]._replace(name=target, params=dict(parts[0].params, events=sum(
+            part.params["events"] for part in parts)), seeds=None, macro="", target=None, first_event=0)
+        return merged, True, 0, time.perf_counter() - start
+
+    if resume:
+        jobs = [job for job in jobs if not done(job)]
+        # Shards finished by an earlier, interrupted sweep may only need merging
+        for target, parts in shards.items():
+            if not (outdir / target).exists() and all(done(part) for part in parts):
+                yield merge(target)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(run_job, job, executable, outdir, retries, timeout) for job in jobs]
+        for future in as_completed(futures):
+            job, ok, attempts, seconds = future.result()
+            yield job, ok, attempts, seconds
+            if ok and job.target and all((shard_dir / part.name).exists() for part in shards[job.target]):
+                yield merge(job.target)
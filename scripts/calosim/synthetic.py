@@ -0,0 +1,124 @@
+"""Synthetic CalorimeterSim outputs for benchmarks and checks without Geant4.
+
+``make_output`` writes a ROOT file with the objects ``RootIO`` produces,
+plus the per-layer XY maps some scripts read:
+
+* ``hTotal``, ``hRadial``, ``hLong``, ``hXY`` and ``hLayer{i}`` with the
+  binning booked in ``RootIO::OpenFile``, plus ``hXY_layer{i}``
+* the ``hits`` ntuple (``edep, x, y, z, event, layer``), with the rows of
+  an event contiguous
+* the ``CalorimeterSim`` tree with one ``Layer{i}`` branch per layer
+
+The longitudinal profile is a gamma distribution in radiation lengths
+(``a = 1 + 0.5 ln(E/Ec)``, ``b = 0.5``) integrated over each layer of the
+given ``Geometry``. Its lateral spread grows with depth around the
+Molière radius. Layer energies fluctuate like a sum of deposits of size
+``quantum``. Events are generated and written in blocks, so the scale is
+limited by disk, not memory.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import uproot
+from scipy.special import gammainc
+
+from .geometry import DEFAULT_GEOMETRY
+from .sweep import output_name
+
+EVENT_BLOCK = 10000
+
+
+def layer_fractions(geometry, energy_mev):
+    """Expected share of the shower energy deposited in each layer (gamma profile in X0)."""
+    a = 1.0 + 0.5 * np.log(energy_mev / geometry.critical_energy)
+    bounds = geometry.to_x0(np.arange(geometry.n_layers + 1) * geometry.pitch)
+    return np.diff(gammainc(max(a, 1.0), 0.5 * bounds))
+
+
+def make_output(path, n_events=2000, geometry=DEFAULT_GEOMETRY, energy_mev=10000.0, hits_per_event=20,
+                sampling_fraction=0.05, quantum=0.5, xy_bins=50, seed=0):
+    """Write a synthetic output file to ``path`` and return the path.
+
+    ``hits_per_event`` sets the size of the ``hits`` ntuple (0 leaves it
+    out); ``sampling_fraction`` scales the shower energy to the visible
+    energy in the scintillator.
+    """
+    rng = np.random.default_rng(seed)
+    n_layers = geometry.n_layers
+    mean_visible = energy_mev * sampling_fraction * layer_fractions(geometry, energy_mev)
+    shape = np.maximum(mean_visible / quantum, 1e-3)
+    spread = 0.5 * geometry.moliere_radius * (1.0 + 0.05 * np.arange(n_layers))
+    scint_z = geometry.front + geometry.layer_depth()
+
+    layer_hists = np.zeros((n_layers, 100))
+    total_hist = np.zeros(101)
+    xy_layers = np.zeros((n_layers, xy_bins, xy_bins))
+    radial, long_, xy = np.zeros(100), np.zeros(100), np.zeros((100, 100))
+    xy_range = [[-50.0, 50.0], [-50.0, 50.0]]
+
+    with uproot.recreate(path) as file:
+        layer_tree = file.mktree("CalorimeterSim", {f"Layer{i}": np.float64 for i in range(n_layers)})
+        hit_tree = None
+        if hits_per_event > 0:
+            hit_tree = file.mktree("hits", {"edep": np.float64, "x": np.float64, "y": np.float64,
+                                            "z": np.float64, "event": np.int32, "layer": np.int32})
+        for first in range(0, n_events, EVENT_BLOCK):
+            n = min(EVENT_BLOCK, n_events - first)
+            energy = rng.gamma(shape, mean_visible / shape, size=(n, n_layers))
+            layer_tree.extend({f"Layer{i}": energy[:, i] for i in range(n_layers)})
+            for i in range(n_layers):
+                layer_hists[i] += np.histogram(energy[:, i], bins=100, range=(0.0, 100.0))[0]
+            total_hist += np.histogram(energy.sum(axis=1), bins=101, range=(0.0, 10000.0))[0]
+            if hit_tree is None:
+                continue
+
+            # Hits: layer drawn from the event's own profile, energy shared within the layer
+            n_hits = n * hits_per_event
+            event = np.repeat(np.arange(first, first + n, dtype=np.int32), hits_per_event)
+            cumulative = np.cumsum(energy, axis=1)
+            cumulative /= cumulative[:, -1:]
+            draw = rng.random(n_hits) * 0.999999
+            layer = (draw[:, None] > np.repeat(cumulative, hits_per_event, axis=0)).sum(axis=1).astype(np.int32)
+            edep = rng.exponential(1.0, n_hits)
+            totals = np.zeros((n, n_layers))
+            np.add.at(totals, (event - first, layer), edep)
+            edep *= energy[event - first, layer] / totals[event - first, layer]
+            x = rng.normal(0.0, spread[layer])
+            y = rng.normal(0.0, spread[layer])
+            z = scint_z[layer] + rng.uniform(-0.5, 0.5, n_hits) * geometry.scint_thickness
+            hit_tree.extend({"edep": edep, "x": x, "y": y, "z": z, "event": event, "layer": layer})
+
+            radial += np.histogram(np.hypot(x, y), bins=100, range=(0.0, 50.0))[0]
+            long_ += np.histogram(z, bins=100, range=(-150.0, 150.0))[0]
+            xy += np.histogram2d(x, y, bins=100, range=xy_range)[0]
+            xy_layers += np.histogramdd((layer, x, y), bins=(n_layers, xy_bins, xy_bins),
+                                        range=[(0, n_layers)] + xy_range, weights=edep)[0]
+
+        for i in range(n_layers):
+            file[f"hLayer{i}"] = (layer_hists[i], np.linspace(0.0, 100.0, 101))
+        file["hTotal"] = (total_hist, np.linspace(0.0, 10000.0, 102))
+        if hit_tree is not None:
+            file["hRadial"] = (radial, np.linspace(0.0, 50.0, 101))
+            file["hLong"] = (long_, np.linspace(-150.0, 150.0, 101))
+            file["hXY"] = (xy, np.linspace(-50.0, 50.0, 101), np.linspace(-50.0, 50.0, 101))
+            edges = np.linspace(-50.0, 50.0, xy_bins + 1)
+            for i in range(n_layers):
+                file[f"hXY_layer{i}"] = (xy_layers[i], edges, edges)
+    return path
+
+
+def make_sweep(directory, energies=(1, 2, 5, 10, 20, 50), n_events=2000, geometry=DEFAULT_GEOMETRY,
+               particle="e-", hits_per_event=0, seed=0):
+    """One synthetic output per beam energy (GeV), named after the sweep convention."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    seeds = np.random.SeedSequence(seed).spawn(len(energies))
+    paths = []
+    for energy, child in zip(energies, seeds):
+        params = {"particle": particle, "energy": energy, "events": n_events, "layers": geometry.n_layers,
+                  "abs_thickness": geometry.abs_thickness, "abs_material": geometry.abs_material,
+                  "scint_thickness": geometry.scint_thickness}
+        path = directory / output_name(params)
+        paths.append(make_output(path, n_events, geometry, 1000.0 * energy, hits_per_event, seed=child))
+    return paths
@@ -1,27 +1,32 @@
 import uproot
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # batch-safe: figures are only saved, never shown
 import matplotlib.pyplot as plt
-from scipy.optimize import curve_fit
 from scipy.special import gamma
 
+from calosim.gammafit import fit_profile, moment_seed
+from calosim.geometry import geometry_for
+
 # Open the ROOT file
-with uproot.open("../build/output.root") as file:
+input_file = "../build/output.root"
+with uproot.open(input_file) as file:
     # Collect layer-wise histograms
     layer_keys = [k for k in file.keys() if k.startswith("hLayer")]
     layer_keys.sort(key=lambda x: int(x.split("Layer")[-1].split(";")[0]))  # Sort by layer number
 
-    z_vals = []
     y_vals = []
 
-    for idx, key in enumerate(layer_keys):
+    for key in layer_keys:
         hist = file[key]
         counts = hist.values()
         y_vals.append(np.sum(counts))  # Total Edep per layer
-        z_vals.append(idx * 5.5)       # Depth in mm (assumes 1.5 mm Pb + 4 mm Sc per layer)
 
-    z_vals = np.array(z_vals)
     y_vals = np.array(y_vals)
 
+# Depth in mm of each layer's scintillator (geometry from the sweep macro or file name)
+z_vals = geometry_for(input_file).layer_depth(n_layers=len(y_vals))
+
 # Define a safe gamma function for fitting
 def gamma_shower(z, a, b, scale):
     z = np.maximum(z, 1e-3)  # Avoid z=0
@@ -31,12 +36,12 @@ def gamma_shower(z, a, b, scale):
 z_fit = z_vals[1:-1]
 y_fit = y_vals[1:-1]
 
-# Fit initial guesses
-a0, b0, scale0 = 2.0, 0.05, np.max(y_fit)
+# Fit initial guesses from the mean and variance of the depth profile
+a0, b0, scale0 = moment_seed(z_fit, y_fit)[0]
 
 # Fit and handle failure gracefully
 try:
-    popt, pcov = curve_fit(gamma_shower, z_fit, y_fit, p0=[a0, b0, scale0], maxfev=5000)
+    popt, pcov = fit_profile(z_fit, y_fit, p0=[a0, b0, scale0])
     a_fit, b_fit, scale_fit = popt
     y_model = gamma_shower(z_vals, a_fit, b_fit, scale_fit)
 
@@ -51,7 +56,7 @@ try:
     plt.legend()
     plt.tight_layout()
     plt.savefig("shower_fit.png", dpi=300)
-    plt.show()
+    plt.close()
 
 except RuntimeError as e:
     print("Fit failed:", e)
@@ -63,5 +68,5 @@ except RuntimeError as e:
     plt.grid(True)
     plt.tight_layout()
     plt.savefig("shower_fit_failed.png", dpi=300)
-    plt.show()
+    plt.close()
 
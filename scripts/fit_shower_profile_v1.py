@@ -1,31 +1,40 @@
 import uproot
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # batch-safe: figures are only saved, never shown
 import matplotlib.pyplot as plt
-from scipy.optimize import curve_fit
 from scipy.special import gamma
 
+from calosim.gammafit import fit_profile, moment_seed
+from calosim.geometry import geometry_for
+
 # Gamma fit function
 def gamma_shower(z, a, b, scale):
     z = np.maximum(z, 1e-3)  # avoid z=0 for power law
     return scale * b * (b * z) ** (a - 1) * np.exp(-b * z) / gamma(a)
 
 # --- Load data from ROOT file ---
-with uproot.open("../build/output.root") as file:
+input_file = "../build/output.root"
+with uproot.open(input_file) as file:
     layer_keys = sorted([k for k in file.keys() if k.startswith("hLayer")],
                         key=lambda x: int(x.split("Layer")[-1].split(";")[0]))
     
-    z_vals, y_vals = [], []
-    for idx, key in enumerate(layer_keys):
+    y_vals = []
+    for key in layer_keys:
         hist = file[key]
         counts = hist.values()
         total_edep = np.sum(counts)
-        z_vals.append(idx * 5.5)  # mm
         y_vals.append(total_edep)
 
-    z_vals = np.array(z_vals)
     y_vals = np.array(y_vals)
 
+# --- Depth of each layer from the run's geometry ---
+geometry = geometry_for(input_file)
+z_vals = geometry.layer_depth(n_layers=len(y_vals))  # mm
+
 print("📊 Loaded {} layers.".format(len(z_vals)))
+print(f"📐 Geometry: {geometry.abs_thickness:g} mm {geometry.abs_material} + {geometry.scint_thickness:g} mm scint, "
+      f"X0 = {geometry.radiation_length:.2f} mm")
 
 # Optional: Print debug info
 for i, (z, y) in enumerate(zip(z_vals, y_vals)):
@@ -35,20 +44,20 @@ for i, (z, y) in enumerate(zip(z_vals, y_vals)):
 z_fit = z_vals[2:-2]
 y_fit = y_vals[2:-2]
 
-# Initial parameter guesses
-a0, b0, scale0 = 4.0, 0.1, np.max(y_fit)
-print(f"\n🔧 Initial fit guess: a = {a0}, b = {b0}, scale = {scale0:.2f}")
+# Initial parameter guesses from the profile's depth moments
+a0, b0, scale0 = moment_seed(z_fit, y_fit)[0]
+print(f"\n🔧 Initial fit guess: a = {a0:.2f}, b = {b0:.4f}, scale = {scale0:.2f}")
 
 # --- Fit Gamma distribution ---
 try:
-    popt, pcov = curve_fit(gamma_shower, z_fit, y_fit, p0=[a0, b0, scale0], maxfev=10000)
+    popt, pcov = fit_profile(z_fit, y_fit, p0=[a0, b0, scale0])
     a_fit, b_fit, scale_fit = popt
     print(f"\n✅ Fit success:")
     print(f"Gamma Fit Parameters: a = {a_fit:.2f}, b = {b_fit:.4f}, scale = {scale_fit:.2f}")
 
     z_max = (a_fit - 1) / b_fit
     width = np.sqrt(a_fit) / b_fit
-    print(f"Shower Max (z_max) = {z_max:.2f} mm")
+    print(f"Shower Max (z_max) = {z_max:.2f} mm ({geometry.to_x0(z_max):.2f} X0)")
     print(f"Shower Width (σ)   = {width:.2f} mm")
 
     # Plot result
@@ -68,7 +77,7 @@ try:
     plt.legend()
     plt.tight_layout()
     plt.savefig("shower_fit.png", dpi=300)
-    plt.show()
+    plt.close()
 
 except RuntimeError as e:
     print(f"\n❌ Fit failed: {e}")
@@ -80,5 +89,5 @@ except RuntimeError as e:
     plt.grid(True)
     plt.tight_layout()
     plt.savefig("shower_fit_failed.png", dpi=300)
-    plt.show()
+    plt.close()
 
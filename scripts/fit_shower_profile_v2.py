@@ -1,9 +1,13 @@
 import uproot
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # batch-safe: figures are only saved, never shown
 import matplotlib.pyplot as plt
-from scipy.optimize import curve_fit
 from scipy.special import gamma
 
+from calosim.gammafit import fit_profile, moment_seed, shape_errors
+from calosim.geometry import geometry_for
+
 # --- Gamma distribution function ---
 def gamma_shower(z, a, b, scale):
     z = np.maximum(z, 1e-3)  # avoid z=0
@@ -11,24 +15,23 @@ def gamma_shower(z, a, b, scale):
         return scale * b * (b * z) ** (a - 1) * np.exp(-b * z) / gamma(a)
 
 # --- Load energy data from ROOT ---
-with uproot.open("../build/output.root") as file:
+input_file = "../build/output.root"
+geometry = geometry_for(input_file)
+with uproot.open(input_file) as file:
     layer_keys = [k for k in file.keys() if k.startswith("hLayer")]
     layer_keys.sort(key=lambda x: int(x.split("Layer")[-1].split(";")[0]))  # Sort by index
 
-    z_vals = []
+    z_vals = geometry.layer_depth(n_layers=len(layer_keys))  # depth of each layer's scintillator
     y_vals = []
 
     print(f"📊 Loaded {len(layer_keys)} layers.")
-    for idx, key in enumerate(layer_keys):
+    for idx, (key, z) in enumerate(zip(layer_keys, z_vals)):
         hist = file[key]
         counts = hist.values()
         total_edep = np.sum(counts)
-        z = idx * 5.5  # depth (1.5 mm Pb + 4 mm Scint)
-        z_vals.append(z)
         y_vals.append(total_edep)
         print(f"Layer {idx:2d} → z = {z:5.1f} mm, Total Edep = {total_edep:.2f} MeV")
 
-z_vals = np.array(z_vals)
 y_vals = np.array(y_vals)
 
 # --- Check for flat profile ---
@@ -44,28 +47,30 @@ if np.allclose(y_vals, y_vals[0]):
     plt.grid(True)
     plt.tight_layout()
     plt.savefig("shower_fit_flat.png", dpi=300)
-    plt.show()
+    plt.close()
     exit()
 
 # --- Fit Gamma distribution ---
 z_fit = z_vals[1:-1]
 y_fit = y_vals[1:-1]
-a0, b0, scale0 = 4.0, 0.1, np.max(y_fit)
+a0, b0, scale0 = moment_seed(z_fit, y_fit)[0]
 
-print(f"\n🔧 Initial fit guess: a = {a0}, b = {b0}, scale = {scale0:.2f}")
+print(f"\n🔧 Initial fit guess: a = {a0:.2f}, b = {b0:.4f}, scale = {scale0:.2f}")
 
 try:
-    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
-        popt, _ = curve_fit(gamma_shower, z_fit, y_fit, p0=[a0, b0, scale0], maxfev=10000)
+    popt, pcov = fit_profile(z_fit, y_fit, p0=[a0, b0, scale0])
     a_fit, b_fit, scale_fit = popt
+    a_err, b_err, scale_err = np.sqrt(np.abs(np.diag(pcov)))
 
     z_max = (a_fit - 1) / b_fit
     shower_width = np.sqrt(a_fit) / b_fit
+    z_max_err, shower_width_err = shape_errors(popt, pcov)  # propagated from the fit covariance
 
     print("\n✅ Fit success:")
-    print(f"Gamma Fit Parameters: a = {a_fit:.2f}, b = {b_fit:.4f}, scale = {scale_fit:.2f}")
-    print(f"Shower Max (z_max) = {z_max:.2f} mm")
-    print(f"Shower Width (σ)   = {shower_width:.2f} mm")
+    print(f"Gamma Fit Parameters: a = {a_fit:.2f} ± {a_err:.2f}, b = {b_fit:.4f} ± {b_err:.4f}, "
+          f"scale = {scale_fit:.2f} ± {scale_err:.2f}")
+    print(f"Shower Max (z_max) = {z_max:.2f} ± {z_max_err:.2f} mm ({geometry.to_x0(z_max):.2f} X0)")
+    print(f"Shower Width (σ)   = {shower_width:.2f} ± {shower_width_err:.2f} mm")
 
     # --- Plot ---
     y_model = gamma_shower(z_vals, *popt)
@@ -83,7 +88,7 @@ try:
     plt.grid(True)
     plt.tight_layout()
     plt.savefig("shower_fit.png", dpi=300)
-    plt.show()
+    plt.close()
 
 except RuntimeError as e:
     print("❌ Fit failed:", e)
@@ -95,5 +100,5 @@ except RuntimeError as e:
     plt.grid(True)
     plt.tight_layout()
     plt.savefig("shower_fit_failed.png", dpi=300)
-    plt.show()
+    plt.close()
 
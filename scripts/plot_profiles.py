@@ -1,34 +1,17 @@
 import uproot
-import numpy as np
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-from matplotlib.colors import LogNorm, Normalize
-from matplotlib.cm import ScalarMappable
-from mpl_toolkits.mplot3d import Axes3D
 import os
-import re
+
+from calosim.animate import animate_xy_layers, color_norm, write_animation
+from calosim.batch import default_jobs
+from calosim.geometry import geometry_for
+from calosim.lateral import lateral_shapes
+from calosim.loader import load_xy_layers
+from calosim.render import SurfaceTemplate, render_frames
 
 # ---------- Config ----------
 filename = "../build/output.root"
 output_dir = "plots"
-os.makedirs(output_dir, exist_ok=True)
-
-# ---------- Load ROOT file ----------
-with uproot.open(filename) as file:
-    def safe_get(name):
-        return file[name] if name in file else None
-
-    hRadial = safe_get("hRadial")
-    hLong   = safe_get("hLong")
-    hTotal  = safe_get("hTotal")
-    hXY     = safe_get("hXY")
-
-    layer_histos = {
-        int(re.search(r"\d+", key).group()): file[key]
-        for key in file.keys()
-        if key.startswith("hXY_layer")
-    }
-    layer_histos = dict(sorted(layer_histos.items()))
 
 
 # ---------- Plot 1D ----------
@@ -46,130 +29,122 @@ def plot_1d(hist, title, xlabel, outname, color="blue"):
         plt.savefig(f"{output_dir}/{outname}")
         plt.close()
 
-plot_1d(hRadial, "Radial Energy Deposition", "Radius [mm]", "plot_radial.png")
-plot_1d(hLong, "Longitudinal Energy Deposition", "Z [mm]", "plot_longitudinal.png", color="green")
-
-if hTotal:
-    plt.figure()
-    plt.bar(["Total"], hTotal.values(), color="orange")
-    plt.title("Total Energy Deposition")
-    plt.ylabel("Energy [MeV]")
-    plt.savefig(f"{output_dir}/plot_total.png")
-    plt.close()
-
-# ---------- Plot full-layer hXY heatmap ----------
-if hXY:
-    x_edges = hXY.axis(0).edges()
-    y_edges = hXY.axis(1).edges()
-    z_vals = hXY.values()
-
-    plt.figure()
-    plt.pcolormesh(x_edges, y_edges, z_vals.T, shading='auto', cmap='viridis')
-    plt.xlabel("X [mm]")
-    plt.ylabel("Y [mm]")
-    plt.title("XY Energy Deposition (All Layers)")
-    plt.colorbar(label="Energy [MeV]")
-    plt.axis("equal")
-    plt.savefig(f"{output_dir}/plot_xy.png")
-    plt.close()
-
-# ---------- Plot N layered 2D hXY ----------
-N = 6
-for i, (layer, hist) in enumerate(layer_histos.items()):
-    if i >= N:
-        break
-    x_edges = hist.axis(0).edges()
-    y_edges = hist.axis(1).edges()
-    z_vals = hist.values()
 
+def plot_xy(x_edges, y_edges, z_vals, title, outname):
     plt.figure()
     plt.pcolormesh(x_edges, y_edges, z_vals.T, shading='auto', cmap='viridis')
     plt.xlabel("X [mm]")
     plt.ylabel("Y [mm]")
-    plt.title(f"XY Energy Deposition - Layer {layer}")
+    plt.title(title)
     plt.colorbar(label="Energy [MeV]")
     plt.axis("equal")
-    plt.savefig(f"{output_dir}/hXY_layer{layer:02d}.png")
+    plt.savefig(f"{output_dir}/{outname}")
     plt.close()
 
-print(f"✅ Plots saved to: {output_dir}/")
-
 
-# ---------- Animation of Layered 2D XY ----------
-if layer_histos:
-    fig, ax = plt.subplots()
-    first_hist = next(iter(layer_histos.values()))
-    x_edges = first_hist.axis(0).edges()
-    y_edges = first_hist.axis(1).edges()
-
-    all_values = np.array([h.values() for h in layer_histos.values()])
-    positive_vals = all_values[all_values > 0]
+def plot_lateral(lateral, geometry, layer_nums):
+    fig, (ax_curve, ax_radius) = plt.subplots(1, 2, figsize=(11, 4.5))
+    cmap = plt.get_cmap("viridis")
+    for l in layer_nums:
+        ax_curve.plot(lateral.r_edges[1:], lateral.containment[l], color=cmap(l / max(len(layer_nums) - 1, 1)), lw=1)
+    ax_curve.plot(lateral.r_edges[1:], lateral.shower_containment, color="black", lw=2, label="All layers")
+    ax_curve.axhline(0.9, color="gray", linestyle=":")
+    ax_curve.axvline(geometry.moliere_radius, color="red", linestyle="--", label=f"R_M ({geometry.abs_material})")
+    ax_curve.set(xlabel="Radius [mm]", ylabel="Contained fraction", title="Radial Containment per Layer")
+    ax_curve.legend()
+    ax_radius.plot(layer_nums, lateral.r90, "o-", label="R90")
+    ax_radius.plot(layer_nums, lateral.r95, "s-", label="R95")
+    ax_radius.plot(layer_nums, lateral.rms, "^-", label="Lateral RMS")
+    ax_radius.set(xlabel="Layer", ylabel="Radius [mm]", title="Lateral Shower Size")
+    ax_radius.legend()
+    for ax in (ax_curve, ax_radius):
+        ax.grid(True)
+    fig.tight_layout()
+    fig.savefig(f"{output_dir}/plot_lateral_containment.png")
+    plt.close(fig)
+
+
+def main():
+    os.makedirs(output_dir, exist_ok=True)
+
+    # ---------- Load ROOT file ----------
+    # The hXY_layer* maps are read once, into one (layers, nx, ny) stack
+    with uproot.open(filename) as file:
+        def safe_get(name):
+            return file[name] if name in file else None
+
+        hRadial = safe_get("hRadial")
+        hLong   = safe_get("hLong")
+        hTotal  = safe_get("hTotal")
+        hXY     = safe_get("hXY")
+        try:
+            xy_stack, x_edges, y_edges = load_xy_layers(file)
+        except KeyError:
+            xy_stack = None
+
+    plot_1d(hRadial, "Radial Energy Deposition", "Radius [mm]", "plot_radial.png")
+    plot_1d(hLong, "Longitudinal Energy Deposition", "Z [mm]", "plot_longitudinal.png", color="green")
+
+    if hTotal:
+        plt.figure()
+        plt.bar(["Total"], hTotal.values(), color="orange")
+        plt.title("Total Energy Deposition")
+        plt.ylabel("Energy [MeV]")
+        plt.savefig(f"{output_dir}/plot_total.png")
+        plt.close()
 
-    if positive_vals.size == 0:
+    # ---------- Plot full-layer hXY heatmap ----------
+    if hXY:
+        plot_xy(hXY.axis(0).edges(), hXY.axis(1).edges(), hXY.values(),
+                "XY Energy Deposition (All Layers)", "plot_xy.png")
+
+    # ---------- Plot N layered 2D hXY ----------
+    N = 6
+    if xy_stack is not None:
+        for layer in range(min(N, len(xy_stack))):
+            plot_xy(x_edges, y_edges, xy_stack[layer],
+                    f"XY Energy Deposition - Layer {layer}", f"hXY_layer{layer:02d}.png")
+
+    print(f"✅ Plots saved to: {output_dir}/")
+
+    if xy_stack is None:
+        return
+
+    layer_nums = list(range(len(xy_stack)))
+
+    # ---------- Lateral shapes: all layers at once from the stacked maps ----------
+    lateral = lateral_shapes(xy_stack, x_edges, y_edges)
+    geometry = geometry_for(filename, n_layers=len(xy_stack))
+    print(f"📏 Molière radius estimate (R90, all layers): {lateral.moliere_estimate:.1f} mm "
+          f"(geometry: {geometry.moliere_radius:.1f} mm)")
+    for l in layer_nums:
+        print(f"   Layer {l:2d}: centroid = ({lateral.centroid_x[l]:6.2f}, {lateral.centroid_y[l]:6.2f}) mm, "
+              f"RMS = {lateral.rms[l]:6.2f} mm, R90 = {lateral.r90[l]:6.2f} mm, R95 = {lateral.r95[l]:6.2f} mm")
+    plot_lateral(lateral, geometry, layer_nums)
+    print(f"📈 Lateral containment saved to: {output_dir}/plot_lateral_containment.png")
+
+    # ---------- Animation of Layered 2D XY ----------
+    # Frames are rasterized straight from the stacked hXY_layer* array and encoded once
+    if not (xy_stack > 0).any():
         print("⚠️ All values are non-positive, using linear color scale.")
-        norm = Normalize(vmin=0, vmax=np.max(all_values))
-    else:
-        norm = LogNorm(vmin=np.min(positive_vals), vmax=np.max(positive_vals))
-
-    mesh = ax.pcolormesh(x_edges, y_edges, first_hist.values().T, shading='auto', cmap='viridis', norm=norm)
-    cbar = fig.colorbar(ScalarMappable(norm=norm, cmap='viridis'), ax=ax)
-    cbar.set_label("Energy [MeV]")
-    title = ax.set_title("")
 
     # Reversed layer playback (out-in shower)
-    reversed_layers = list(reversed(list(layer_histos.items())))
-
-    def update(i):
-        layer, hist = reversed_layers[i]
-        z_vals = hist.values().T
-        mesh.set_array(z_vals.ravel())
-        title.set_text(f"Layer {layer} (Out → In)")
-        return mesh,
-
-    ani = animation.FuncAnimation(
-        fig, update, frames=len(reversed_layers), interval=400, blit=False
-    )
-
     gif_path = f"{output_dir}/hXY_layers_animation.gif"
-    ani.save(gif_path, writer='pillow', fps=3)
+    animate_xy_layers(xy_stack, gif_path, fps=3, layers=layer_nums[::-1], jobs=default_jobs())
     print(f"🎞️ 2D Animation saved to: {gif_path}")
-    plt.close()
-
-
-# ---------- 3D Surface Animation ----------
-from mpl_toolkits.mplot3d import Axes3D  # noqa: F401
-
-X, Y = np.meshgrid(x_edges[:-1], y_edges[:-1])
-layer_nums = list(layer_histos.keys())
-Z_stack = [layer_histos[l].values().T for l in layer_nums]
-Z_stack = np.stack(Z_stack, axis=2)
-
-fig = plt.figure()
-ax = fig.add_subplot(111, projection='3d')
-
-vmin = np.min(positive_vals) if positive_vals.size > 0 else 0.1
-vmax = np.max(positive_vals) if positive_vals.size > 0 else 1.0
-norm = LogNorm(vmin=vmin, vmax=vmax)
-
-surf = ax.plot_surface(X, Y, Z_stack[:, :, 0], cmap='viridis', norm=norm)
-ax.set_xlabel("X [mm]")
-ax.set_ylabel("Y [mm]")
-ax.set_zlabel("Energy [MeV]")
-title = ax.set_title("")
-
-def update_surface(i):
-    ax.clear()
-    ax.set_xlabel("X [mm]")
-    ax.set_ylabel("Y [mm]")
-    ax.set_zlabel("Energy [MeV]")
-    ax.set_title(f"Layer {layer_nums[i]} (XY as base, Z=Energy)")
-    surf = ax.plot_surface(X, Y, Z_stack[:, :, i], cmap='viridis', norm=norm)
-    return surf,
-
-ani3d = animation.FuncAnimation(
-    fig, update_surface, frames=len(layer_nums), interval=500, blit=False
-)
-
-ani3d.save(f"{output_dir}/hXY_3D_layers.gif", writer='pillow', fps=2)
-print(f"🎞️ 3D Layer Animation saved to: {output_dir}/hXY_3D_layers.gif")
 
+    # ---------- 3D Surface Animation ----------
+    # One 3D axes and one surface collection are reused; each frame only updates its vertices
+    norm = color_norm(xy_stack)
+    items = [
+        {"values": xy_stack[l].T, "title": f"Layer {l} (XY as base, Z=Energy)"}
+        for l in layer_nums
+    ]
+    frames = render_frames(SurfaceTemplate, items, jobs=default_jobs(),
+                           x=x_edges[:-1], y=y_edges[:-1], norm=norm, zmax=xy_stack.max())
+    write_animation(frames, f"{output_dir}/hXY_3D_layers.gif", fps=2)
+    print(f"🎞️ 3D Layer Animation saved to: {output_dir}/hXY_3D_layers.gif")
+
+
+if __name__ == "__main__":
+    main()
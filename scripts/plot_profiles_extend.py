@@ -1,8 +1,10 @@
-```python
 import uproot
 import matplotlib.pyplot as plt
 import numpy as np
 import argparse
+import os
+
+from calosim.histview import HistView
 
 # Parse command-line arguments for flexibility
 parser = argparse.ArgumentParser(description="Plot energy deposition profiles from CalorimeterSim")
@@ -12,16 +14,18 @@ parser.add_argument("--particle", type=str, default="electron", help="Particle t
 parser.add_argument("--material", type=str, default="lead", help="Absorber material (lead, tungsten, copper)")
 args = parser.parse_args()
 
-# Load ROOT file
+# Load ROOT file; every binning below is a view over the arrays read here
 file = uproot.open("output.root")
+os.makedirs("figures", exist_ok=True)
 
 # Total energy histogram
-hTotal = file["hTotal"]
+hTotal = HistView.from_hist(file["hTotal"])
 energy_range = args.energy * 1.5  # Scale range to accommodate fluctuations
 hTotal_bins = 100
 hTotal_range = (0, energy_range * 1000)  # Convert GeV to MeV for hTotal
+view = hTotal.slice(*hTotal_range).rebin_to(hTotal_bins)
 plt.figure()
-hTotal.plot.hist(bins=hTotal_bins, range=hTotal_range, histtype="step")
+plt.stairs(view.values, view.edges)
 plt.title(f"Total Energy Deposition ({args.particle}, {args.energy} GeV, {args.material})")
 plt.xlabel("Energy [MeV]")
 plt.ylabel("Events")
@@ -29,10 +33,11 @@ plt.savefig("figures/plot_total.png")
 plt.close()
 
 # Longitudinal profile
-hLong = file["hLong"]
+hLong = HistView.from_hist(file["hLong"])
 hLong_bins = args.layers  # Match binning to number of layers
+view = hLong.rebin_to(hLong_bins)
 plt.figure()
-hLong.plot.hist(bins=hLong_bins, range=(0, args.layers), histtype="step")
+plt.stairs(view.values, view.edges)
 plt.title(f"Longitudinal Profile ({args.particle}, {args.energy} GeV, {args.material})")
 plt.xlabel("Layer Number")
 plt.ylabel("Energy [MeV]")
@@ -40,11 +45,12 @@ plt.savefig("figures/plot_longitudinal.png")
 plt.close()
 
 # Radial profile
-hRadial = file["hRadial"]
+hRadial = HistView.from_hist(file["hRadial"])
 hRadial_bins = 50
 hRadial_range = (0, 5.0) if args.material == "tungsten" else (0, 10.0)  # Narrower for tungsten
+view = hRadial.slice(*hRadial_range).rebin_to(hRadial_bins)
 plt.figure()
-hRadial.plot.hist(bins=hRadial_bins, range=hRadial_range, histtype="step")
+plt.stairs(view.values, view.edges)
 plt.title(f"Radial Profile ({args.particle}, {args.energy} GeV, {args.material})")
 plt.xlabel("Radius [cm]")
 plt.ylabel("Energy [MeV]")
@@ -54,11 +60,10 @@ plt.close()
 # XY map
 hXY = file["hXY"]
 plt.figure()
-hXY.plot.hist(cmap="viridis")
+plt.pcolormesh(hXY.axis(0).edges(), hXY.axis(1).edges(), hXY.values().T, cmap="viridis")
 plt.title(f"XY Energy Map ({args.particle}, {args.energy} GeV, {args.material})")
 plt.xlabel("X [cm]")
 plt.ylabel("Y [cm]")
 plt.colorbar(label="Energy [MeV]")
 plt.savefig("figures/plot_xy.png")
 plt.close()
-```
\ No newline at end of file
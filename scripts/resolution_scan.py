@@ -0,0 +1,10 @@
+# resolution_scan.py
+# sigma_E/E versus beam energy for a catalog selection, with a stochastic (+) constant (+) noise fit
+# Same as `python -m calosim resolution`
+
+import sys
+
+from calosim.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main(["resolution", *sys.argv[1:]]))
@@ -0,0 +1,63 @@
+# run_sweep.py
+# Render macros over a parameter grid and run CalorimeterSim on all local cores
+
+import argparse
+
+from calosim.batch import default_jobs
+from calosim.sweep import DEFAULT_TEMPLATE, make_jobs, run_sweep
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a CalorimeterSim parameter sweep")
+    parser.add_argument("--particles", nargs="+", default=["e-"])
+    parser.add_argument("--energies", nargs="+", type=float, default=[10.0], help="Beam energies [GeV]")
+    parser.add_argument("--events", nargs="+", type=int, default=[10000])
+    parser.add_argument("--abs-thicknesses", nargs="+", type=float, default=[8.0], help="[mm]")
+    parser.add_argument("--scint-thicknesses", nargs="+", type=float, default=[4.0], help="[mm]")
+    parser.add_argument("--materials", nargs="+", default=["G4_Pb"])
+    parser.add_argument("--layers", nargs="+", type=int, default=[20])
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE)
+    parser.add_argument("--executable", default="../build/CalorimeterSim")
+    parser.add_argument("--outdir", default="../Output")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed; job seeds derive from it and the file name")
+    parser.add_argument("--jobs", "-j", type=int, default=default_jobs(), help="Parallel simulations")
+    parser.add_argument("--shards", type=int, default=1, help="Split each point's events over this many seeded jobs")
+    parser.add_argument("--retries", type=int, default=1)
+    parser.add_argument("--timeout", type=float, help="Seconds before a run is killed")
+    parser.add_argument("--no-resume", action="store_true", help="Re-run points whose output already exists")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the jobs")
+    args = parser.parse_args()
+
+    grid = {
+        "particle": args.particles,
+        "energy": args.energies,
+        "events": args.events,
+        "abs_thickness": args.abs_thicknesses,
+        "scint_thickness": args.scint_thicknesses,
+        "abs_material": args.materials,
+        "layers": args.layers,
+    }
+    jobs = make_jobs(grid, template=args.template, base_seed=args.seed, shards=args.shards)
+    print(f"🧮 {len(jobs)} jobs")
+    if args.dry_run:
+        for job in jobs:
+            print(f"   {job.name}  seeds={job.seeds[0]} {job.seeds[1]}")
+        raise SystemExit(0)
+
+    failed = []
+    done = 0
+    for job, ok, attempts, seconds in run_sweep(jobs, args.executable, args.outdir, workers=args.jobs,
+                                                 retries=args.retries, resume=not args.no_resume,
+                                                 timeout=args.timeout):
+        if attempts == 0:
+            print(f"🧩 merged shards into {job.name} ({job.params['events']} events)")
+            continue
+        done += 1
+        if ok:
+            print(f"✅ {job.name} ({seconds:.0f} s, attempt {attempts})")
+        else:
+            failed.append(job.name)
+            print(f"❌ {job.name} failed after {attempts} attempts, see logs/")
+
+    print(f"🏁 {done - len(failed)} finished, {len(failed)} failed, {len(jobs) - done} already present")
+    if failed:
+        raise SystemExit(1)
@@ -25,6 +25,6 @@ void EventAction::BeginOfEventAction(const G4Event*) {
     RootIO::Instance()->ClearEvent();
 }
 
-void EventAction::EndOfEventAction(const G4Event*) {
-    RootIO::Instance()->FillEvent();
+void EventAction::EndOfEventAction(const G4Event* event) {
+    RootIO::Instance()->FillEvent(event->GetEventID());
 }
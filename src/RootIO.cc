@@ -41,25 +41,29 @@ void RootIO::AddToLayer(G4int layer, G4double edep) {
 void RootIO::ClearEvent() {
     fEdep.clear();
     fPos.clear();
+    fHitLayer.clear();
     std::fill(fLayerEdep.begin(), fLayerEdep.end(), 0.);
 }
 
-void RootIO::SaveHit(G4double edep, const G4ThreeVector& pos) {
+void RootIO::SaveHit(G4double edep, const G4ThreeVector& pos, G4int layer) {
     fEdep.push_back(edep);
     fPos.push_back(pos);
+    fHitLayer.push_back(layer);
 
     fAnalysisManager->FillH1(hRadialID, pos.perp());
     fAnalysisManager->FillH1(hLongID, pos.z());
     fAnalysisManager->FillH2(hXYID, pos.x(), pos.y());
 }
 
-void RootIO::FillEvent() {
+void RootIO::FillEvent(G4int eventID) {
     G4double totalEdep = 0.;
     for (size_t i = 0; i < fEdep.size(); ++i) {
         fAnalysisManager->FillNtupleDColumn(0, fEdep[i] / MeV);
         fAnalysisManager->FillNtupleDColumn(1, fPos[i].x() / mm);
         fAnalysisManager->FillNtupleDColumn(2, fPos[i].y() / mm);
         fAnalysisManager->FillNtupleDColumn(3, fPos[i].z() / mm);
+        fAnalysisManager->FillNtupleIColumn(4, eventID);
+        fAnalysisManager->FillNtupleIColumn(5, fHitLayer[i]);
         fAnalysisManager->AddNtupleRow();
         totalEdep += fEdep[i];
     }
@@ -92,6 +96,8 @@ void RootIO::OpenFile(const G4String& filename) {
     fAnalysisManager->CreateNtupleDColumn("x");
     fAnalysisManager->CreateNtupleDColumn("y");
     fAnalysisManager->CreateNtupleDColumn("z");
+    fAnalysisManager->CreateNtupleIColumn("event"); // rows of one event are contiguous
+    fAnalysisManager->CreateNtupleIColumn("layer"); // Active layer copy number
     fAnalysisManager->FinishNtuple();
 }
 
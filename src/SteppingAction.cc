@@ -34,7 +34,7 @@ void SteppingAction::UserSteppingAction(const G4Step* step) {
         //       << ", Edep: " << edep / MeV << " MeV, z = " << z / mm << " mm" << G4endl;
 
         rootIO->AddToLayer(copyNo, edep);
-        rootIO->SaveHit(edep, pos);
+        rootIO->SaveHit(edep, pos, copyNo);
 
         auto* analysisManager = G4AnalysisManager::Instance();
         analysisManager->FillH1(rootIO->GetHLongID(), copyNo, edep / MeV);
@@ -1,58 +1,89 @@
 # analyze_calorimeter_output.py
 
-import uproot
-import numpy as np
 import matplotlib.pyplot as plt
 from pathlib import Path
-import re
+import argparse
+import sys
 
-data_dir = Path("/Users/ajay/Work/geantexercise/CalorimeterSim/Output")
-root_files = sorted(data_dir.glob("*.root"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
 
-def parse_filename(filename):
-    pattern = r"(?P<particle>\w+-?)_(?P<energy>\d+)GeV_(?P<events>\d+)evt_(?P<abs_thick>\d+)mm_(?P<abs_mat>G4_\w+)_(?P<scin_thick>\d+)mm"
-    match = re.search(pattern, filename)
-    return match.groupdict() if match else {}
+from calosim.batch import default_jobs, map_files
+from calosim.catalog import parse_filename, select_runs
+from calosim.gammafit import WarmStartCache, fit_profiles
+from calosim.geometry import from_filename
+from calosim.layermatrix import open_layer_matrix
 
-def analyze_file(file_path):
+data_dir = Path(__file__).resolve().parent.parent / "Output"
+
+def reduce_file(file_path):
+    """Read one file and return the small arrays needed for its plots."""
+    energy_per_layer, _ = open_layer_matrix(file_path)
+
+    return {
+        "path": file_path,
+        "avg_profile": energy_per_layer.mean(axis=0),
+        "std_profile": energy_per_layer.std(axis=0),
+        "total_energy": energy_per_layer.sum(axis=1),
+    }
+
+def fit_shower_max(result, seeds):
+    """Gamma fit of the average profile, warm-started from similar earlier runs."""
+    info = parse_filename(result["path"].name)
+    if not info:
+        return
+    config = (info["particle"], info["energy"], info["abs_mat"], info["abs_thick"], info["scin_thick"])
+    geometry = from_filename(result["path"], n_layers=len(result["avg_profile"]))
+    depth = geometry.layer_depth()  # mm
+
+    p0 = seeds.get(*config)
+    fit = fit_profiles(depth, result["avg_profile"], p0="moments" if p0 is None else p0)
+    if fit.converged[0]:
+        seeds.put(*config, fit.params[0])
+        print(f"   Shower max ≈ {fit.t_max[0]:.1f} mm = {geometry.to_x0(fit.t_max[0]):.2f} X0 "
+              f"({fit.n_iter[0]} iterations)")
+
+def plot_file(result):
+    file_path = result["path"]
     info = parse_filename(file_path.name)
+    avg_profile = result["avg_profile"]
+    std_profile = result["std_profile"]
+    total_energy = result["total_energy"]
     print(f"📂 Analyzing {file_path.name}")
-    with uproot.open(file_path) as f:
-        tree = f["CalorimeterSim"]
-        branches = tree.keys()
-        layer_keys = [k for k in branches if k.startswith("Layer")]
-        layers = sorted(layer_keys, key=lambda x: int(x.replace("Layer", "")))
-
-        energy_per_layer = np.stack([tree[layer].array(library="np") for layer in layers], axis=1)
-        total_energy = energy_per_layer.sum(axis=1)
-
-        avg_profile = energy_per_layer.mean(axis=0)
-        std_profile = energy_per_layer.std(axis=0)
-
-        # Plot: Shower Profile
-        plt.figure(figsize=(8, 5))
-        plt.title(f"Shower Profile: {info.get('particle')} {info.get('energy')} GeV")
-        plt.xlabel("Layer Number")
-        plt.ylabel("Mean Energy Deposition (MeV)")
-        plt.errorbar(range(len(layers)), avg_profile, yerr=std_profile, fmt="o-", capsize=3)
-        plt.grid(True)
-        plt.tight_layout()
-        plt.savefig(file_path.with_suffix(".profile.png"))
-        plt.close()
-
-        # Plot: Total Energy Distribution
-        plt.figure(figsize=(6, 4))
-        plt.hist(total_energy, bins=50, color='steelblue', edgecolor='black')
-        plt.title(f"Total Energy Deposition\n{file_path.name}")
-        plt.xlabel("Total Energy (MeV)")
-        plt.ylabel("Events")
-        plt.tight_layout()
-        plt.savefig(file_path.with_suffix(".total_energy.png"))
-        plt.close()
-
-        print(f"✅ Plots saved: {file_path.with_suffix('.profile.png').name}, {file_path.with_suffix('.total_energy.png').name}\n")
-
-# Batch analyze all files
-for root_file in root_files:
-    analyze_file(root_file)
 
+    # Plot: Shower Profile
+    plt.figure(figsize=(8, 5))
+    plt.title(f"Shower Profile: {info.get('particle')} {info.get('energy')} GeV")
+    plt.xlabel("Layer Number")
+    plt.ylabel("Mean Energy Deposition (MeV)")
+    plt.errorbar(range(len(avg_profile)), avg_profile, yerr=std_profile, fmt="o-", capsize=3)
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig(file_path.with_suffix(".profile.png"))
+    plt.close()
+
+    # Plot: Total Energy Distribution
+    plt.figure(figsize=(6, 4))
+    plt.hist(total_energy, bins=50, color='steelblue', edgecolor='black')
+    plt.title(f"Total Energy Deposition\n{file_path.name}")
+    plt.xlabel("Total Energy (MeV)")
+    plt.ylabel("Events")
+    plt.tight_layout()
+    plt.savefig(file_path.with_suffix(".total_energy.png"))
+    plt.close()
+
+    print(f"✅ Plots saved: {file_path.with_suffix('.profile.png').name}, {file_path.with_suffix('.total_energy.png').name}\n")
+
+# Batch analyze all files: read in parallel, plot in file order
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze every ROOT file of a sweep")
+    parser.add_argument("data_dir", nargs="?", type=Path, default=data_dir, help="Directory containing *.root files")
+    parser.add_argument("--jobs", "-j", type=int, default=default_jobs(), help="Number of worker processes")
+    args = parser.parse_args()
+
+    # Files come from the sweep catalog, which only re-reads new or changed outputs
+    root_files = list(select_runs(args.data_dir).values())
+    seeds = WarmStartCache(args.data_dir)
+    for result in map_files(reduce_file, root_files, jobs=args.jobs):
+        plot_file(result)
+        fit_shower_max(result, seeds)
+    seeds.save()
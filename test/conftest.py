@@ -0,0 +1,5 @@
+# Tests import the calosim package from scripts/, like the analysis scripts here
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
@@ -0,0 +1,114 @@
+"""Streaming accumulators: chunked fills and merges against single-pass NumPy results."""
+
+import numpy as np
+import pytest
+
+from calosim.accumulators import Hist1D, Hist2D, RunningMoments, from_bytes
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(42)
+    values = rng.normal(1e6, 3.0, 10000)  # large offset: naive sum-of-squares variance loses precision
+    weights = rng.uniform(0.5, 2.0, values.size)
+    return values, weights
+
+
+def chunked(acc_factory, values, weights, pieces=7):
+    """Fill one accumulator per chunk (as workers would) and merge them."""
+    parts = []
+    for v, w in zip(np.array_split(values, pieces), np.array_split(weights, pieces)):
+        acc = acc_factory()
+        acc.fill(v, w)
+        parts.append(acc)
+    total = parts[0]
+    for part in parts[1:]:
+        total += part
+    return total
+
+
+def test_running_moments_merge_matches_single_pass(data):
+    values, weights = data
+    merged = chunked(RunningMoments, values, weights)
+
+    mean = np.average(values, weights=weights)
+    variance = np.average((values - mean) ** 2, weights=weights)
+    assert merged.n == values.size
+    assert merged.sumw == pytest.approx(weights.sum(), rel=1e-12)
+    assert merged.sumw2 == pytest.approx(np.dot(weights, weights), rel=1e-12)
+    assert merged.mean == pytest.approx(mean, rel=1e-14)
+    assert merged.variance == pytest.approx(variance, rel=1e-9)
+    assert merged.sum == pytest.approx(np.dot(weights, values), rel=1e-14)
+    assert (merged.min, merged.max) == (values.min(), values.max())
+
+
+def test_running_moments_merge_with_empty():
+    acc = RunningMoments().fill([1.0, 2.0, 3.0])
+    acc += RunningMoments()
+    assert acc.mean == 2.0
+    assert acc.variance == pytest.approx(2.0 / 3.0)
+
+
+def test_kahan_sum_keeps_small_terms():
+    acc = RunningMoments()
+    acc.fill([1e16])
+    for _ in range(1000):
+        acc.merge(RunningMoments().fill([1.0]))
+    # A plain float sum loses every +1 against 1e16
+    assert acc.sum == 1e16 + 1000
+
+
+def test_hist1d_merge_matches_single_pass_with_flow(data):
+    values, weights = data
+    values = values - 1e6
+    merged = chunked(lambda: Hist1D(20, -5.0, 5.0), values, weights)
+
+    counts, _ = np.histogram(values, bins=20, range=(-5.0, 5.0), weights=weights)
+    np.testing.assert_allclose(merged.values, counts, rtol=1e-12)
+    np.testing.assert_allclose(merged.variances, np.histogram(values, bins=20, range=(-5.0, 5.0),
+                                                              weights=weights**2)[0], rtol=1e-12)
+    assert merged.counts[0] == pytest.approx(weights[values < -5.0].sum())
+    assert merged.counts[-1] == pytest.approx(weights[values >= 5.0].sum())
+    assert merged.counts.sum() == pytest.approx(weights.sum())
+
+
+def test_hist2d_merge_matches_single_pass(data):
+    values, weights = data
+    x = values - 1e6
+    y = np.roll(x, 1)
+    single = Hist2D(8, -4.0, 4.0, 6, -3.0, 3.0).fill(x, y, weights)
+    parts = [Hist2D(8, -4.0, 4.0, 6, -3.0, 3.0).fill(*chunk) for chunk in
+             zip(np.array_split(x, 3), np.array_split(y, 3), np.array_split(weights, 3))]
+    merged = parts[0]
+    for part in parts[1:]:
+        merged += part
+    np.testing.assert_allclose(merged.counts, single.counts, rtol=1e-12)
+    expected, _, _ = np.histogram2d(x, y, bins=(8, 6), range=[[-4, 4], [-3, 3]], weights=weights)
+    np.testing.assert_allclose(merged.values, expected, rtol=1e-12)
+
+
+def test_merge_rejects_other_binning():
+    with pytest.raises(ValueError):
+        Hist1D(10, 0.0, 1.0).merge(Hist1D(10, 0.0, 2.0))
+
+
+@pytest.mark.parametrize("make", [
+    lambda v, w: RunningMoments().fill(v, w),
+    lambda v, w: Hist1D(30, 999990.0, 1000010.0).fill(v, w),
+    lambda v, w: Hist2D(5, 999990.0, 1000010.0, 4, 999995.0, 1000005.0).fill(v, v[::-1], w),
+])
+def test_binary_round_trip_is_exact(data, make):
+    values, weights = data
+    acc = make(values, weights)
+    restored = from_bytes(acc.to_bytes())
+    assert type(restored) is type(acc)
+    assert restored.to_bytes() == acc.to_bytes()
+    # The restored accumulator keeps merging like the original
+    again = from_bytes(acc.to_bytes())
+    again += restored
+    assert again.to_bytes() == make(values, weights).merge(acc).to_bytes()
+
+
+def test_from_bytes_rejects_foreign_data():
+    with pytest.raises(ValueError):
+        from_bytes(b"XYZ\x01" + bytes(64))
@@ -0,0 +1,56 @@
+"""Per-file cache: reuse on unchanged files, recompute on changed contents."""
+
+import os
+
+import numpy as np
+import pytest
+
+from calosim.cache import cached, entry_path
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    monkeypatch.delenv("CALOSIM_CACHE", raising=False)
+    path = tmp_path / "run.root"
+    path.write_bytes(b"a" * 1000)
+    return path
+
+
+def counting(calls):
+    def compute(path):
+        calls.append(path)
+        return {"first": np.frombuffer(path.read_bytes()[:4], dtype=np.uint8), "n": len(calls)}
+    return compute
+
+
+def test_cache_reuses_until_contents_change(source):
+    calls = []
+    first = cached(source, "test", counting(calls))
+    assert entry_path(source, "test").parent == source.parent / ".calosim_cache"
+    assert cached(source, "test", counting(calls))["n"] == first["n"] == 1
+
+    # Touched with identical contents: the content hash keeps the entry
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cached(source, "test", counting(calls))["n"] == 1
+
+    # Same size, different contents: recomputed
+    source.write_bytes(b"b" * 1000)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+    changed = cached(source, "test", counting(calls))
+    assert changed["n"] == 2
+    np.testing.assert_array_equal(changed["first"], np.frombuffer(b"bbbb", dtype=np.uint8))
+
+
+def test_cache_version_bump_recomputes(source):
+    calls = []
+    cached(source, "test", counting(calls))
+    cached(source, "test", counting(calls), version=2)
+    assert len(calls) == 2
+
+
+def test_cache_dir_override(source, tmp_path, monkeypatch):
+    monkeypatch.setenv("CALOSIM_CACHE", str(tmp_path / "elsewhere"))
+    cached(source, "test", counting([]))
+    assert list((tmp_path / "elsewhere").glob("*.test.npz"))
+    assert not (source.parent / ".calosim_cache").exists()
@@ -0,0 +1,31 @@
+"""Event-indexed reads of the hits ntuple."""
+
+import numpy as np
+import pytest
+
+from calosim.events import load_event_index, read_event, read_events
+from calosim.synthetic import make_output
+
+
+@pytest.fixture(scope="module")
+def output(tmp_path_factory):
+    return make_output(tmp_path_factory.mktemp("events") / "output.root", n_events=50, hits_per_event=5)
+
+
+def test_read_events_matches_event_column(output):
+    arrays, counts = read_events(output, [7, 3, 4, 5], index=load_event_index(output, use_cache=False))
+    np.testing.assert_array_equal(counts, [5, 5, 5, 5])
+    np.testing.assert_array_equal(arrays["event"], np.repeat([7, 3, 4, 5], 5))
+    np.testing.assert_array_equal(read_event(output, 9)["event"], np.full(5, 9))
+
+
+def test_read_events_empty_request(output):
+    arrays, counts = read_events(output, [], index=load_event_index(output, use_cache=False))
+    assert counts.size == 0
+    assert all(values.size == 0 for values in arrays.values())
+    assert arrays["edep"].dtype == np.float64
+
+
+def test_read_events_missing_event(output):
+    with pytest.raises(KeyError):
+        read_events(output, [1000], index=load_event_index(output, use_cache=False))
@@ -0,0 +1,69 @@
+"""Batched gamma-profile fits recover known parameters."""
+
+import numpy as np
+import pytest
+from scipy.optimize import curve_fit
+
+from calosim.gammafit import SEEDS, WarmStartCache, fit_profile, fit_profiles, gamma_jacobian, gamma_profile
+
+DEPTH = np.arange(20) * 12.0 + 10.0  # mm, like 20 layers of 8 mm Pb + 4 mm scint
+TRUE = np.array([[4.0, 0.05, 500.0], [2.5, 0.08, 120.0], [6.0, 0.04, 2000.0]])
+
+
+def test_exact_profiles_recover_parameters():
+    y = gamma_profile(DEPTH, TRUE[:, 0:1], TRUE[:, 1:2], TRUE[:, 2:3])
+    fit = fit_profiles(DEPTH, y)
+    assert fit.converged.all()
+    np.testing.assert_allclose(fit.params, TRUE, rtol=1e-5)
+    np.testing.assert_allclose(fit.t_max, (TRUE[:, 0] - 1) / TRUE[:, 1], rtol=1e-5)
+
+
+@pytest.mark.parametrize("seed", sorted(SEEDS))
+def test_noisy_profiles_agree_with_curve_fit(seed):
+    rng = np.random.default_rng(1)
+    truth = TRUE[0]
+    clean = gamma_profile(DEPTH, *truth)
+    sigma = 0.02 * clean.max() + 0.05 * clean
+    y = clean + rng.normal(0.0, sigma, (25, DEPTH.size))
+    fit = fit_profiles(DEPTH, y, sigma=sigma, p0=seed)
+    assert fit.converged.all()
+
+    for row, params, cov in zip(y, fit.params, fit.covariance):
+        popt, pcov = curve_fit(gamma_profile, DEPTH, row, p0=truth, sigma=sigma)
+        np.testing.assert_allclose(params, popt, rtol=1e-4)
+        np.testing.assert_allclose(np.sqrt(np.diag(cov)), np.sqrt(np.diag(pcov)), rtol=1e-2)
+    # The fitted shower maxima scatter around the true one within their errors
+    pull = (fit.t_max - (truth[0] - 1) / truth[1]) / fit.t_max_error
+    assert abs(pull.mean()) < 1.0 and 0.5 < pull.std() < 1.5
+
+
+def test_jacobian_matches_finite_differences():
+    params = TRUE[0]
+    jac = gamma_jacobian(DEPTH, *params)
+    for i in range(3):
+        step = np.zeros(3)
+        step[i] = 1e-6 * params[i]
+        numeric = (gamma_profile(DEPTH, *(params + step)) - gamma_profile(DEPTH, *(params - step))) / (2 * step[i])
+        np.testing.assert_allclose(jac[:, i], numeric, rtol=1e-5, atol=1e-9 * numeric.max())
+
+
+def test_fit_profile_raises_when_not_converged():
+    y = gamma_profile(DEPTH, *TRUE[0])
+    with pytest.raises(RuntimeError):
+        fit_profile(DEPTH, y, p0=[50.0, 5.0, 1e-3], max_iter=2)
+
+
+def test_warm_start_cache_lives_with_the_data(tmp_path, monkeypatch):
+    monkeypatch.delenv("CALOSIM_CACHE", raising=False)
+    monkeypatch.chdir(tmp_path)
+    data_dir = tmp_path / "Output"
+    seeds = WarmStartCache(data_dir)
+    seeds.put("e-", 10, "G4_Pb", 8, 4, TRUE[0])
+    seeds.save()
+    assert (data_dir / ".calosim_cache" / "fit_seeds.json").exists()
+
+    again = WarmStartCache(data_dir)
+    a, b, scale = again.get("e-", 20, "G4_Pb", 8, 4)
+    # Nearest fitted energy, scale rescaled linearly in energy
+    assert (a, b) == (TRUE[0, 0], TRUE[0, 1]) and scale == pytest.approx(2 * TRUE[0, 2])
+    assert again.get("gamma", 10, "G4_Pb", 8, 4) is None
@@ -0,0 +1,37 @@
+"""Hit-stream reduction: layer assignment from z follows the geometry."""
+
+import numpy as np
+
+from calosim.geometry import DEFAULT_GEOMETRY, Geometry
+from calosim.hits import HitAccumulator
+
+
+def hits_at_layers(geometry, layers):
+    z = geometry.front + (np.asarray(layers) + 0.5) * geometry.pitch
+    return {"edep": np.ones(z.size), "x": np.zeros(z.size), "y": np.zeros(z.size), "z": z}
+
+
+def test_layer_from_z_uses_geometry():
+    geometry = Geometry(n_layers=60, abs_thickness=20.0, abs_material="G4_Fe")
+    layers = np.array([0, 1, 17, 42, 59, 59])
+    acc = HitAccumulator(geometry)
+    acc.fill(hits_at_layers(geometry, layers))
+
+    assert acc.layer_energy.shape == (60,)
+    np.testing.assert_array_equal(acc.layer_energy, np.bincount(layers, minlength=60))
+
+
+def test_hits_outside_stack_go_to_flow_bins():
+    acc = HitAccumulator()
+    acc.fill(hits_at_layers(DEFAULT_GEOMETRY, [-3, 0, DEFAULT_GEOMETRY.n_layers + 2]))
+    counts = acc.hists["layer_energy"].counts
+    assert (counts[0], counts[1], counts[-1]) == (1.0, 1.0, 1.0)
+    assert acc.layer_energy.sum() == 1.0
+
+
+def test_layer_column_takes_precedence():
+    acc = HitAccumulator()
+    chunk = hits_at_layers(DEFAULT_GEOMETRY, [0, 0, 0])
+    chunk["layer"] = np.array([5, 6, 7])
+    acc.fill(chunk)
+    np.testing.assert_array_equal(np.flatnonzero(acc.layer_energy), [5, 6, 7])
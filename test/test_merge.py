@@ -0,0 +1,65 @@
+"""merge_outputs on two small shards, one with an autosaved (two-cycle) tree."""
+
+import numpy as np
+import pytest
+import uproot
+
+from calosim.merge import merge_outputs
+
+
+def write_shard(path, seed, n_events=50, tree_cycles=1):
+    rng = np.random.default_rng(seed)
+    hits = {
+        "edep": rng.exponential(1.0, n_events * 2),
+        "event": np.repeat(np.arange(n_events, dtype=np.int32), 2),
+    }
+    with uproot.recreate(path) as file:
+        file["hTotal"] = np.histogram(rng.normal(5.0, 2.0, 500), bins=20, range=(0.0, 10.0))
+        file["hXY"] = np.histogram2d(rng.normal(0, 3, 500), rng.normal(0, 3, 500), bins=10, range=[[-5, 5], [-5, 5]])
+        for _ in range(tree_cycles):
+            # Writing the name again adds a new cycle, like a ROOT autosave of a tree
+            file["hits"] = hits
+    return path, hits
+
+
+@pytest.fixture
+def shards(tmp_path):
+    return [write_shard(tmp_path / "d0.root", 0), write_shard(tmp_path / "e1.root", 1, tree_cycles=2)]
+
+
+def test_merge_accepts_multi_cycle_inputs_and_writes_each_object_once(shards, tmp_path):
+    (first, _), (second, _) = shards
+    assert "hits;2" in uproot.open(second).keys()
+
+    merged = merge_outputs([first, second], tmp_path / "merged.root")
+    with uproot.open(merged) as file:
+        names = [key.split(";")[0] for key in file.keys(recursive=False)]
+        assert sorted(names) == ["hTotal", "hXY", "hits"]
+
+
+def test_merge_sums_histograms_and_concatenates_trees(shards, tmp_path):
+    (first, hits0), (second, hits1) = shards
+    merged = merge_outputs([first, second], tmp_path / "merged.root")
+
+    with uproot.open(first) as a, uproot.open(second) as b, uproot.open(merged) as out:
+        for name in ("hTotal", "hXY"):
+            expected = a[name].values(flow=True) + b[name].values(flow=True)
+            np.testing.assert_array_equal(out[name].values(flow=True), expected)
+            np.testing.assert_array_equal(out[name].variances(flow=True),
+                                          a[name].variances(flow=True) + b[name].variances(flow=True))
+            assert out[name].member("fEntries") == a[name].member("fEntries") + b[name].member("fEntries")
+
+        tree = out["hits"].arrays(library="np")
+        np.testing.assert_array_equal(tree["edep"], np.concatenate([hits0["edep"], hits1["edep"]]))
+        # Event numbers of the second shard continue after the first one's
+        np.testing.assert_array_equal(tree["event"], np.concatenate([hits0["event"], hits1["event"] + 50]))
+
+
+def test_merge_rejects_different_binning(tmp_path):
+    first, _ = write_shard(tmp_path / "a.root", 0)
+    with uproot.recreate(tmp_path / "b.root") as file:
+        file["hTotal"] = (np.ones(10), np.linspace(0.0, 10.0, 11))
+        file["hXY"] = np.histogram2d([0.0], [0.0], bins=10, range=[[-5, 5], [-5, 5]])
+        file["hits"] = {"edep": np.ones(2), "event": np.zeros(2, dtype=np.int32)}
+    with pytest.raises(ValueError, match="binning"):
+        merge_outputs([first, tmp_path / "b.root"], tmp_path / "merged.root")
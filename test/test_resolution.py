@@ -0,0 +1,58 @@
+"""Peak fits and the resolution model on samples with known widths."""
+
+import numpy as np
+import pytest
+
+from calosim.resolution import energy_histogram, fit_peak, fit_resolution, resolution_model, resolution_scan
+from calosim.synthetic import make_sweep
+
+
+@pytest.mark.parametrize("n_events", [500, 5000])
+@pytest.mark.parametrize("model", ["gauss", "crystalball"])
+def test_gaussian_peak_recovers_sigma(n_events, model):
+    rng = np.random.default_rng(n_events)
+    sigma = 50.0
+    values, edges = energy_histogram(rng.normal(1000.0, sigma, n_events))
+    peak = fit_peak(values, edges, model)
+    assert peak.converged
+    assert peak.mean == pytest.approx(1000.0, abs=4 * sigma / np.sqrt(n_events))
+    # The iterated core fit sees ~1.5 sigma of tail at most; allow 4 standard errors
+    assert abs(peak.sigma - sigma) < 4 * max(peak.sigma_error, sigma / np.sqrt(2 * n_events))
+
+
+def test_narrow_window_is_widened_not_abandoned():
+    # Coarse bins: the first +-1.5/2.5 sigma window holds fewer than 4 bins
+    rng = np.random.default_rng(0)
+    values, edges = np.histogram(rng.normal(0.0, 1.0, 2000), bins=8, range=(-4.0, 4.0))
+    peak = fit_peak(values, edges)
+    assert peak.converged
+    assert peak.sigma == pytest.approx(1.0, rel=0.2)
+
+
+def test_fit_resolution_recovers_known_terms():
+    truth = (0.10, 0.01, 0.05)
+    energies = np.array([1, 2, 5, 10, 20, 50, 100], dtype=float)
+    resolutions = resolution_model(energies, *truth)
+    params, _ = fit_resolution(energies, resolutions, 0.02 * resolutions)
+    np.testing.assert_allclose(params, truth, rtol=1e-4, atol=1e-6)
+
+    rng = np.random.default_rng(1)
+    errors = 0.01 * resolutions
+    params, cov = fit_resolution(energies, resolutions + rng.normal(0, errors), errors)
+    assert abs(params[0] - truth[0]) < 4 * np.sqrt(cov[0, 0])
+
+
+def test_fit_resolution_needs_three_points():
+    with pytest.raises(ValueError):
+        fit_resolution([1.0, 2.0, 5.0], [0.1, np.nan, 0.05])
+
+
+def test_scan_on_synthetic_sweep(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALOSIM_CACHE", str(tmp_path / "cache"))
+    energies = (1, 2, 5, 10, 20, 50)
+    paths = make_sweep(tmp_path, energies, n_events=500, seed=3)
+    scan = resolution_scan(list(zip(energies, paths)), n_boot=30, seed=0)
+    assert all(peak.converged for peak in scan.peaks)
+    # Synthetic layer energies fluctuate like 0.5 MeV quanta of 5 % of E: sigma/E = 10 %/sqrt(E)
+    assert abs(scan.params[0] - 0.10) < 4 * scan.errors[0]
+    assert np.isfinite(scan.replicas).all(axis=1).mean() > 0.9